@@ -1,25 +1,19 @@
 #agents/llm_agent.py
-from app.core import config
+from langchain_core.messages import HumanMessage, SystemMessage
+from app.core.config import settings
+from app.core.llm import get_llm
 
-try:
-    import google.generativeai as genai
-    genai_available = True
-except Exception:
-    genai_available = False
-
-if genai_available and config.GEMINI_API_KEY:
-    genai.configure(api_key=config.GEMINI_API_KEY)
+AGENT_MODEL = "gemini-2.5-flash"
 
 # -------- core reply --------
 def generate_reply(prompt: str, language: str = "en") -> str:
-    if not genai_available or not config.GEMINI_API_KEY:
+    if not settings.GEMINI_API_KEY:
         return f"(demo) {prompt[:180]}"
     try:
         # steer response language
         sys_msg = f"You are a concise WhatsApp shopping assistant. Reply in {language}."
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        resp = model.generate_content([sys_msg, prompt])
-        return resp.text.strip()
+        resp = get_llm(AGENT_MODEL).invoke([SystemMessage(content=sys_msg), HumanMessage(content=prompt)])
+        return resp.content.strip()
     except Exception as e:
         print("[llm_agent] Gemini failed:", e)
         return "عذرًا، لا أستطيع الرد الآن." if language == "ar" else "Sorry, I can’t reply right now."
@@ -28,13 +22,12 @@ def generate_reply(prompt: str, language: str = "en") -> str:
 def translate(text: str, target_lang: str = "ar") -> str:
     if not text:
         return text
-    if not genai_available or not config.GEMINI_API_KEY:
+    if not settings.GEMINI_API_KEY:
         return text  # no-op offline
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
         prompt = f"Translate this to {target_lang}. Only output the translation.\n\n{text}"
-        resp = model.generate_content(prompt)
-        return resp.text.strip()
+        resp = get_llm(AGENT_MODEL).invoke([HumanMessage(content=prompt)])
+        return resp.content.strip()
     except Exception as e:
         print("[llm_agent] translate failed:", e)
         return text
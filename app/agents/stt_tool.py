@@ -1,51 +1,149 @@
 # app/agents/stt_tools.py
-import os
-import tempfile
-import requests
-import assemblyai as aai
-from typing import Optional
+import asyncio
+import hashlib
+import time
+import httpx
+from typing import Optional, Tuple
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
+from app.core.logs import get_logger
 
-aai.settings.api_key = settings.ASSEMBLYAI_API_KEY
+logger = get_logger("stt")
 
-def transcribe_audio_from_url(audio_url: str) -> Optional[str]:
-    """Download WhatsApp voice note from Twilio and transcribe with AssemblyAI."""
+ASSEMBLYAI_BASE_URL = "https://api.assemblyai.com/v2"
+
+# Global variables for lazy loading
+_http_client = None
+_stt_semaphore = None
+
+# Transcripts keyed by media URL (Twilio retries) and by the audio's SHA-256 (forwarded voice notes)
+transcript_cache = TTLCache("transcripts", maxsize=settings.STT_CACHE_SIZE, ttl=settings.CACHE_TTL_SECONDS)
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared pooled HTTP client for Twilio media downloads and AssemblyAI calls."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=settings.STT_MAX_CONCURRENCY * 2),
+            follow_redirects=True,
+        )
+    return _http_client
+
+def set_http_client(client: Optional[httpx.AsyncClient]):
+    """Replace the shared HTTP client, e.g. with one on a local mock transport."""
+    global _http_client
+    _http_client = client
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _stt_semaphore
+    if _stt_semaphore is None:
+        _stt_semaphore = asyncio.Semaphore(settings.STT_MAX_CONCURRENCY)
+    return _stt_semaphore
+
+async def aclose_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def _download_audio(client: httpx.AsyncClient, audio_url: str) -> Tuple[bytes, str]:
+    """
+    Download the voice note from Twilio, hashing on the way. Raises ValueError
+    as soon as it is larger than STT_MAX_AUDIO_BYTES, by Content-Length or by
+    the bytes actually received.
+    """
+    auth = (settings.TWILIO_ACCOUNT_SID or "", settings.TWILIO_AUTH_TOKEN or "")
+    limit = settings.STT_MAX_AUDIO_BYTES
+    digest = hashlib.sha256()
+    audio = bytearray()
+    async with client.stream("GET", audio_url, auth=auth) as download:
+        download.raise_for_status()
+        declared = download.headers.get("content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            raise ValueError(f"voice note is {declared} bytes, over the {limit} byte limit")
+        # Chunks as they arrive, so the limit is checked on every read
+        async for chunk in download.aiter_bytes():
+            if len(audio) + len(chunk) > limit:
+                raise ValueError(f"voice note is over the {limit} byte limit")
+            digest.update(chunk)
+            audio.extend(chunk)
+    return bytes(audio), digest.hexdigest()
+
+async def _upload_to_assemblyai(client: httpx.AsyncClient, audio: bytes) -> str:
+    upload = await client.post(
+        f"{ASSEMBLYAI_BASE_URL}/upload",
+        headers={"authorization": settings.ASSEMBLYAI_API_KEY or ""},
+        content=audio,
+    )
+    upload.raise_for_status()
+    return upload.json()["upload_url"]
+
+async def _poll_transcript(client: httpx.AsyncClient, transcript_id: str) -> Optional[str]:
+    """Poll a transcript with exponential backoff until it completes, fails or times out."""
+    headers = {"authorization": settings.ASSEMBLYAI_API_KEY or ""}
+    delay = 0.5
+    deadline = time.monotonic() + settings.STT_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(delay)
+        response = await client.get(f"{ASSEMBLYAI_BASE_URL}/transcript/{transcript_id}", headers=headers)
+        response.raise_for_status()
+        transcript = response.json()
+        if transcript["status"] == "completed":
+            return transcript.get("text")
+        if transcript["status"] == "error":
+            logger.warning("transcription failed", extra={"transcript_id": transcript_id, "error": transcript.get("error")})
+            return None
+        delay = min(delay * 1.5, 5.0)
+    logger.warning("transcription timed out", extra={"transcript_id": transcript_id, "timeout_s": settings.STT_TIMEOUT_SECONDS})
+    return None
+
+async def atranscribe_audio_from_url(audio_url: str) -> Optional[str]:
+    """
+    Transcribe a WhatsApp voice note: download it from Twilio into memory (no
+    temp file), upload it to AssemblyAI and poll without blocking. A media URL seen before (Twilio retries) is answered
+    without downloading, and identical audio (forwarded voice notes) without
+    uploading or transcribing again.
+    """
     if not audio_url:
         return None
 
-    auth = (settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-    local_path = None
+    url_key = ("url", audio_url)
+    cached = transcript_cache.get(url_key)
+    if cached is not MISSING:
+        return cached
 
     try:
-        # 1. Download from Twilio with auth
-        r = requests.get(audio_url, auth=auth, stream=True, timeout=30)
-        r.raise_for_status()
-
-        suffix = ".ogg"  # WhatsApp voice notes are usually ogg/opus
-        fd, local_path = tempfile.mkstemp(suffix=suffix)
-        with os.fdopen(fd, "wb") as f:
-            for chunk in r.iter_content(8192):
-                f.write(chunk)
-
-        # 2. Transcribe locally
-        transcriber = aai.Transcriber()
-        config = aai.TranscriptionConfig(
-            language_detection=True,  # auto-detect English/Arabic
-            punctuate=True,
-            format_text=True
-        )
-        transcript = transcriber.transcribe(local_path, config=config)
+        async with _get_semaphore():
+            client = get_http_client()
+            audio, audio_hash = await _download_audio(client, audio_url)
 
-        if transcript.status == aai.TranscriptStatus.error:
-            print(f"[STT] AssemblyAI error: {transcript.error}")
-            return None
+            cached = transcript_cache.get(audio_hash)
+            if cached is not MISSING:
+                logger.info("reusing transcript for duplicate voice note", extra={"audio_hash": audio_hash})
+                transcript_cache.set(url_key, cached)
+                return cached
 
-        return transcript.text
+            upload_url = await _upload_to_assemblyai(client, audio)
+            del audio
+            response = await client.post(
+                f"{ASSEMBLYAI_BASE_URL}/transcript",
+                headers={"authorization": settings.ASSEMBLYAI_API_KEY or ""},
+                json={
+                    "audio_url": upload_url,
+                    "language_detection": True,  # auto-detect English/Arabic
+                    "punctuate": True,
+                    "format_text": True,
+                },
+            )
+            response.raise_for_status()
+            text = await _poll_transcript(client, response.json()["id"])
+
+        if text:
+            transcript_cache.set(audio_hash, text)
+            transcript_cache.set(url_key, text)
+        return text
 
     except Exception as e:
-        print(f"[STT] Error: {e}")
+        logger.warning("transcription failed", extra={"error": str(e)})
         return None
-
-    finally:
-        if local_path and os.path.exists(local_path):
-            os.remove(local_path)
\ No newline at end of file
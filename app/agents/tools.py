@@ -1,19 +1,21 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.core.vector_search import search_similar_products
+from typing import Optional, Sequence
+from app.core.cache import MISSING, TTLCache
+from app.core.concurrency import run_blocking, run_waiting
+from app.core.config import settings
+from app.core.filters import SearchFilters, product_price
+from app.core.llm import get_llm
+from app.core.logs import get_logger
+from app.core.metrics import fallback
+from app.core.response_cache import ResponseCache
 from app.core.prompts import CHAT_GREET_PROMPT, PRODUCT_RECOMMEND_PROMPT
-from langchain.schema import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage
 
-# Global variable for lazy loading
-_chat_llm = None
+# Formatted recommendation replies and the products they show, per (index version, query, language, filters)
+recommend_cache = TTLCache("recommendations", maxsize=settings.SEARCH_CACHE_SIZE, ttl=settings.CACHE_TTL_SECONDS)
+# Greeting/small-talk replies; "hi", "Hi!" and close rephrasings share one Gemini answer
+greet_cache = ResponseCache("greet_replies", loose=True, semantic=True)
 
-def get_chat_llm():
-    """Lazy load the chat LLM model to avoid blocking startup."""
-    global _chat_llm
-    if _chat_llm is None:
-        print("🔄 Loading Gemini LLM model for chat tools...")
-        _chat_llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
-        print("✅ Gemini LLM model for chat tools loaded successfully!")
-    return _chat_llm
+logger = get_logger("tools")
 
 def format_product_for_display(product: dict) -> str:
     """Format a product for display in the response"""
@@ -37,12 +39,29 @@ def format_product_for_display(product: dict) -> str:
     
     return product_text
 
-def product_recommend(query: str, language: str = "en") -> AIMessage:
+def product_recommend(query: str, language: str = "en", filters: Optional[SearchFilters] = None,
+                      exclude: Optional[Sequence[int]] = None) -> AIMessage:
     """
-    Searches for and formats a response with the top 5 product recommendations.
+    Searches for and formats a response with the top 5 product recommendations,
+    restricted to products matching filters (price range, brand, ...) if given
+    and skipping the product ids in exclude ("show more"). The ids and prices
+    of the products shown are in the reply's response_metadata.
     """
+    # Imported here so that loading faiss and the catalog stays off the startup path
+    from app.core.vector_search import search_similar_products, get_index_version, product_id
     try:
-        results = search_similar_products(query, top_k=5)
+        cache_key = (get_index_version(), " ".join(query.split()), language, filters.key() if filters else None)
+        cached = MISSING if exclude else recommend_cache.get(cache_key)
+        if isinstance(cached, tuple):  # the shared tier may still hold bare replies from older releases
+            response_text, shown = cached
+            return AIMessage(content=response_text, response_metadata=shown)
+
+        if exclude:
+            skip = set(exclude)
+            results = search_similar_products(query, top_k=5 + len(skip), filters=filters)
+            results = [p for p in results if product_id(p) not in skip][:5]
+        else:
+            results = search_similar_products(query, top_k=5, filters=filters)
         
         if not results:
             if language == "ar":
@@ -61,36 +80,58 @@ def product_recommend(query: str, language: str = "en") -> AIMessage:
         else:
             response_text = f"Here are {len(results)} products you might like:\n\n" + "\n\n".join(formatted_products)
         
-        return AIMessage(content=response_text)
+        # What was shown, for the user's session
+        shown = {"product_ids": [product_id(p) for p in results], "prices": [product_price(p) for p in results]}
+        if not exclude:
+            recommend_cache.set(cache_key, (response_text, shown))
+        return AIMessage(content=response_text, response_metadata=shown)
         
     except Exception as e:
-        print(f"[product_recommend] Error: {e}")
+        logger.warning("product search failed", extra={"query": query, "error": str(e)})
+        fallback("recommend")
         if language == "ar":
             error_message = "عذراً، حدث خطأ في البحث عن المنتجات. يرجى المحاولة مرة أخرى."
         else:
             error_message = "Sorry, there was an error searching for products. Please try again."
         return AIMessage(content=error_message)
 
-def chat_greet(text: str, language: str = "en") -> AIMessage:
+async def aproduct_recommend(query: str, language: str = "en", filters: Optional[SearchFilters] = None,
+                             exclude: Optional[Sequence[int]] = None) -> AIMessage:
+    """
+    Async variant of product_recommend; the embedding and FAISS search run in
+    a thread pool so the event loop stays free. With search batching the
+    thread mostly waits for the batcher, so the wider wait pool is used.
+    """
+    run = run_waiting if settings.SEARCH_BATCHING else run_blocking
+    return await run(product_recommend, query, language, filters, exclude)
+
+def _greet_prompt(text: str, language: str) -> str:
+    if language == "ar":
+        return f"أنت مساعد تسوق ذكي. رد على الرسالة التالية بطريقة ودودة ومفيدة: {text}"
+    return f"You are a smart shopping assistant. Respond to the following message in a friendly and helpful way: {text}"
+
+def _greet_fallback(language: str) -> AIMessage:
+    if language == "ar":
+        return AIMessage(content="مرحباً! أنا مساعد التسوق الخاص بك. كيف يمكنني مساعدتك اليوم؟")
+    return AIMessage(content="Hello! I'm your shopping assistant. How can I help you today?")
+
+async def achat_greet(text: str, language: str = "en") -> AIMessage:
     """
     Generates a general chat or greeting response using the LLM.
     """
     try:
-        chat_llm = get_chat_llm()
-        
-        if language == "ar":
-            prompt = f"أنت مساعد تسوق ذكي. رد على الرسالة التالية بطريقة ودودة ومفيدة: {text}"
-        else:
-            prompt = f"You are a smart shopping assistant. Respond to the following message in a friendly and helpful way: {text}"
-        
-        human_message = HumanMessage(content=prompt)
-        response = chat_llm.invoke([human_message])
-        
-        return AIMessage(content=response.content.strip())
-        
+        cached = await greet_cache.alookup(text, language)
+        if cached is not MISSING:
+            return AIMessage(content=cached)
+
+        chat_llm = get_llm()
+        human_message = HumanMessage(content=_greet_prompt(text, language))
+        response = await chat_llm.ainvoke([human_message])
+        content = response.content.strip()
+        greet_cache.store(text, language, content)
+        return AIMessage(content=content)
+
     except Exception as e:
-        print(f"[chat_greet] Error: {e}")
-        if language == "ar":
-            return AIMessage(content="مرحباً! أنا مساعد التسوق الخاص بك. كيف يمكنني مساعدتك اليوم؟")
-        else:
-            return AIMessage(content="Hello! I'm your shopping assistant. How can I help you today?")
\ No newline at end of file
+        logger.warning("greeting failed", extra={"func": "achat_greet", "error": str(e)})
+        fallback("chat_greet")
+        return _greet_fallback(language)
\ No newline at end of file
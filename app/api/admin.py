@@ -0,0 +1,45 @@
+# app/api/admin.py
+import asyncio
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.core.config import settings
+from app.core.session import get_session_store
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject the request unless it carries ADMIN_TOKEN; without one configured the endpoints are off."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+@router.get("/catalog")
+async def catalog_status():
+    """Active catalog generation, retired ones still in use, and the last refresh."""
+    from app.core import vector_search
+    return vector_search.generation_report()
+
+@router.post("/catalog/refresh", status_code=202)
+async def trigger_catalog_refresh():
+    """Start a background catalog refresh; searches keep using the live generation meanwhile."""
+    from app.core import vector_search
+    started = not vector_search.is_refreshing()
+    if started:
+        asyncio.get_running_loop().run_in_executor(None, vector_search.refresh_catalog)
+    return {"started": started, **vector_search.generation_report()}
+
+@router.get("/sessions/{user_id}")
+async def session_status(user_id: str):
+    """What the assistant remembers about a user: recent turns, last search and the products shown."""
+    session = get_session_store().get(user_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="No session for this user")
+    return session.info()
+
+@router.delete("/sessions/{user_id}")
+async def forget_session(user_id: str):
+    """Forget a user's session, e.g. on request; their next message starts fresh."""
+    get_session_store().delete(user_id)
+    return {"deleted": True}
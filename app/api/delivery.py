@@ -0,0 +1,195 @@
+# app/api/delivery.py
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logs import get_logger
+from app.core.metrics import twilio_seconds
+
+logger = get_logger("delivery")
+
+WHATSAPP_MAX_BODY = 1600  # Twilio rejects longer WhatsApp message bodies
+
+@dataclass
+class InboundMessage:
+    """A WhatsApp message waiting for a reply."""
+    user_id: str
+    reply_to: str  # raw Twilio 'From', e.g. 'whatsapp:+971...'
+    body: Optional[str] = None
+    media_url: Optional[str] = None
+
+def split_message(body: str, limit: int = WHATSAPP_MAX_BODY) -> List[str]:
+    """Split a reply into Twilio-sized parts, preferring paragraph then line breaks."""
+    parts = []
+    while len(body) > limit:
+        cut = body.rfind("\n\n", 0, limit)
+        if cut <= 0:
+            cut = body.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(body[:cut].rstrip())
+        body = body[cut:].lstrip()
+    if body:
+        parts.append(body)
+    return parts
+
+class TwilioSender:
+    """
+    Sends WhatsApp replies through the Twilio Messages REST API over one pooled
+    HTTP client. Point TWILIO_API_BASE at a local mock to run without Twilio.
+    """
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str, base_url: str, timeout: float = 10.0):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.account_sid or "", self.auth_token or ""),
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=settings.DELIVERY_WORKERS, max_keepalive_connections=settings.DELIVERY_WORKERS),
+            )
+        return self._client
+
+    async def send(self, to: str, body: str):
+        """Send a reply, split into several messages if it is too long."""
+        client = self._get_client()
+        for part in split_message(body):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                response = await client.post(
+                    f"/2010-04-01/Accounts/{self.account_sid}/Messages.json",
+                    data={"From": self.from_number, "To": to, "Body": part},
+                )
+                response.raise_for_status()
+                outcome = "ok"
+            finally:
+                twilio_seconds.observe(time.perf_counter() - started, kind="rest", outcome=outcome)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class DeliveryQueue:
+    """
+    In-process work queue for inbound messages. A fixed pool of workers runs
+    the handler; messages from the same user are handled one at a time in
+    arrival order, while different users are served in parallel. submit()
+    refuses new work once max_pending messages are waiting.
+    """
+
+    def __init__(self, handler: Callable[[InboundMessage], Awaitable[None]], workers: int, max_pending: int):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending: Dict[str, Deque[InboundMessage]] = {}
+        self._ready = None
+        self._size = 0
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        return self._size
+
+    def start(self):
+        """Start the workers on the running event loop (no-op if already running)."""
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info("delivery queue started", extra={"workers": self.workers})
+
+    def submit(self, message: InboundMessage) -> bool:
+        """Queue a message; False when the queue is full and the caller should shed load."""
+        if self._size >= self.max_pending:
+            return False
+        self.start()
+        self._size += 1
+        jobs = self._pending.get(message.user_id)
+        if jobs is None:
+            self._pending[message.user_id] = deque([message])
+            self._ready.put_nowait(message.user_id)
+        else:
+            # A worker already owns this user and will pick it up in order
+            jobs.append(message)
+        return True
+
+    async def _worker(self):
+        while True:
+            user_id = await self._ready.get()
+            jobs = self._pending[user_id]
+            try:
+                while jobs:
+                    try:
+                        await self.handler(jobs[0])
+                    except Exception as e:
+                        logger.error("delivery failed", extra={"user_id": user_id, "error": str(e)})
+                    finally:
+                        jobs.popleft()
+                        self._size -= 1
+            finally:
+                del self._pending[user_id]
+                self._ready.task_done()
+
+    async def stop(self, timeout: float = 10.0):
+        """Give queued messages up to `timeout` seconds to finish, then cancel the workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._ready.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("delivery queue stopped with messages still pending", extra={"pending": self._size})
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+# Global variables for lazy loading
+_sender = None
+_delivery_queue = None
+
+def get_sender() -> TwilioSender:
+    """Shared Twilio REST sender."""
+    global _sender
+    if _sender is None:
+        _sender = TwilioSender(
+            account_sid=settings.TWILIO_ACCOUNT_SID,
+            auth_token=settings.TWILIO_AUTH_TOKEN,
+            from_number=settings.TWILIO_WHATSAPP_NUMBER,
+            base_url=settings.TWILIO_API_BASE,
+        )
+    return _sender
+
+def set_sender(sender):
+    """Replace the sender, e.g. with a local fake that records replies."""
+    global _sender
+    _sender = sender
+
+def get_delivery_queue(handler: Optional[Callable[[InboundMessage], Awaitable[None]]] = None) -> DeliveryQueue:
+    """Shared delivery queue; the first caller supplies the message handler."""
+    global _delivery_queue
+    if _delivery_queue is None:
+        if handler is None:
+            raise RuntimeError("Delivery queue has not been created yet")
+        _delivery_queue = DeliveryQueue(handler, settings.DELIVERY_WORKERS, settings.DELIVERY_MAX_PENDING)
+    return _delivery_queue
+
+async def shutdown_delivery():
+    """Drain the delivery queue and close the pooled HTTP client."""
+    if _delivery_queue is not None:
+        await _delivery_queue.stop()
+    if _sender is not None:
+        await _sender.aclose()
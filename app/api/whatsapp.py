@@ -1,26 +1,76 @@
 # app/api/whatsapp.py
 import os
+import time
 from fastapi import APIRouter, Form, Request, HTTPException
 from fastapi.responses import Response
-from twilio.twiml.messaging_response import MessagingResponse
-from twilio.request_validator import RequestValidator
 from app.core.config import settings
 from app.core.langgraph_app import run_message
-from app.agents.stt_tool import transcribe_audio_from_url  # if your file is stt_tools.py, keep that import
+from app.core.logs import get_logger
+from app.core.metrics import fallback, observe_stage, twilio_seconds
+from app.core.storage import store_transcript
+from app.agents.stt_tool import atranscribe_audio_from_url  # if your file is stt_tools.py, keep that import
+from app.api.delivery import InboundMessage, get_delivery_queue, get_sender
 
 router = APIRouter()
-validator = RequestValidator(settings.TWILIO_AUTH_TOKEN)
+logger = get_logger("whatsapp")
+
+# Global variable for lazy loading
+_validator = None
+
+def get_validator():
+    """Twilio signature validator, created on first use."""
+    global _validator
+    if _validator is None:
+        from twilio.request_validator import RequestValidator
+        _validator = RequestValidator(settings.TWILIO_AUTH_TOKEN)
+    return _validator
 
 def get_twilio_xml_response(body: str) -> Response:
     """Return a proper TwiML XML response with correct content-type."""
     if not body or body.isspace():
         body = "Sorry, I can't generate a response right now. Please try again."
 
+    from twilio.twiml.messaging_response import MessagingResponse
     twilio_resp = MessagingResponse()
     twilio_resp.message(body)
     # IMPORTANT: return XML content-type so Twilio parses it
     return Response(content=str(twilio_resp), media_type="application/xml")
 
+def get_empty_twilio_response() -> Response:
+    """Acknowledge the webhook without a reply; the answer is sent later via the REST API."""
+    from twilio.twiml.messaging_response import MessagingResponse
+    return Response(content=str(MessagingResponse()), media_type="application/xml")
+
+async def process_message(message: InboundMessage) -> str:
+    """Transcribe (if needed) and run a message through LangGraph, returning the reply text."""
+    if message.media_url:
+        logger.info("received audio message", extra={"user_id": message.user_id})
+        started = time.perf_counter()
+        text_content = await atranscribe_audio_from_url(message.media_url)
+        observe_stage("stt", time.perf_counter() - started)
+        if not text_content:
+            fallback("stt")
+            return "Sorry, I could not transcribe that audio."
+    else:
+        logger.info("received text message", extra={"user_id": message.user_id, "text": message.body})
+        text_content = message.body or ""
+
+    if settings.STORE_TRANSCRIPTS:
+        store_transcript(message.user_id, text_content)
+    return await run_message(user_id=message.user_id, text=text_content)
+
+async def deliver_reply(message: InboundMessage):
+    """Delivery queue handler: process a message and send the reply through Twilio."""
+    try:
+        reply = await process_message(message)
+    except Exception as e:
+        logger.error("message processing failed", extra={"user_id": message.user_id, "error": str(e)})
+        fallback("message")
+        reply = "An error occurred. Please try again later."
+    if not reply or reply.isspace():
+        reply = "Sorry, I can't generate a response right now. Please try again."
+    await get_sender().send(message.reply_to, reply)
+
 @router.post("/webhook")
 async def whatsapp_webhook(
     request: Request,
@@ -41,26 +91,29 @@ async def whatsapp_webhook(
     url = str(request.url)
     form = dict(await request.form())
     if settings.TWILIO_AUTH_TOKEN:
-        if not validator.validate(url, form, twilio_signature):
+        if not get_validator().validate(url, form, twilio_signature):
             # If validation fails, return 403 to avoid spoofed requests
             raise HTTPException(status_code=403, detail="Invalid Twilio signature")
     """
 
     user_id = From.split("whatsapp:")[-1] if "whatsapp:" in From else From
+    message = InboundMessage(user_id=user_id, reply_to=From, body=Body, media_url=MediaUrl0)
 
-    try:
-        if MediaUrl0:
-            print(f"Received audio message from {user_id}")
-            text_content = transcribe_audio_from_url(MediaUrl0)
-            if not text_content:
-                return get_twilio_xml_response("Sorry, I could not transcribe that audio.")
-        else:
-            print(f"Received text message from {user_id}: {Body}")
-            text_content = Body or ""
+    if settings.REPLY_MODE == "async":
+        # Reply later through the REST API so Twilio's webhook never waits on the LLM
+        if get_delivery_queue(deliver_reply).submit(message):
+            return get_empty_twilio_response()
+        logger.warning("delivery queue full, shedding message", extra={"user_id": user_id})
+        return get_twilio_xml_response("We're receiving a lot of messages right now. Please try again in a minute.")
 
-        llm_response = await run_message(user_id=user_id, text=text_content)
+    started = time.perf_counter()
+    try:
+        llm_response = await process_message(message)
+        twilio_seconds.observe(time.perf_counter() - started, kind="webhook", outcome="ok")
         return get_twilio_xml_response(llm_response)
 
     except Exception as e:
-        print(f"Error processing message: {e}")
+        logger.error("message processing failed", extra={"user_id": user_id, "error": str(e)})
+        fallback("message")
+        twilio_seconds.observe(time.perf_counter() - started, kind="webhook", outcome="error")
         return get_twilio_xml_response("An error occurred. Please try again later.")
\ No newline at end of file
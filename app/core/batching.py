@@ -0,0 +1,118 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.embedding_model import embed_queries
+from app.core.metrics import register_collector
+
+class SearchBatcher:
+    """
+    Micro-batches concurrent vector searches. Callers hand in (index, query, k)
+    and wait on a future; one background thread collects requests for up to
+    window_ms (or max_size requests), embeds all their queries with a single
+    model.encode call and runs one index.search per (index, k) on the stacked
+    matrix, then resolves each caller's future with its row of ids. A request
+    that finds nothing else queued is dispatched at once, so a lone query
+    never waits out the window.
+    """
+
+    def __init__(self, window_ms: float, max_size: int):
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self.largest = 0
+        self._thread = threading.Thread(target=self._run, name="search-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, index, query: str, k: int) -> Future:
+        """Queue a search; the future resolves to the row of FAISS ids (length k, -1 padded)."""
+        future = Future()
+        self._queue.put((index, query, k, future))
+        return future
+
+    def search(self, index, query: str, k: int) -> np.ndarray:
+        """Blocking search through the batcher, for callers on worker threads."""
+        return self.submit(index, query, k).result()
+
+    def _collect(self) -> List[Tuple]:
+        batch = [self._queue.get()]
+        if self._queue.empty():
+            return batch
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch: List[Tuple]):
+        # Drop requests cancelled while queued; the rest can no longer be cancelled
+        batch = [request for request in batch if request[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        vectors = embed_queries([query for _, query, _, _ in batch])
+        # Requests from different catalog generations search their own index, and a
+        # query that over-fetches for filtering doesn't make the others fetch as much
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for row, (index, _, k, _) in enumerate(batch):
+            groups.setdefault((id(index), k), []).append(row)
+        for (_, k), rows in groups.items():
+            index = batch[rows[0]][0]
+            _, found = index.search(np.ascontiguousarray(vectors[rows]), k)
+            for found_row, row in zip(found, rows):
+                batch[row][3].set_result(found_row)
+        with self._lock:
+            self.batches += 1
+            self.queries += len(batch)
+            self.largest = max(self.largest, len(batch))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "mean_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest,
+                "window_ms": self.window * 1000,
+                "max_size": self.max_size,
+            }
+
+# Global variable for lazy loading
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_search_batcher() -> SearchBatcher:
+    """Shared search batcher, started on first use."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = SearchBatcher(settings.SEARCH_BATCH_WINDOW_MS, settings.SEARCH_BATCH_MAX_SIZE)
+    return _batcher
+
+def batcher_stats() -> Dict[str, float]:
+    return get_search_batcher().stats() if _batcher is not None else {"batches": 0, "queries": 0}
+
+register_collector(
+    "eazy_search_batched_total", "counter", "Micro-batches run and searches they served",
+    lambda: [("eazy_search_batched_total", {"unit": key}, batcher_stats()[key]) for key in ("batches", "queries")],
+)
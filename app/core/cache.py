@@ -0,0 +1,195 @@
+import hashlib
+import hmac
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app.core.config import settings
+from app.core.logs import get_logger
+from app.core.metrics import register_collector
+
+logger = get_logger("cache")
+
+try:
+    import redis
+    redis_available = True
+except Exception:
+    redis_available = False
+
+# Sentinel so that cached falsy values (empty result lists) still count as hits
+MISSING = object()
+
+# All named caches, for hit-rate reporting
+_registry: Dict[str, "TTLCache"] = {}
+
+_SIGNATURE_BYTES = hashlib.sha256().digest_size
+
+class RedisBackend:
+    """
+    Shared cache tier backed by any client with redis-style get/set/delete
+    (a real redis.Redis, or a local stand-in such as fakeredis in development).
+    Values are pickled (they include numpy arrays and sessions) and prefixed
+    with an HMAC-SHA256 of the pickle under `secret`; entries without a valid
+    signature are dropped as misses instead of being unpickled. Signing only
+    stops forged entries: Redis must still be private to the app's workers,
+    since anyone holding the secret can run code in them.
+    """
+
+    def __init__(self, client, secret: str):
+        if not secret:
+            raise ValueError("RedisBackend needs a signing secret")
+        self.client = client
+        self._secret = secret.encode("utf-8")
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(key)
+        if raw is None:
+            return MISSING
+        signature, payload = raw[:_SIGNATURE_BYTES], raw[_SIGNATURE_BYTES:]
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            logger.warning("rejected shared cache entry with a bad signature", extra={"key": key})
+            return MISSING
+        return pickle.loads(payload)
+
+    def set(self, key: str, value: Any, ttl: Optional[float]):
+        payload = pickle.dumps(value)
+        self.client.set(key, self._sign(payload) + payload, ex=int(ttl) if ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+_shared_backend = None
+_shared_unavailable = False
+
+def get_shared_backend() -> Optional[RedisBackend]:
+    """Lazily connect to CACHE_REDIS_URL; None when no shared cache is configured or it cannot be used."""
+    global _shared_backend, _shared_unavailable
+    if _shared_backend is None and settings.CACHE_REDIS_URL and not _shared_unavailable:
+        if not redis_available or not settings.CACHE_SIGNING_KEY:
+            reason = "the redis package is not installed" if not redis_available else "CACHE_SIGNING_KEY is not set"
+            logger.warning("shared cache disabled, using local cache only", extra={"reason": reason})
+            _shared_unavailable = True
+            return None
+        _shared_backend = RedisBackend(redis.Redis.from_url(settings.CACHE_REDIS_URL), settings.CACHE_SIGNING_KEY)
+    return _shared_backend
+
+def set_shared_backend(backend: Optional[RedisBackend]):
+    """Swap the shared tier, e.g. for a local stand-in."""
+    global _shared_backend
+    _shared_backend = backend
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache with per-entry expiry, optionally backed by a
+    shared tier that is consulted on local misses and written through on set.
+    Keys should already include anything that makes a value stale (model name,
+    index version) so that other processes never read outdated entries.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: Optional[float] = None, shared: bool = True):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"eazy:{self.name}:{key}"
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or MISSING."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+        backend = get_shared_backend() if self.shared else None
+        if backend is not None:
+            try:
+                value = backend.get(self._shared_key(key))
+            except Exception as e:
+                logger.warning("shared cache read failed", extra={"cache": self.name, "error": str(e)})
+                value = MISSING
+            if value is not MISSING:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return MISSING
+
+    def set(self, key: Hashable, value: Any):
+        self._store(key, value)
+        backend = get_shared_backend() if self.shared else None
+        if backend is not None:
+            try:
+                backend.set(self._shared_key(key), value, self.ttl)
+            except Exception as e:
+                logger.warning("shared cache write failed", extra={"cache": self.name, "error": str(e)})
+
+    def _store(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Drop one local entry."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop all local entries (shared entries age out or are keyed away)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters for every named cache."""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+def clear_caches():
+    """Drop the local entries of every named cache, e.g. so a benchmark starts cold."""
+    for cache in _registry.values():
+        cache.clear()
+
+def _lookup_samples():
+    for name, stats in cache_stats().items():
+        yield "eazy_cache_lookups_total", {"cache": name, "result": "hit"}, stats["hits"]
+        yield "eazy_cache_lookups_total", {"cache": name, "result": "miss"}, stats["misses"]
+
+register_collector("eazy_cache_lookups_total", "counter", "Cache lookups by cache and result", _lookup_samples)
+register_collector(
+    "eazy_cache_semantic_hits_total", "counter", "Hits answered by the similarity tier of a response cache",
+    lambda: [("eazy_cache_semantic_hits_total", {"cache": name}, stats["semantic_hits"])
+             for name, stats in cache_stats().items() if "semantic_hits" in stats],
+)
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+class CategoricalColumn:
+    """Low-cardinality string column stored as int32 codes into a small table of values."""
+
+    def __init__(self, codes: np.ndarray, categories: np.ndarray):
+        self.codes = codes
+        self.categories = categories
+
+    def __getitem__(self, i: int) -> Any:
+        code = self.codes[i]
+        return None if code < 0 else self.categories[code]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.categories.nbytes
+
+class StringColumn:
+    """
+    Text column stored as one UTF-8 byte buffer plus int64 offsets, so it can
+    be memory-mapped from disk. Missing and empty values both read as None.
+    """
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_values(cls, values) -> "StringColumn":
+        encoded = [b"" if _is_missing(v) else str(v).encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype="int64")
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype="uint8"))
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:end].tobytes().decode("utf-8") if end > start else None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.data.nbytes
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+class ProductRow(Mapping):
+    """
+    Read-only dict-like view of one catalog row. Missing (NaN/empty) fields are
+    treated as absent, so row.get('brand') returns the default instead of NaN.
+    """
+
+    __slots__ = ("_catalog", "_pos")
+
+    def __init__(self, catalog: "ProductCatalog", pos: int):
+        self._catalog = catalog
+        self._pos = pos
+
+    def __getitem__(self, key: str) -> Any:
+        column = self._catalog.columns.get(key)
+        if column is None:
+            raise KeyError(key)
+        value = column[self._pos]
+        if _is_missing(value):
+            raise KeyError(key)
+        return value.item() if isinstance(value, np.generic) else value
+
+    def __iter__(self) -> Iterator[str]:
+        for name, column in self._catalog.columns.items():
+            if not _is_missing(column[self._pos]):
+                yield name
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"ProductRow({self.to_dict()!r})"
+
+class ProductCatalog:
+    """
+    Columnar product table: one NumPy array per field instead of one dict per
+    product. Indexing and iteration yield ProductRow views, so code written
+    against a list of product dicts keeps working.
+    """
+
+    def __init__(self, columns: Dict[str, Any], length: int):
+        self.columns = columns
+        self._length = length
+
+    @classmethod
+    def empty(cls) -> "ProductCatalog":
+        return cls({}, 0)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, categorical_ratio: float = 0.5) -> "ProductCatalog":
+        """
+        Build a catalog from a DataFrame. Numeric columns stay as numeric arrays;
+        text columns become StringColumns, or codes + categories when fewer than
+        categorical_ratio of their values are distinct (brand, currency, ...).
+        """
+        columns = {}
+        for name in df.columns:
+            series = df[name]
+            key = str(name)
+            if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+                columns[key] = series.to_numpy()
+            elif len(series) and series.nunique(dropna=True) <= categorical_ratio * len(series):
+                categorical = pd.Categorical(series)
+                columns[key] = CategoricalColumn(
+                    categorical.codes.astype("int32"),
+                    np.asarray(categorical.categories, dtype=object),
+                )
+            else:
+                columns[key] = StringColumn.from_values(series.to_numpy(dtype=object))
+        return cls(columns, len(df))
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "ProductCatalog":
+        return cls.from_frame(pd.DataFrame.from_records(records)) if records else cls.empty()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, pos: int) -> ProductRow:
+        if pos < 0:
+            pos += self._length
+        if not 0 <= pos < self._length:
+            raise IndexError(pos)
+        return ProductRow(self, pos)
+
+    def __iter__(self) -> Iterator[ProductRow]:
+        for pos in range(self._length):
+            yield ProductRow(self, pos)
+
+    def column(self, name: str) -> Optional[Any]:
+        return self.columns.get(name)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the column buffers (for a mapped catalog, bytes on disk rather than in RAM)."""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def fingerprint(self) -> str:
+        """Content hash of the whole table, computed column by column."""
+        digest = hashlib.blake2b(digest_size=16)
+        for name in sorted(self.columns):
+            column = self.columns[name]
+            digest.update(name.encode("utf-8"))
+            if isinstance(column, CategoricalColumn):
+                digest.update(column.codes.tobytes())
+                digest.update(pd.util.hash_array(column.categories).tobytes())
+            elif isinstance(column, StringColumn):
+                digest.update(column.offsets.tobytes())
+                digest.update(column.data.tobytes())
+            else:
+                digest.update(pd.util.hash_array(column).tobytes())
+        return digest.hexdigest()
+
+    def save(self, directory: Path):
+        """
+        Write every column as .npy files plus a meta.json describing them. The
+        directory is written under a temporary name and renamed into place.
+        """
+        directory = Path(directory)
+        tmp = directory.with_name(f"{directory.name}.tmp{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        meta = {"length": self._length, "columns": []}
+        for i, (name, column) in enumerate(self.columns.items()):
+            if isinstance(column, CategoricalColumn):
+                np.save(tmp / f"{i}.codes.npy", column.codes)
+                entry = {"name": name, "kind": "categorical", "categories": column.categories.tolist()}
+            elif isinstance(column, StringColumn):
+                np.save(tmp / f"{i}.offsets.npy", column.offsets)
+                np.save(tmp / f"{i}.data.npy", column.data)
+                entry = {"name": name, "kind": "string"}
+            else:
+                np.save(tmp / f"{i}.npy", column)
+                entry = {"name": name, "kind": "numeric"}
+            meta["columns"].append(entry)
+        with (tmp / "meta.json").open("w", encoding="utf-8") as f:
+            json.dump(meta, f, default=str)
+        shutil.rmtree(directory, ignore_errors=True)
+        try:
+            os.replace(tmp, directory)
+        except OSError:
+            # Another process saved the same directory first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "ProductCatalog":
+        """
+        Open a catalog written by save(). With mmap the column buffers stay in
+        the OS page cache, so every process that opens the same files shares
+        one copy instead of holding its own.
+        """
+        directory = Path(directory)
+        mode = "r" if mmap else None
+        with (directory / "meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        columns = {}
+        for i, entry in enumerate(meta["columns"]):
+            if entry["kind"] == "categorical":
+                categories = np.empty(len(entry["categories"]), dtype=object)
+                categories[:] = entry["categories"]
+                columns[entry["name"]] = CategoricalColumn(np.load(directory / f"{i}.codes.npy", mmap_mode=mode), categories)
+            elif entry["kind"] == "string":
+                columns[entry["name"]] = StringColumn(
+                    np.load(directory / f"{i}.offsets.npy", mmap_mode=mode),
+                    np.load(directory / f"{i}.data.npy", mmap_mode=mode),
+                )
+            else:
+                columns[entry["name"]] = np.load(directory / f"{i}.npy", mmap_mode=mode)
+        return cls(columns, meta["length"])
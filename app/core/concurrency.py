@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings
+
+# Global variables for lazy loading
+_cpu_executor = None
+_wait_executor = None
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Bounded pool for blocking work (embedding, FAISS search) kept off the event loop."""
+    global _cpu_executor
+    if _cpu_executor is None:
+        workers = settings.CPU_WORKERS or min(4, os.cpu_count() or 1)
+        _cpu_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cpu")
+    return _cpu_executor
+
+def get_wait_executor() -> ThreadPoolExecutor:
+    """
+    Wider pool for blocking calls that mostly wait, like searches queued on the
+    search batcher; the CPU pool would cap how many can share a batch.
+    """
+    global _wait_executor
+    if _wait_executor is None:
+        _wait_executor = ThreadPoolExecutor(max_workers=settings.SEARCH_BATCH_MAX_SIZE, thread_name_prefix="wait")
+    return _wait_executor
+
+async def run_waiting(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking function that mostly waits in the wait pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_wait_executor(), functools.partial(func, *args, **kwargs))
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking function in the CPU pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(func, *args, **kwargs))
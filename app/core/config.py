@@ -8,5 +8,122 @@ class Settings:
     TWILIO_AUTH_TOKEN: str = os.getenv("TWILIO_AUTH_TOKEN")
     ASSEMBLYAI_API_KEY: str = os.getenv("ASSEMBLYAI_API_KEY")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    TWILIO_WHATSAPP_NUMBER: str = os.getenv("TWILIO_WHATSAPP_NUMBER")
+    TWILIO_API_BASE: str = os.getenv("TWILIO_API_BASE", "https://api.twilio.com")
+
+    # Reply delivery: "sync" answers in the webhook's TwiML, "async" acknowledges
+    # at once and sends the reply through the Twilio REST API from a worker pool
+    REPLY_MODE: str = os.getenv("REPLY_MODE", "sync").lower()
+    DELIVERY_WORKERS: int = int(os.getenv("DELIVERY_WORKERS", "8"))
+    DELIVERY_MAX_PENDING: int = int(os.getenv("DELIVERY_MAX_PENDING", "1000"))
+
+    # Request-path logs: "json" (one object per line) or "text"
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json").lower()
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+
+    # Transcript log (SQLite); off by default, since inbound messages are personal data
+    STORE_TRANSCRIPTS: bool = os.getenv("STORE_TRANSCRIPTS", "false").lower() == "true"
+    STORAGE_FILE: str = os.getenv("STORAGE_FILE", "./data/transcripts.db")
+
+    # Detect language, intent and query in one LLM call (falls back to one call per step)
+    COMBINED_UNDERSTAND: bool = os.getenv("COMBINED_UNDERSTAND", "true").lower() == "true"
+
+    # Shared LLM clients: per-model concurrency cap, timeout per attempt, retries
+    # with jittered backoff, and a circuit breaker after consecutive provider errors
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BASE_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+    LLM_RETRY_MAX_SECONDS: float = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+    LLM_BREAKER_THRESHOLD: int = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+    LLM_BREAKER_COOLDOWN_SECONDS: float = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+    # Cached LLM results for greetings, intents and query extraction; the semantic
+    # tier also reuses the answer for a near-duplicate message (MiniLM cosine)
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+    SEMANTIC_CACHE: bool = os.getenv("SEMANTIC_CACHE", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+    # Local language/intent tier consulted before the LLM
+    LOCAL_CLASSIFIER: bool = os.getenv("LOCAL_CLASSIFIER", "true").lower() == "true"
+    LOCAL_LANGUAGE_CONFIDENCE: float = float(os.getenv("LOCAL_LANGUAGE_CONFIDENCE", "0.8"))
+    LOCAL_INTENT_THRESHOLD: float = float(os.getenv("LOCAL_INTENT_THRESHOLD", "0.8"))
+    LOCAL_INTENT_MARGIN: float = float(os.getenv("LOCAL_INTENT_MARGIN", "0.1"))
+
+    # Threads for blocking embedding/FAISS work (0 = min(4, CPU count))
+    CPU_WORKERS: int = int(os.getenv("CPU_WORKERS", "0"))
+
+    # Voice-note transcription
+    STT_MAX_CONCURRENCY: int = int(os.getenv("STT_MAX_CONCURRENCY", "8"))
+    STT_TIMEOUT_SECONDS: int = int(os.getenv("STT_TIMEOUT_SECONDS", "120"))
+    STT_CACHE_SIZE: int = int(os.getenv("STT_CACHE_SIZE", "2000"))
+    STT_MAX_AUDIO_BYTES: int = int(os.getenv("STT_MAX_AUDIO_BYTES", str(16 * 1024 * 1024)))  # WhatsApp's media cap
+
+    # Catalog loading: parallel S3 downloads, local snapshot, refresh on startup
+    S3_MAX_WORKERS: int = int(os.getenv("S3_MAX_WORKERS", "8"))
+    CATALOG_SNAPSHOT_DIR: str = os.getenv("CATALOG_SNAPSHOT_DIR", "./data/catalog")
+    CATALOG_REFRESH_ON_STARTUP: bool = os.getenv("CATALOG_REFRESH_ON_STARTUP", "true").lower() == "true"
+    CATALOG_REFRESH_INTERVAL_SECONDS: int = int(os.getenv("CATALOG_REFRESH_INTERVAL_SECONDS", "0"))  # 0 = off
+
+    # Required as X-Admin-Token on /admin endpoints; they answer 503 while unset
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN")
+
+    # Load catalog, index, embedding model and LLM clients in background threads at startup
+    # (false: load each on first use); /readyz reports progress
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+    # Multi-worker serving: map the index read-only so workers share it, and
+    # load everything in the parent before gunicorn forks its workers
+    SHARED_READONLY: bool = os.getenv("SHARED_READONLY", "false").lower() == "true"
+    PRELOAD_BEFORE_FORK: bool = os.getenv("PRELOAD_BEFORE_FORK", "false").lower() == "true"
+
+    # Embedding pipeline
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+    EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", "1"))
+    # "torch" (SentenceTransformer) or "onnx" (ONNX Runtime, exported ahead of time to ONNX_MODEL_DIR)
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    ONNX_MODEL_DIR: str = os.getenv("ONNX_MODEL_DIR", "./data/onnx")
+    ONNX_QUANTIZE: bool = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+    ONNX_THREADS: int = int(os.getenv("ONNX_THREADS", "0"))  # 0 = ONNX Runtime default
+
+    # FAISS index: flat | ivf_flat | ivf_pq | hnsw
+    FAISS_INDEX_TYPE: str = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+    FAISS_NLIST: int = int(os.getenv("FAISS_NLIST", "1024"))
+    FAISS_NPROBE: int = int(os.getenv("FAISS_NPROBE", "16"))
+    FAISS_PQ_M: int = int(os.getenv("FAISS_PQ_M", "48"))
+    FAISS_HNSW_M: int = int(os.getenv("FAISS_HNSW_M", "32"))
+    FAISS_EF_SEARCH: int = int(os.getenv("FAISS_EF_SEARCH", "64"))
+    FAISS_TRAIN_SAMPLE: int = int(os.getenv("FAISS_TRAIN_SAMPLE", "50000"))
+
+    # Retrieval: "vector" (FAISS only) or "hybrid" (BM25 + FAISS, fused by reciprocal rank)
+    SEARCH_MODE: str = os.getenv("SEARCH_MODE", "hybrid").lower()
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "50"))
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    # Optional cross-encoder pass over the top fused candidates ("none" or "cross_encoder")
+    RERANKER: str = os.getenv("RERANKER", "none").lower()
+    RERANKER_MODEL: str = os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+    RERANK_DEPTH: int = int(os.getenv("RERANK_DEPTH", "20"))
+
+    # Micro-batching: concurrent searches share one encode and one FAISS search
+    SEARCH_BATCHING: bool = os.getenv("SEARCH_BATCHING", "true").lower() == "true"
+    SEARCH_BATCH_WINDOW_MS: float = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "3"))
+    SEARCH_BATCH_MAX_SIZE: int = int(os.getenv("SEARCH_BATCH_MAX_SIZE", "32"))
+
+    # Caches (CACHE_REDIS_URL enables a shared tier across processes)
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL")
+    CACHE_SIGNING_KEY: str = os.getenv("CACHE_SIGNING_KEY", "")  # HMAC key for shared entries; required with CACHE_REDIS_URL
+    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+    QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+    SEARCH_CACHE_SIZE: int = int(os.getenv("SEARCH_CACHE_SIZE", "10000"))
+
+    # Per-user sessions (last turns, search and results), so follow-ups such as "cheaper ones?"
+    # or "show more" skip the LLM steps; kept in the shared cache tier when CACHE_REDIS_URL is set
+    SESSIONS: bool = os.getenv("SESSIONS", "true").lower() == "true"
+    SESSION_MAX_USERS: int = int(os.getenv("SESSION_MAX_USERS", "10000"))
+    SESSION_TTL_SECONDS: int = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+    SESSION_MAX_TURNS: int = int(os.getenv("SESSION_MAX_TURNS", "6"))
+    SESSION_TURN_CHARS: int = int(os.getenv("SESSION_TURN_CHARS", "300"))
 
 settings = Settings()
\ No newline at end of file
@@ -1,26 +1,411 @@
-from sentence_transformers import SentenceTransformer
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.core.metrics import embedding_seconds
+
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+EMBEDDING_DIM = 384  # output size of MODEL_NAME
+
+# "torch" runs the SentenceTransformer; "onnx" an exported copy on ONNX Runtime
+EMBEDDING_BACKENDS = ("torch", "onnx")
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+ONNX_CONFIG_FILE = "onnx_config.json"
+PARITY_MIN_COSINE = 0.98  # int8 ONNX vs PyTorch, below this the index would drift
 
 # Global variable to store the model (lazy loaded)
 _model = None
+_model_lock = threading.Lock()
+
+# Shoppers repeat the same short queries, so query vectors are cached
+query_embedding_cache = TTLCache(
+    "query_embeddings",
+    maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=settings.CACHE_TTL_SECONDS,
+)
+
+class OnnxEmbedder:
+    """
+    Drop-in for SentenceTransformer.encode backed by an ONNX export of
+    MODEL_NAME: tokenize, run the transformer on ONNX Runtime and mean-pool
+    over the attention mask, as the SentenceTransformer pipeline does. Output
+    stays 384-dim, so indexes built with the PyTorch model remain valid.
+    """
+
+    def __init__(self, model_dir: Path, quantized: bool = True, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        with (model_dir / ONNX_CONFIG_FILE).open("r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_length"])
+        self.tokenizer.enable_padding(pad_id=config["pad_id"], pad_token=config["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        path = model_dir / (ONNX_INT8_FILE if quantized else ONNX_FILE)
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.empty((len(texts), EMBEDDING_DIM), dtype="float32")
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            ids = np.array([e.ids for e in encodings], dtype="int64")
+            mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+            hidden = self.session.run(None, feeds)[0]
+            weights = mask[..., None].astype("float32")
+            out[start:start + len(encodings)] = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+def export_onnx(model_dir: Path, quantize: bool = True) -> Path:
+    """
+    Export MODEL_NAME's transformer to model_dir/model.onnx, plus an int8
+    dynamically quantized copy and the tokenizer. Needs torch and
+    sentence-transformers; serving the result needs only onnxruntime and tokenizers.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    print(f"🔄 Exporting {MODEL_NAME} to ONNX in {model_dir}...")
+    st_model = SentenceTransformer(MODEL_NAME, device="cpu")
+    tokenizer = st_model.tokenizer
+
+    class _Transformer(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    sample = tokenizer(["hello world", "مرحبا بالعالم"], padding=True, return_tensors="pt")
+    export_args = dict(
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={name: {0: "batch", 1: "sequence"} for name in ("input_ids", "attention_mask", "last_hidden_state")},
+        opset_version=14,
+    )
+    module = _Transformer(st_model[0].auto_model).eval()
+    inputs = (sample["input_ids"], sample["attention_mask"])
+    with torch.no_grad():
+        try:
+            torch.onnx.export(module, inputs, str(model_dir / ONNX_FILE), dynamo=False, **export_args)
+        except TypeError:
+            # torch < 2.5 has no dynamo switch and always uses the TorchScript exporter
+            torch.onnx.export(module, inputs, str(model_dir / ONNX_FILE), **export_args)
+    tokenizer.save_pretrained(str(model_dir))
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(model_dir / ONNX_FILE), str(model_dir / ONNX_INT8_FILE), weight_type=QuantType.QInt8)
+    with (model_dir / ONNX_CONFIG_FILE).open("w", encoding="utf-8") as f:
+        json.dump({
+            "model": MODEL_NAME,
+            "dim": EMBEDDING_DIM,
+            "max_length": st_model.max_seq_length,
+            "pad_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+        }, f, indent=2)
+    print("✅ ONNX export complete")
+    return model_dir
+
+def has_onnx_export(model_dir: Path, quantized: bool = True) -> bool:
+    model_dir = Path(model_dir)
+    return (model_dir / ONNX_CONFIG_FILE).exists() and (model_dir / (ONNX_INT8_FILE if quantized else ONNX_FILE)).exists()
+
+def load_onnx_model() -> OnnxEmbedder:
+    """
+    Load the ONNX backend from ONNX_MODEL_DIR. The export must exist already:
+    serving with ONNX needs neither torch nor sentence-transformers.
+    """
+    model_dir = Path(settings.ONNX_MODEL_DIR)
+    quantized = settings.ONNX_QUANTIZE
+    if not has_onnx_export(model_dir, quantized):
+        raise FileNotFoundError(
+            f"No ONNX export of {MODEL_NAME} in {model_dir}; run `python -m app.core.embedding_model export` "
+            f"(needs torch and sentence-transformers) before serving with EMBEDDING_BACKEND=onnx"
+        )
+    return OnnxEmbedder(model_dir, quantized=quantized, threads=settings.ONNX_THREADS)
 
 def get_model():
-    """Lazy load the embedding model to avoid blocking startup."""
+    """Lazy load the embedding model (backend chosen by EMBEDDING_BACKEND) to avoid blocking startup."""
     global _model
     if _model is None:
-        print("🔄 Loading embedding model...")
-        _model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        print("✅ Embedding model loaded successfully!")
+        with _model_lock:
+            if _model is None:
+                backend = settings.EMBEDDING_BACKEND
+                if backend not in EMBEDDING_BACKENDS:
+                    raise ValueError(f"EMBEDDING_BACKEND must be one of {EMBEDDING_BACKENDS}, got {backend!r}")
+                print(f"🔄 Loading embedding model ({backend})...")
+                if backend == "onnx":
+                    _model = load_onnx_model()
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    _model = SentenceTransformer(MODEL_NAME)
+                print("✅ Embedding model loaded successfully!")
     return _model
 
+def is_model_loaded() -> bool:
+    """Whether the embedding model is in memory; never triggers a load."""
+    return _model is not None
+
+def warm_model():
+    """
+    Load the model and encode a few English and Arabic texts, so the first
+    user request does not pay for lazy initialisation inside the backend.
+    """
+    model = get_model()
+    with embedding_seconds.time(call="warmup"):
+        model.encode(SAMPLE_TEXTS, batch_size=len(SAMPLE_TEXTS), convert_to_numpy=True,
+                     normalize_embeddings=True, show_progress_bar=False)
+
+def _cache_key(text: str, normalize: bool):
+    # Backends agree closely but not bit-for-bit, so each keeps its own vectors
+    return (MODEL_NAME, settings.EMBEDDING_BACKEND, normalize, " ".join(text.split()))
+
 def get_embedding_model():
     """Returns a singleton instance of the SentenceTransformer model."""
     return get_model()
 
-def embed_text(text: str):
+def embed_text(text: str, normalize: bool = True):
     """
-    Convert the input text into a dense vector embedding using the 
+    Convert the input text into a dense vector embedding using the
     multilingual MiniLM model.
     Works for Arabic, English, and many other languages.
+    Results are cached; the returned array is read-only.
     """
+    key = _cache_key(text, normalize)
+    vector = query_embedding_cache.get(key)
+    if vector is MISSING:
+        model = get_model()
+        with embedding_seconds.time(call="query"):
+            vector = model.encode(text, convert_to_numpy=True, normalize_embeddings=normalize)
+        vector.setflags(write=False)
+        query_embedding_cache.set(key, vector)
+    return vector
+
+def cached_embedding(text: str, normalize: bool = True) -> Optional[np.ndarray]:
+    """The query cache's vector for text, or None; never runs the model."""
+    vector = query_embedding_cache.get(_cache_key(text, normalize))
+    return None if vector is MISSING else vector
+
+def remember_embedding(text: str, vector: np.ndarray, normalize: bool = True):
+    """Put back a vector kept elsewhere (a user's session) so the next search skips the encode."""
+    key = _cache_key(text, normalize)
+    if query_embedding_cache.get(key) is MISSING:
+        vector = np.asarray(vector, dtype="float32")
+        vector.setflags(write=False)
+        query_embedding_cache.set(key, vector)
+
+def embed_queries(texts: List[str], normalize: bool = True) -> np.ndarray:
+    """
+    Embed several queries with one model.encode call for those not already in
+    the query cache. Returns a (len(texts), EMBEDDING_DIM) float32 matrix.
+    """
+    keys = [_cache_key(text, normalize) for text in texts]
+    out = np.empty((len(texts), EMBEDDING_DIM), dtype="float32")
+    missing = []
+    for row, key in enumerate(keys):
+        vector = query_embedding_cache.get(key)
+        if vector is MISSING:
+            missing.append(row)
+        else:
+            out[row] = vector
+    if missing:
+        model = get_model()
+        with embedding_seconds.time(call="queries"):
+            vectors = model.encode(
+                [texts[row] for row in missing],
+                batch_size=len(missing),
+                convert_to_numpy=True,
+                normalize_embeddings=normalize,
+                show_progress_bar=False,
+            )
+        for row, vector in zip(missing, vectors):
+            vector.setflags(write=False)
+            query_embedding_cache.set(keys[row], vector)
+            out[row] = vector
+    return out
+
+class EmbeddingProgress:
+    """Tracks how many texts have been embedded and the running throughput."""
+
+    def __init__(self, total: int, label: str = "embeddings"):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.started_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def rate(self) -> float:
+        """Texts embedded per second so far."""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def update(self, count: int):
+        self.done += count
+        print(f"🔄 {self.label}: {self.done}/{self.total} ({self.rate:.0f}/s)")
+
+    def finish(self):
+        print(f"✅ {self.label}: {self.done} texts in {self.elapsed:.1f}s ({self.rate:.0f}/s)")
+
+def embed_batch(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    normalize: bool = True,
+    chunk_size: int = 10000,
+    out: Optional[np.ndarray] = None,
+    progress: bool = True,
+) -> np.ndarray:
+    """
+    Embed many texts at once and return a (len(texts), EMBEDDING_DIM) float32 matrix.
+
+    Texts are fed to the model in chunks of ``chunk_size``; each chunk is encoded
+    in batches of ``batch_size`` and copied straight into a preallocated matrix
+    (or ``out`` when given). With ``workers > 1`` the chunks are encoded through a
+    SentenceTransformer multi-process pool spread across CPU cores.
+    """
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    workers = workers if workers is not None else settings.EMBEDDING_WORKERS
+
+    if out is None:
+        out = np.empty((len(texts), EMBEDDING_DIM), dtype="float32")
+    elif out.shape != (len(texts), EMBEDDING_DIM) or out.dtype != np.float32:
+        raise ValueError(f"out must be a float32 array of shape ({len(texts)}, {EMBEDDING_DIM})")
+    if not texts:
+        return out
+
     model = get_model()
-    return model.encode(text, convert_to_numpy=True)
\ No newline at end of file
+    tracker = EmbeddingProgress(len(texts)) if progress else None
+    pool = None
+    if workers > 1 and settings.EMBEDDING_BACKEND != "torch":
+        # ONNX Runtime already spreads one session across cores
+        print("⚠️ EMBEDDING_WORKERS is ignored by the onnx backend")
+    elif workers > 1:
+        print(f"🔄 Starting embedding pool with {workers} workers...")
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+    try:
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            chunk_started = time.perf_counter()
+            if pool is not None:
+                vectors = model.encode_multi_process(
+                    chunk, pool, batch_size=batch_size, normalize_embeddings=normalize
+                )
+            else:
+                vectors = model.encode(
+                    chunk,
+                    batch_size=batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=normalize,
+                    show_progress_bar=False,
+                )
+            out[start:start + len(chunk)] = vectors
+            embedding_seconds.observe(time.perf_counter() - chunk_started, call="batch")
+            if tracker:
+                tracker.update(len(chunk))
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    if tracker:
+        tracker.finish()
+    return out
+
+# Mixed English/Arabic shopping queries for warmup and the backend comparison
+SAMPLE_TEXTS = [
+    "hi", "running shoes under 200 AED", "men's perfume with oud", "iphone 15 pro max 256gb",
+    "cheap laptop for students", "samsung galaxy s24 ultra case", "smart watch for women",
+    "wireless earbuds with noise cancelling", "kids school backpack", "leather wallet for men",
+    "مرحبا", "أريد عطر رجالي", "أبحث عن حذاء رياضي", "هل لديك هاتف سامسونج", "ابغى ساعة ذكية رخيصة",
+    "لابتوب للألعاب", "سماعات بلوتوث", "حقيبة يد نسائية جلد", "ملابس أطفال قطن", "قهوة عربية",
+]
+
+def backend_report(texts: Optional[List[str]] = None, runs: int = 50) -> Dict[str, float]:
+    """
+    Compare the ONNX backend with the PyTorch model: cosine similarity of their
+    embeddings (parity), load time, single-query latency and batch throughput.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    texts = texts or SAMPLE_TEXTS
+    started = time.perf_counter()
+    torch_model = SentenceTransformer(MODEL_NAME, device="cpu")
+    torch_load = time.perf_counter() - started
+    if not has_onnx_export(settings.ONNX_MODEL_DIR, settings.ONNX_QUANTIZE):
+        export_onnx(Path(settings.ONNX_MODEL_DIR), quantize=settings.ONNX_QUANTIZE)
+    started = time.perf_counter()
+    onnx_model = load_onnx_model()
+    onnx_load = time.perf_counter() - started
+
+    reference = torch_model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    candidate = onnx_model.encode(texts, normalize_embeddings=True)
+    cosines = (reference * candidate).sum(axis=1)
+
+    def latency(model) -> float:
+        timings = []
+        for i in range(runs):
+            query = texts[i % len(texts)]
+            t = time.perf_counter()
+            model.encode(query, convert_to_numpy=True, normalize_embeddings=True)
+            timings.append(time.perf_counter() - t)
+        return float(np.percentile(timings, 50)) * 1000
+
+    def throughput(model) -> float:
+        batch = (texts * (256 // len(texts) + 1))[:256]
+        t = time.perf_counter()
+        model.encode(batch, batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+        return len(batch) / (time.perf_counter() - t)
+
+    report = {
+        "min_cosine": round(float(cosines.min()), 4),
+        "mean_cosine": round(float(cosines.mean()), 4),
+        "torch_load_s": round(torch_load, 2),
+        "onnx_load_s": round(onnx_load, 2),
+        "torch_p50_ms": round(latency(torch_model), 2),
+        "onnx_p50_ms": round(latency(onnx_model), 2),
+        "torch_texts_per_s": round(throughput(torch_model), 1),
+        "onnx_texts_per_s": round(throughput(onnx_model), 1),
+    }
+    print("📊 " + "  ".join(f"{key}={value}" for key, value in report.items()))
+    if report["min_cosine"] < PARITY_MIN_COSINE:
+        print(f"⚠️ ONNX embeddings drift from PyTorch (min cosine {report['min_cosine']} < {PARITY_MIN_COSINE})")
+    else:
+        print("✅ ONNX embeddings match PyTorch")
+    return report
+
+if __name__ == "__main__":
+    # python -m app.core.embedding_model [export]
+    if sys.argv[1:] == ["export"]:
+        export_onnx(Path(settings.ONNX_MODEL_DIR), quantize=settings.ONNX_QUANTIZE)
+    else:
+        backend_report()
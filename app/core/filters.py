@@ -0,0 +1,163 @@
+import re
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, field_validator
+
+DEFAULT_CURRENCY = "AED"  # prices without a currency are shown (and filtered) as AED
+
+# Filterable field -> catalog columns it may live in, in order of preference
+FILTER_FIELDS = {
+    "brand": ("brand",),
+    "category": ("category", "type"),
+    "currency": ("currency",),
+}
+PRICE_FIELDS = ("price", "sale_price")
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+def normalize_value(value: Any) -> str:
+    """Case- and whitespace-insensitive form of a field value."""
+    return " ".join(str(value).casefold().split())
+
+class SearchFilters(BaseModel):
+    """Structured constraints extracted from a shopping message."""
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    brand: Optional[str] = None
+    category: Optional[str] = None
+    currency: Optional[str] = None
+
+    @field_validator("brand", "category", "currency", mode="before")
+    @classmethod
+    def _blank_to_none(cls, value):
+        if value is None or not str(value).strip():
+            return None
+        return str(value).strip()
+
+    @field_validator("min_price", "max_price", mode="before")
+    @classmethod
+    def _coerce_price(cls, value):
+        if value is None or value == "":
+            return None
+        if isinstance(value, str):
+            match = _NUMBER_RE.search(value.replace(",", ""))
+            return float(match.group(0)) if match else None
+        return value
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in self.model_dump().values())
+
+    def key(self) -> Tuple:
+        """Hashable form for cache keys."""
+        return tuple(normalize_value(v) if isinstance(v, str) else v for v in self.model_dump().values())
+
+def _parse_price(value: Any) -> float:
+    if value is None:
+        return np.nan
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    match = _NUMBER_RE.search(str(value).replace(",", ""))
+    return float(match.group(0)) if match else np.nan
+
+def product_price(product) -> float:
+    """First parseable price field of a product; NaN when it has none."""
+    for field in PRICE_FIELDS:
+        price = _parse_price(product.get(field))
+        if not np.isnan(price):
+            return price
+    return np.nan
+
+class FilterIndex:
+    """
+    Per-field lookup tables over a catalog, built once per catalog generation:
+    a float price array and, for brand/category/currency, the positions of
+    every distinct (normalised) value. mask() turns SearchFilters into a
+    boolean array over catalog positions with a few NumPy operations.
+    """
+
+    def __init__(self, products):
+        started = time.perf_counter()
+        self.size = len(products)
+        self.price = self._price_array(products)
+        self.values: Dict[str, Dict[str, np.ndarray]] = {}
+        for field, names in FILTER_FIELDS.items():
+            column = next((products.column(name) for name in names if products.column(name) is not None), None)
+            if column is not None:
+                self.values[field] = self._value_positions(column)
+        self.build_seconds = time.perf_counter() - started
+
+    def _price_array(self, products) -> Optional[np.ndarray]:
+        column = next((products.column(name) for name in PRICE_FIELDS if products.column(name) is not None), None)
+        if column is None:
+            return None
+        if isinstance(column, np.ndarray) and np.issubdtype(column.dtype, np.number):
+            return column.astype("float64")
+        return np.fromiter((_parse_price(column[i]) for i in range(self.size)), dtype="float64", count=self.size)
+
+    def _value_positions(self, column) -> Dict[str, np.ndarray]:
+        from app.core.catalog import CategoricalColumn  # not at the top: catalog pulls in pandas
+        if isinstance(column, CategoricalColumn):
+            # Group positions by code without touching each row in Python
+            codes = np.asarray(column.codes)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(column.categories) + 1))
+            groups = {}
+            for code, value in enumerate(column.categories):
+                key = normalize_value(value)
+                positions = order[bounds[code]:bounds[code + 1]]
+                groups[key] = np.concatenate([groups[key], positions]) if key in groups else positions
+            return groups
+        groups = {}
+        for pos in range(self.size):
+            value = column[pos]
+            if value is not None and value == value:
+                groups.setdefault(normalize_value(value), []).append(pos)
+        return {key: np.asarray(positions, dtype="int64") for key, positions in groups.items()}
+
+    def _value_mask(self, field: str, value: str) -> Optional[np.ndarray]:
+        """
+        Rows whose field equals value, or contains it as a word when nothing is
+        equal. None when the catalog has no such column or value: an unknown
+        brand or category then only steers the query text instead of emptying
+        the results.
+        """
+        groups = self.values.get(field)
+        if groups is None:
+            return None
+        wanted = normalize_value(value)
+        keys = [wanted] if wanted in groups else [key for key in groups if re.search(rf"\b{re.escape(wanted)}\b", key)]
+        if not keys and not (field == "currency" and wanted == normalize_value(DEFAULT_CURRENCY)):
+            return None
+        mask = np.zeros(self.size, dtype=bool)
+        for key in keys:
+            mask[groups[key]] = True
+        if field == "currency" and wanted == normalize_value(DEFAULT_CURRENCY):
+            # Rows without a currency count as the default one
+            known = np.zeros(self.size, dtype=bool)
+            for positions in groups.values():
+                known[positions] = True
+            mask |= ~known
+        return mask
+
+    def mask(self, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+        """Boolean array over catalog positions, or None when nothing constrains the search."""
+        if filters is None or filters.is_empty():
+            return None
+        mask = None
+        if self.price is not None and (filters.min_price is not None or filters.max_price is not None):
+            with np.errstate(invalid="ignore"):
+                mask = ~np.isnan(self.price)
+                if filters.min_price is not None:
+                    mask &= self.price >= filters.min_price
+                if filters.max_price is not None:
+                    mask &= self.price <= filters.max_price
+        for field in FILTER_FIELDS:
+            value = getattr(filters, field)
+            if value is None:
+                continue
+            field_mask = self._value_mask(field, value)
+            if field_mask is not None:
+                mask = field_mask if mask is None else mask & field_mask
+        return mask
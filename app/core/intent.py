@@ -1,33 +1,39 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage
+from langchain_core.messages import HumanMessage
+from app.core.cache import MISSING
+from app.core.llm import get_llm
+from app.core.logs import get_logger
+from app.core.metrics import fallback
 from app.core.prompts import INTENT_PROMPT
 from app.core.config import settings
+from app.core.response_cache import ResponseCache
 
-# Global variable for lazy loading
-_llm_model = None
+# Intents per message and language; rephrasings of a cached message reuse its intent
+intent_cache = ResponseCache("intents", loose=True, semantic=True)
+logger = get_logger("intent")
 
-def get_llm_model():
-    """Lazy load the LLM model to avoid blocking startup."""
-    global _llm_model
-    if _llm_model is None:
-        print("🔄 Loading Gemini LLM model for intent detection...")
-        _llm_model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
-        print("✅ Gemini LLM model for intent detection loaded successfully!")
-    return _llm_model
+def _parse_intent(content: str) -> str:
+    intent = content.strip().lower()
+    for valid_intent in ["greet", "product_recommend", "smalltalk"]:
+        if valid_intent in intent:
+            return valid_intent
+    return "product_recommend"
 
-def detect_intent_llm(text: str, language: str) -> str:
+async def adetect_intent_llm(text: str, language: str) -> str:
+    """Classifies the message as greet, product_recommend or smalltalk using the LLM."""
     if not text:
         return "smalltalk"
+    cached = await intent_cache.alookup(text, language)
+    if cached is not MISSING:
+        return cached
     prompt_text = INTENT_PROMPT.format(text=text, language=language)
     try:
-        llm_model = get_llm_model()
+        llm_model = get_llm()
         human_message = HumanMessage(content=prompt_text)
-        response = llm_model.invoke([human_message])
-        intent = response.content.strip().lower()
-        for valid_intent in ["greet", "product_recommend", "smalltalk"]:
-            if valid_intent in intent:
-                return valid_intent
-        return "product_recommend"
+        response = await llm_model.ainvoke([human_message])
+        intent = _parse_intent(response.content)
+        intent_cache.store(text, language, intent)
+        return intent
     except Exception as e:
-        print(f"[detect_intent_llm] Gemini error: {e}")
+        logger.warning("intent detection failed", extra={"func": "adetect_intent_llm", "error": str(e)})
+        fallback("intent")
         return "product_recommend"
\ No newline at end of file
@@ -1,84 +1,237 @@
 # app/core/langgraph_app.py
-from langgraph.graph import StateGraph, END
+import threading
+import time
 from app.core.state import AgentState
-from app.core.language import detect_language
-from app.core.intent import detect_intent_llm
-from app.core.query_extraction import extract_query
-from app.agents.tools import product_recommend, chat_greet
-from typing import Any
-
-def node_normalize(state: AgentState) -> dict:
-    """Normalizes the input by detecting language."""
-    state['language'] = state.get('language') or detect_language(state['text'])
+from app.core.language import adetect_language
+from app.core.intent import adetect_intent_llm
+from app.core.query_extraction import aextract_query
+from app.core.understand import aunderstand_message
+from app.core.filters import SearchFilters
+from app.core.local_classifier import detect_language_local, classify_intent_local, record_tier
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.core.logs import get_logger
+from app.core.metrics import fallback, observe_stage
+from app.core.session import get_session_store, record_turn, refine_from_session
+from app.agents.tools import aproduct_recommend, achat_greet
+from typing import Awaitable, Callable
+
+logger = get_logger("graph")
+
+def _local_language(state: AgentState):
+    if not settings.LOCAL_CLASSIFIER:
+        return None
+    return detect_language_local(state['text'])[0]
+
+async def _local_intent(state: AgentState):
+    if not settings.LOCAL_CLASSIFIER:
+        return None
+    try:
+        # Embeds the message, so it runs in the CPU pool
+        return (await run_blocking(classify_intent_local, state['text']))[0]
+    except Exception as e:
+        logger.warning("local intent classifier failed", extra={"error": str(e)})
+        fallback("local_intent")
+        return None
+
+async def node_refine(state: AgentState) -> dict:
+    """Answers follow-ups such as "cheaper ones?" from the user's last search, without any LLM call."""
+    if 'debug' not in state:
+        state['debug'] = {}
+    refined = refine_from_session(state.get('session'), state['text'])
+    if refined is not None:
+        state.update(refined)
+        state['debug'].update(refinement=state['refinement'], language=state['language'],
+                              query=state['query'], filters=state['filters'])
+    return state
+
+async def node_understand(state: AgentState) -> dict:
+    """Detects language, intent and search query locally or with one structured LLM call."""
+    if 'debug' not in state:
+        state['debug'] = {}
+
+    # Greetings and small talk are answered locally without any LLM call
+    language = state.get('language') or _local_language(state)
+    intent = await _local_intent(state) if language else None
+    if intent in ["greet", "smalltalk"]:
+        state['language'] = language
+        state['intent'] = intent
+        record_tier("language", "local")
+        record_tier("intent", "local")
+        state['debug'].update(understand="local", language=language, intent=intent)
+        return state
+
+    result = await aunderstand_message(state['text']) if settings.COMBINED_UNDERSTAND else None
+    if result is None:
+        state['debug']['understand'] = "fallback"
+        return state
+    state['language'] = language or result.language
+    state['intent'] = result.intent
+    state['query'] = result.query or None
+    state['filters'] = result.filters.model_dump(exclude_none=True) or None
+    record_tier("language", "local" if language else "llm")
+    record_tier("intent", "llm")
+    state['debug'].update(understand="combined", language=state['language'], intent=state['intent'],
+                          query=state['query'], filters=state['filters'])
+    return state
+
+async def node_normalize(state: AgentState) -> dict:
+    """Normalizes the input by detecting language, locally when the script is unambiguous."""
+    if not state.get('language'):
+        language = _local_language(state)
+        record_tier("language", "local" if language else "llm")
+        state['language'] = language or await adetect_language(state['text'])
     if 'debug' not in state:
         state['debug'] = {}
     state['debug']['language'] = state['language']
     return state
 
-def node_intent(state: AgentState) -> dict:
-    """Detects the intent of the message."""
-    state['intent'] = detect_intent_llm(state['text'], state['language'])
+async def node_intent(state: AgentState) -> dict:
+    """Detects the intent of the message, locally when the classifier is confident."""
+    intent = await _local_intent(state)
+    record_tier("intent", "local" if intent else "llm")
+    state['intent'] = intent or await adetect_intent_llm(state['text'], state['language'])
     if 'debug' not in state:
         state['debug'] = {}
     state['debug']['intent'] = state['intent']
     return state
 
-def node_query_extraction(state: AgentState) -> dict:
-    """Extracts a search query from the user's text for product recommendation."""
-    state['query'] = extract_query(state['text'], state['language'])
+async def node_query_extraction(state: AgentState) -> dict:
+    """Extracts a search query and filters from the user's text for product recommendation."""
+    query, filters = await aextract_query(state['text'], state['language'])
+    state['query'] = query
+    state['filters'] = filters.model_dump(exclude_none=True) or None
     if 'debug' not in state:
         state['debug'] = {}
-    state['debug']['query'] = state['query']
+    state['debug'].update(query=state['query'], filters=state['filters'])
     return state
 
-def node_recommend(state: AgentState) -> dict:
+async def node_recommend(state: AgentState) -> dict:
     """Calls the product recommendation tool and saves the content to the state."""
-    reply = product_recommend(state['query'], state['language'])
+    filters = SearchFilters(**state['filters']) if state.get('filters') else None
+    session = state.get('session')
+    exclude = session.seen_ids if session is not None and state.get('refinement') == "more" else None
+    reply = await aproduct_recommend(state['query'], state['language'], filters, exclude)
     state['llm_reply'] = reply.content
+    state['results'] = reply.response_metadata or None
     return state
 
-def node_chat_greet(state: AgentState) -> dict:
+async def node_chat_greet(state: AgentState) -> dict:
     """Calls the general chat/greet tool and saves the content to the state."""
-    reply = chat_greet(state['text'], state['language'])
+    reply = await achat_greet(state['text'], state['language'])
     state['llm_reply'] = reply.content
     return state
 
+def _timed(name: str, node: Callable[[AgentState], Awaitable[dict]]) -> Callable[[AgentState], Awaitable[dict]]:
+    """Wrap a node so its duration lands in the stage histogram and in state['debug']['timings_ms']."""
+    async def run(state: AgentState) -> dict:
+        started = time.perf_counter()
+        try:
+            return await node(state)
+        finally:
+            observe_stage(name, time.perf_counter() - started, state.setdefault('debug', {}))
+    run.__name__ = node.__name__
+    return run
+
+def refine_router(state: AgentState) -> str:
+    """Goes straight to the search when the session answered the message."""
+    return "recommend" if state.get('refinement') else "understand"
+
+def understand_router(state: AgentState) -> str:
+    """Skips the per-step nodes when the combined call succeeded."""
+    if state['intent'] is None:
+        return "normalize"
+    if state['intent'] in ["greet", "smalltalk"]:
+        return "chat_greet"
+    return "recommend"
+
 def router(state: AgentState) -> str:
     """Routes the graph based on the detected intent."""
     if state['intent'] in ["greet", "smalltalk"]:
         return "chat_greet"
     return "query_extraction"
 
-graph = StateGraph(AgentState)
-graph.add_node("normalize", node_normalize)
-graph.add_node("intent", node_intent)
-graph.add_node("query_extraction", node_query_extraction)
-graph.add_node("recommend", node_recommend)
-graph.add_node("chat_greet", node_chat_greet)
-
-graph.set_entry_point("normalize")
-graph.add_edge("normalize", "intent")
-graph.add_conditional_edges("intent", router, {
-    "query_extraction": "query_extraction",
-    "chat_greet": "chat_greet",
-})
-graph.add_edge("query_extraction", "recommend")
-graph.add_edge("recommend", END)
-graph.add_edge("chat_greet", END)
-
-app = graph.compile()
+def build_graph():
+    """Builds and compiles the message graph; langgraph is imported here, not at startup."""
+    from langgraph.graph import StateGraph, END
+
+    graph = StateGraph(AgentState)
+    graph.add_node("refine", _timed("refine", node_refine))
+    graph.add_node("understand", _timed("understand", node_understand))
+    graph.add_node("normalize", _timed("normalize", node_normalize))
+    graph.add_node("intent", _timed("intent", node_intent))
+    graph.add_node("query_extraction", _timed("query_extraction", node_query_extraction))
+    graph.add_node("recommend", _timed("recommend", node_recommend))
+    graph.add_node("chat_greet", _timed("chat_greet", node_chat_greet))
+
+    graph.set_entry_point("refine")
+    graph.add_conditional_edges("refine", refine_router, {
+        "understand": "understand",
+        "recommend": "recommend",
+    })
+    graph.add_conditional_edges("understand", understand_router, {
+        "normalize": "normalize",
+        "recommend": "recommend",
+        "chat_greet": "chat_greet",
+    })
+    graph.add_edge("normalize", "intent")
+    graph.add_conditional_edges("intent", router, {
+        "query_extraction": "query_extraction",
+        "chat_greet": "chat_greet",
+    })
+    graph.add_edge("query_extraction", "recommend")
+    graph.add_edge("recommend", END)
+    graph.add_edge("chat_greet", END)
+
+    return graph.compile()
+
+# Global variable for lazy loading
+_graph = None
+_graph_lock = threading.Lock()
+
+def get_graph():
+    """Compiled graph, built on first use (or by the startup warmup)."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
+
+def is_graph_built() -> bool:
+    return _graph is not None
 
 async def run_message(user_id: str, text: str, language: str = None) -> str:
-    """Runs a message through the LangGraph and returns the reply."""
+    """Runs a message through the LangGraph and returns the reply; the user's session is updated with it."""
+    store = get_session_store() if settings.SESSIONS else None
+    session = store.get(user_id) if store is not None else None
     state = AgentState(
         user_id=user_id,
         text=text,
         language=language,
         intent=None,
         query=None,
+        filters=None,
         llm_reply=None,
+        session=session,
+        refinement=None,
+        results=None,
         debug={}
     )
-    out = await app.ainvoke(state)
-    print(f"Final LangGraph output: {out}")
+    started = time.perf_counter()
+    out = await get_graph().ainvoke(state)
+    debug = out.get("debug") or {}
+    observe_stage("graph", time.perf_counter() - started, debug)
+    if store is not None:
+        store.save(user_id, record_turn(session, out))
+    logger.info("message processed", extra={
+        "user_id": user_id,
+        "language": out.get("language"),
+        "intent": out.get("intent"),
+        "query": out.get("query"),
+        "filters": out.get("filters"),
+        "understand": debug.get("understand"),
+        "refinement": out.get("refinement"),
+        "timings_ms": debug.get("timings_ms"),
+    })
     return out.get("llm_reply", "...")
\ No newline at end of file
@@ -1,38 +1,35 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage
+from langchain_core.messages import HumanMessage
 import re
+from app.core.llm import get_llm
+from app.core.logs import get_logger
+from app.core.metrics import fallback
 
-# Global variable for lazy loading
-_llm_model = None
+logger = get_logger("language")
 
-def get_llm_model():
-    """Lazy load the LLM model to avoid blocking startup."""
-    global _llm_model
-    if _llm_model is None:
-        print("🔄 Loading Gemini LLM model...")
-        _llm_model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
-        print("✅ Gemini LLM model loaded successfully!")
-    return _llm_model
+def _language_prompt(text: str) -> str:
+    return f"Detect the language of the following text: '{text}'. Reply with only 'en' for English or 'ar' for Arabic."
 
-def detect_language(text: str) -> str:
+def _parse_language(content: str) -> str:
+    detected_lang = content.strip().lower()
+    if "ar" in detected_lang:
+        return "ar"
+    return "en"
+
+async def adetect_language(text: str) -> str:
     """
     Detects the language of the text using the LLM.
     Returns 'ar' for Arabic, 'en' for English, or 'en' as default.
     """
     if not text:
         return "en"
-    
+
     try:
-        llm_model = get_llm_model()
-        prompt = f"Detect the language of the following text: '{text}'. Reply with only 'en' for English or 'ar' for Arabic."
-        human_message = HumanMessage(content=prompt)
-        response = llm_model.invoke([human_message])
-        
-        detected_lang = response.content.strip().lower()
-        if "ar" in detected_lang:
-            return "ar"
-        return "en"
-        
+        llm_model = get_llm()
+        human_message = HumanMessage(content=_language_prompt(text))
+        response = await llm_model.ainvoke([human_message])
+        return _parse_language(response.content)
+
     except Exception as e:
-        print(f"[detect_language] LLM error: {e}")
+        logger.warning("language detection failed", extra={"func": "adetect_language", "error": str(e)})
+        fallback("language")
         return "en"
\ No newline at end of file
@@ -0,0 +1,97 @@
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.logs import get_logger
+
+logger = get_logger("search")
+
+_TOKEN_RE = re.compile(r"\w+")
+# Model numbers and SKUs such as "sm-g991b" or "a2.5": also indexed with the separators removed
+_COMPOUND_RE = re.compile(r"\w+(?:[-./]\w+)+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without Arabic diacritics, plus joined forms of hyphenated codes."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    tokens = _TOKEN_RE.findall(text)
+    tokens.extend(re.sub(r"[-./]", "", match) for match in _COMPOUND_RE.findall(text))
+    return tokens
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index. Postings are kept CSR-style in NumPy arrays
+    (one slice of document numbers per term) with the length-normalised term
+    weight precomputed, so a query is a few slices, one bincount and one
+    argpartition.
+    """
+
+    def __init__(self, texts: Iterable[str], doc_ids: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        started = time.perf_counter()
+        self.doc_ids = np.asarray(doc_ids, dtype="int64")
+        vocab = {}
+        terms, docs, tfs = [], [], []
+        lengths = np.zeros(len(self.doc_ids), dtype="float32")
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[doc] = sum(counts.values())
+            for token, tf in counts.items():
+                terms.append(vocab.setdefault(token, len(vocab)))
+                docs.append(doc)
+                tfs.append(tf)
+
+        terms = np.asarray(terms, dtype="int32")
+        order = np.argsort(terms, kind="stable")
+        docs = np.asarray(docs, dtype="int32")[order]
+        tfs = np.asarray(tfs, dtype="float32")[order]
+        df = np.bincount(terms, minlength=len(vocab))
+
+        n = len(self.doc_ids)
+        avgdl = float(lengths.mean()) if n else 0.0
+        norm = k1 * (1 - b + b * lengths[docs] / max(avgdl, 1e-9))
+        self.vocab = vocab
+        self.indptr = np.concatenate([[0], np.cumsum(df)]).astype("int64")
+        self.docs = docs
+        self.weights = (tfs * (k1 + 1) / (tfs + norm)).astype("float32")
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype("float32")
+        self.build_seconds = time.perf_counter() - started
+        logger.info("BM25 index built", extra={"products": n, "terms": len(vocab), "seconds": round(self.build_seconds, 1)})
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.docs.nbytes + self.weights.nbytes + self.idf.nbytes + self.doc_ids.nbytes
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (doc ids, scores), best first; empty when no query term is indexed.
+        allowed is an optional boolean mask over documents (in build order).
+        """
+        terms = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not terms or k <= 0:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+        docs = np.concatenate([self.docs[self.indptr[t]:self.indptr[t + 1]] for t in terms])
+        weights = np.concatenate([self.weights[self.indptr[t]:self.indptr[t + 1]] * self.idf[t] for t in terms])
+        scores = np.bincount(docs, weights=weights, minlength=len(self.doc_ids))
+        if allowed is not None:
+            scores[~allowed] = 0
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return self.doc_ids[top], scores[top].astype("float32")
+
+def reciprocal_rank_fusion(rankings: List[Iterable[int]], k: int = 60) -> List[int]:
+    """Merge ranked id lists by summing 1 / (k + rank); ids ranked high anywhere rise to the top."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
@@ -0,0 +1,260 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import llm_call_seconds, register_collector
+
+# Provider errors worth retrying: rate limits, overload, timeouts and dropped connections
+_RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "Aborted", "RemoteProtocolError", "ReadTimeout", "ConnectTimeout",
+}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose circuit breaker is open."""
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether a failed call may succeed if repeated (429, 5xx, timeouts, connection errors)."""
+    while exc is not None:
+        if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+            return True
+        if type(exc).__name__ in _RETRYABLE_ERRORS:
+            return True
+        code = getattr(exc, "code", None)
+        if isinstance(code, int) and (code == 429 or 500 <= code < 600):
+            return True
+        exc = exc.__cause__
+    return False
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so clients throttled together do not retry together."""
+    ceiling = min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls and rejects calls for
+    `cooldown` seconds, then lets one trial call through; a success closes it,
+    a failure opens it for another cooldown.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_at: Optional[float] = None
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            now = time.monotonic()
+            # One trial per cooldown, so a trial that never reports back cannot wedge the breaker
+            if state == "half_open" and (self.trial_at is None or now - self.trial_at >= self.cooldown):
+                self.trial_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial_at is not None:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+                self.trial_at = None
+
+class ModelGuard:
+    """
+    Per-model limits shared by every client of that model: a concurrency cap
+    (one semaphore for threads, one for the event loop), the circuit breaker
+    and call counters.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.max_concurrency = settings.LLM_MAX_CONCURRENCY
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_COOLDOWN_SECONDS)
+        self.thread_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+
+    @property
+    def async_slots(self) -> asyncio.Semaphore:
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._async_slots
+
+    def count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "in_flight": self.in_flight,
+                "mean_ms": round(self.total_seconds / self.calls * 1000, 1) if self.calls else 0.0,
+                "max_concurrency": self.max_concurrency,
+                "breaker": self.breaker.state,
+                "breaker_opened": self.breaker.times_opened,
+            }
+
+class LLMClient:
+    """
+    A shared chat model plus the guards around every call to it: the model's
+    concurrency cap, a timeout per attempt, retries with jittered backoff on
+    rate limits and provider errors, and the circuit breaker. When the breaker
+    is open, calls fail at once with CircuitOpenError so callers fall back
+    instead of queueing behind a provider that is down.
+    """
+
+    def __init__(self, model: Any, guard: ModelGuard):
+        self.model = model
+        self.guard = guard
+
+    def invoke(self, messages) -> Any:
+        return self.call(self.model.invoke, messages)
+
+    async def ainvoke(self, messages) -> Any:
+        return await self.acall(self.model.ainvoke, messages)
+
+    def _admit(self):
+        if not self.guard.breaker.allow():
+            self.guard.count(rejected=1)
+            raise CircuitOpenError(f"{self.guard.model} circuit is open; skipping the call")
+
+    def _record(self, started: float, error: Optional[BaseException]):
+        elapsed = time.perf_counter() - started
+        self.guard.count(calls=1, failures=int(error is not None), total_seconds=elapsed)
+        llm_call_seconds.observe(elapsed, model=self.guard.model, outcome="ok" if error is None else type(error).__name__)
+        # Only provider trouble trips the breaker; a rejected request still means the provider answered
+        if error is not None and is_retryable(error):
+            self.guard.breaker.record_failure()
+        else:
+            self.guard.breaker.record_success()
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking model call under the guards (the timeout is the model client's own)."""
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            self._admit()
+            with self.guard.thread_slots:
+                self.guard.count(in_flight=1)
+                started = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    self._record(started, e)
+                    if attempt == settings.LLM_MAX_RETRIES or not is_retryable(e):
+                        raise
+                else:
+                    self._record(started, None)
+                    return result
+                finally:
+                    self.guard.count(in_flight=-1)
+            self.guard.count(retries=1)
+            time.sleep(backoff_delay(attempt))
+
+    async def acall(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await a model coroutine under the guards, with LLM_TIMEOUT_SECONDS per attempt."""
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            self._admit()
+            async with self.guard.async_slots:
+                self.guard.count(in_flight=1)
+                started = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(func(*args, **kwargs), settings.LLM_TIMEOUT_SECONDS)
+                except Exception as e:
+                    self._record(started, e)
+                    if attempt == settings.LLM_MAX_RETRIES or not is_retryable(e):
+                        raise
+                else:
+                    self._record(started, None)
+                    return result
+                finally:
+                    self.guard.count(in_flight=-1)
+            self.guard.count(retries=1)
+            await asyncio.sleep(backoff_delay(attempt))
+
+# Global registry: one client per (model, temperature, JSON mode), one guard per model
+_clients: Dict[Tuple[str, float, bool], LLMClient] = {}
+_guards: Dict[str, ModelGuard] = {}
+_registry_lock = threading.Lock()
+
+def _build_model(model: str, temperature: float, json_mode: bool):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    options = {"response_mime_type": "application/json"} if json_mode else {}
+    # Retries are ours (with jitter and the breaker), so the client makes a single attempt
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=1,
+        **options,
+    )
+
+def get_llm(model: Optional[str] = None, temperature: float = 0, json_mode: bool = False) -> LLMClient:
+    """
+    Shared client for a model, created on first use. Every module asking for
+    the same settings gets the same client, and so the same connection.
+    """
+    model = model or settings.LLM_MODEL
+    key = (model, float(temperature), json_mode)
+    client = _clients.get(key)
+    if client is None:
+        with _registry_lock:
+            client = _clients.get(key)
+            if client is None:
+                print(f"🔄 Loading Gemini LLM client ({model}{', JSON' if json_mode else ''})...")
+                guard = _guards.setdefault(model, ModelGuard(model))
+                client = LLMClient(_build_model(model, temperature, json_mode), guard)
+                _clients[key] = client
+                print("✅ Gemini LLM client ready!")
+    return client
+
+def llm_stats() -> Dict[str, Dict[str, Any]]:
+    """Call counts, retries, breaker state and in-flight calls per model."""
+    return {model: guard.stats() for model, guard in _guards.items()}
+
+def _guard_samples(metric: str, field: str):
+    return [(metric, {"model": model}, stats[field]) for model, stats in llm_stats().items()]
+
+register_collector("eazy_llm_retries_total", "counter", "LLM attempts retried after a provider error",
+                   lambda: _guard_samples("eazy_llm_retries_total", "retries"))
+register_collector("eazy_llm_rejected_total", "counter", "LLM calls skipped because the circuit breaker was open",
+                   lambda: _guard_samples("eazy_llm_rejected_total", "rejected"))
+register_collector("eazy_llm_in_flight", "gauge", "LLM calls currently running",
+                   lambda: _guard_samples("eazy_llm_in_flight", "in_flight"))
+register_collector("eazy_llm_breaker_open", "gauge", "1 while the model's circuit breaker is open or half-open",
+                   lambda: [("eazy_llm_breaker_open", {"model": model}, int(guard.breaker.state != "closed"))
+                            for model, guard in _guards.items()])
@@ -0,0 +1,132 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.embedding_model import embed_batch, embed_text
+from app.core.metrics import register_collector
+
+# Arabic, Arabic Supplement, Arabic Extended-A and presentation forms
+_ARABIC_RE = re.compile("[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]")
+_LATIN_RE = re.compile("[A-Za-z\u00C0-\u024F]")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+# Messages that need no model at all once normalized
+KEYWORD_INTENTS = {
+    "greet": {
+        "hi", "hii", "hello", "hey", "hey there", "hi there", "hello there", "good morning",
+        "good evening", "good afternoon", "salam", "salaam", "assalamu alaikum", "hala",
+        "السلام عليكم", "سلام عليكم", "سلام", "مرحبا", "مرحبا بك", "اهلا", "أهلا", "اهلا وسهلا",
+        "أهلا وسهلا", "هلا", "صباح الخير", "مساء الخير", "هاي",
+    },
+    "smalltalk": {
+        "thanks", "thank you", "thank you so much", "thx", "ok", "okay", "cool", "great", "bye",
+        "goodbye", "how are you", "who are you", "شكرا", "شكرا لك", "شكرا جزيلا", "تمام", "اوكي",
+        "مع السلامة", "كيف حالك", "من انت", "من أنت",
+    },
+}
+
+# Example messages per intent for the embedding-similarity tier
+INTENT_EXAMPLES = {
+    "greet": [
+        "hi there, how can you help me", "hello, I need some help",
+        "مرحبا، كيف يمكنك مساعدتي", "السلام عليكم، أحتاج مساعدة",
+    ],
+    "smalltalk": [
+        "thank you very much for your help", "what is your name", "how is your day going",
+        "شكرا جزيلا على المساعدة", "ما اسمك", "كيف حالك اليوم",
+    ],
+    "product_recommend": [
+        "show me running shoes under 200 AED", "I want to buy an iphone 15",
+        "looking for a men's perfume", "do you have a cheap laptop for students",
+        "أريد عطر رجالي", "أبحث عن حذاء رياضي", "هل لديك هاتف سامسونج", "ابغى ساعة ذكية رخيصة",
+    ],
+}
+
+_prototypes = None
+_prototypes_lock = threading.Lock()
+_tier_counts = Counter()
+_tier_lock = threading.Lock()
+
+def normalize_message(text: str) -> str:
+    """Lowercase, strip punctuation and Arabic diacritics, and collapse whitespace."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    text = _PUNCT_RE.sub(" ", text)
+    return " ".join(text.split())
+
+def detect_language_local(text: str) -> Tuple[Optional[str], float]:
+    """
+    Decide between 'ar' and 'en' from the share of Arabic vs Latin letters.
+    Returns (language, confidence); language is None below LOCAL_LANGUAGE_CONFIDENCE.
+    """
+    arabic = len(_ARABIC_RE.findall(text or ""))
+    latin = len(_LATIN_RE.findall(text or ""))
+    if arabic + latin == 0:
+        return None, 0.0
+    ratio = arabic / (arabic + latin)
+    language = "ar" if ratio >= 0.5 else "en"
+    confidence = max(ratio, 1 - ratio)
+    if confidence < settings.LOCAL_LANGUAGE_CONFIDENCE:
+        return None, confidence
+    return language, confidence
+
+def _get_prototypes() -> Tuple[np.ndarray, list]:
+    """Embed the intent examples once; returns (matrix, intent label per row)."""
+    global _prototypes
+    if _prototypes is None:
+        with _prototypes_lock:
+            if _prototypes is None:
+                labels = [intent for intent, examples in INTENT_EXAMPLES.items() for _ in examples]
+                texts = [text for examples in INTENT_EXAMPLES.values() for text in examples]
+                _prototypes = (embed_batch(texts, progress=False), labels)
+    return _prototypes
+
+def classify_intent_local(text: str) -> Tuple[Optional[str], float]:
+    """
+    Classify intent by exact keyword match, then by cosine similarity to the
+    example messages. Returns (intent, confidence); intent is None when the
+    best match is below LOCAL_INTENT_THRESHOLD or too close to the runner-up.
+    """
+    normalized = normalize_message(text or "")
+    if not normalized:
+        return None, 0.0
+    for intent, phrases in KEYWORD_INTENTS.items():
+        if normalized in phrases:
+            return intent, 1.0
+
+    matrix, labels = _get_prototypes()
+    scores = matrix @ embed_text(normalized)
+    best = {}
+    for label, score in zip(labels, scores):
+        best[label] = max(best.get(label, -1.0), float(score))
+    ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    intent, confidence = ranked[0]
+    margin = confidence - ranked[1][1] if len(ranked) > 1 else confidence
+    if confidence < settings.LOCAL_INTENT_THRESHOLD or margin < settings.LOCAL_INTENT_MARGIN:
+        return None, confidence
+    return intent, confidence
+
+def record_tier(step: str, tier: str):
+    """Count which tier ('local' or 'llm') answered a step ('language', 'intent')."""
+    with _tier_lock:
+        _tier_counts[(step, tier)] += 1
+
+def _tier_samples():
+    with _tier_lock:
+        return [("eazy_classifier_answers_total", {"step": step, "tier": tier}, count)
+                for (step, tier), count in sorted(_tier_counts.items())]
+
+register_collector("eazy_classifier_answers_total", "counter", "Language/intent answers by tier (local or llm)", _tier_samples)
+
+def classifier_stats() -> Dict[str, Dict[str, int]]:
+    """How often each tier answered, per step."""
+    with _tier_lock:
+        stats = {}
+        for (step, tier), count in _tier_counts.items():
+            stats.setdefault(step, {})[tier] = count
+        return stats
@@ -0,0 +1,61 @@
+import json
+import logging
+import sys
+import threading
+
+from app.core.config import settings
+
+# Attributes every LogRecord has; anything else was passed through extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_configured = False
+_configure_lock = threading.Lock()
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development: message followed by key=value fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value!r}" for key, value in _fields(record).items())
+        line = f"{record.levelname:<7} {record.name}: {record.getMessage()}" + (f" {fields}" if fields else "")
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+def configure_logging():
+    """Attach the LOG_FORMAT handler to the app's "eazy" logger once; uvicorn's own loggers are left alone."""
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+        root = logging.getLogger("eazy")
+        root.addHandler(handler)
+        root.setLevel(settings.LOG_LEVEL)
+        root.propagate = False
+        _configured = True
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module, e.g. get_logger("whatsapp") -> "eazy.whatsapp"."""
+    configure_logging()
+    return logging.getLogger(f"eazy.{name}")
@@ -0,0 +1,171 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; spans a cached lookup (sub-millisecond) up to a slow LLM call or S3 load
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metric name, labels, value) triples produced at scrape time
+Sample = Tuple[str, Dict[str, str], float]
+
+# Every metric and collector, in registration order, for the /metrics page
+_metrics: List["_Metric"] = []
+_collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return lines + [f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in self.samples()]
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonic count per label set, e.g. fallbacks_total{step="intent"}."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket latency histogram per label set, rendered as the usual
+    _bucket/_sum/_count series so Prometheus can compute quantiles.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}  # label values -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self, **labels) -> Dict[str, float]:
+        """Count and mean of one series, for logs and reports."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return {"count": 0, "mean": 0.0}
+            return {"count": series[2], "mean": series[1] / series[2]}
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        samples = []
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+def register_collector(name: str, kind: str, help: str, collect: Callable[[], Iterable[Sample]]):
+    """
+    Add a metric computed at scrape time from existing counters (cache stats,
+    LLM breaker state, ...) instead of being updated on every event.
+    """
+    _collectors.append((name, kind, help, collect))
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for name, kind, help, collect in _collectors:
+        lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}"])
+        try:
+            lines.extend(f"{sample}{_format_labels(labels)} {_format_value(value)}" for sample, labels, value in collect())
+        except Exception as e:
+            lines.append(f"# {name} unavailable: {e}")
+    return "\n".join(lines) + "\n"
+
+# Latency of the request path, by stage
+stage_seconds = Histogram("eazy_stage_seconds", "Time spent in each message-processing stage", ("stage",))
+llm_call_seconds = Histogram("eazy_llm_call_seconds", "Gemini call latency per attempt", ("model", "outcome"))
+embedding_seconds = Histogram("eazy_embedding_seconds", "Embedding model encode calls", ("call",))
+search_seconds = Histogram("eazy_search_seconds", "Product retrieval (embedding, FAISS/BM25, fusion)", ("mode",))
+catalog_load_seconds = Histogram(
+    "eazy_catalog_load_seconds", "Catalog loads from the local snapshot or S3", ("source",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+twilio_seconds = Histogram("eazy_twilio_seconds", "Webhook responses and REST replies sent to Twilio", ("kind", "outcome"))
+
+# Times a step answered with its canned fallback instead of a real result
+fallbacks_total = Counter("eazy_fallbacks_total", "Steps that fell back after an error", ("step",))
+
+def fallback(step: str):
+    fallbacks_total.inc(step=step)
+
+# Follow-ups answered from the user's session instead of the understand/extraction steps
+refinements_total = Counter("eazy_refinements_total", "Follow-ups answered from the session", ("kind",))
+
+def observe_stage(stage: str, seconds: float, debug: Optional[Dict] = None):
+    """Record a stage duration and, when given, add it (in ms) to the message's debug timings."""
+    stage_seconds.observe(seconds, stage=stage)
+    if debug is not None:
+        debug.setdefault("timings_ms", {})[stage] = round(seconds * 1000, 1)
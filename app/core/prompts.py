@@ -1,6 +1,37 @@
-from langchain.prompts import PromptTemplate
+from typing import List
 
-INTENT_PROMPT = PromptTemplate(
+# Every template, so warm_prompts() can build them all ahead of the first message
+_templates: List["LazyPromptTemplate"] = []
+
+class LazyPromptTemplate:
+    """
+    A PromptTemplate that is only built on first use: importing
+    langchain_core.prompts also imports transformers when it is installed,
+    which would add seconds to process startup.
+    """
+
+    def __init__(self, input_variables: List[str], template: str):
+        self.input_variables = input_variables
+        self.template = template
+        self._prompt = None
+        _templates.append(self)
+
+    @property
+    def prompt(self):
+        if self._prompt is None:
+            from langchain_core.prompts import PromptTemplate
+            self._prompt = PromptTemplate(input_variables=self.input_variables, template=self.template)
+        return self._prompt
+
+    def format(self, **kwargs) -> str:
+        return self.prompt.format(**kwargs)
+
+def warm_prompts():
+    """Build every template now instead of on the first message."""
+    for template in _templates:
+        template.prompt
+
+INTENT_PROMPT = LazyPromptTemplate(
     input_variables=["text", "language"],
     template=(
         "Classify the intent of this WhatsApp message in {language}:\n"
@@ -10,7 +41,7 @@ INTENT_PROMPT = PromptTemplate(
     ),
 )
 
-CHAT_GREET_PROMPT = PromptTemplate(
+CHAT_GREET_PROMPT = LazyPromptTemplate(
     input_variables=["text", "language"],
     template=(
         "You are a helpful WhatsApp shopping assistant. Respond concisely in {language}.\n"
@@ -19,7 +50,7 @@ CHAT_GREET_PROMPT = PromptTemplate(
     ),
 )
 
-PRODUCT_RECOMMEND_PROMPT = PromptTemplate(
+PRODUCT_RECOMMEND_PROMPT = LazyPromptTemplate(
     input_variables=["text", "language", "products"],
     template=(
         "You are a helpful product recommendation assistant. "
@@ -31,12 +62,33 @@ PRODUCT_RECOMMEND_PROMPT = PromptTemplate(
     ),
 )
 
-QUERY_EXTRACTION_PROMPT = PromptTemplate(
+SEARCH_FILTERS_INSTRUCTIONS = (
+    "- \"filters\": an object with \"min_price\" and \"max_price\" (numbers), \"brand\", \"category\" and "
+    "\"currency\" (ISO code such as 'AED'); use null for anything the message does not state. "
+    "Put a price limit or range here (e.g. 'under 200 AED' gives max_price 200, currency 'AED'), not in the query."
+)
+
+QUERY_EXTRACTION_PROMPT = LazyPromptTemplate(
     input_variables=["text", "language"],
     template=(
-        "Extract a concise product search query from the user's message in {language}. "
-        "The query should contain key product characteristics like category, brand, price range, or features. "
-        "Message: '{text}'. "
-        "Only reply with the extracted query."
+        "Extract a product search from the user's message in {language}.\n"
+        "Message: '{text}'\n"
+        "Reply with only a JSON object with these keys:\n"
+        "- \"query\": a concise search query with key product characteristics like category, brand, or features.\n"
+        + SEARCH_FILTERS_INSTRUCTIONS
+    ),
+)
+
+UNDERSTAND_PROMPT = LazyPromptTemplate(
+    input_variables=["text"],
+    template=(
+        "You are the message understanding step of a WhatsApp shopping assistant.\n"
+        "Message: '{text}'\n"
+        "Reply with only a JSON object with these keys:\n"
+        "- \"language\": 'en' for English or 'ar' for Arabic.\n"
+        "- \"intent\": one of 'greet', 'product_recommend', 'smalltalk'.\n"
+        "- \"query\": for 'product_recommend', a concise product search query in the message's language "
+        "with key product characteristics like category, brand, or features; otherwise an empty string.\n"
+        + SEARCH_FILTERS_INSTRUCTIONS
     ),
 )
\ No newline at end of file
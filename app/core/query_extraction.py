@@ -1,29 +1,54 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage
+import json
+import re
+from typing import Tuple
+
+from langchain_core.messages import HumanMessage
+from pydantic import ValidationError
+from app.core.cache import MISSING
+from app.core.filters import SearchFilters
+from app.core.llm import get_llm
+from app.core.logs import get_logger
+from app.core.metrics import fallback
 from app.core.prompts import QUERY_EXTRACTION_PROMPT
+from app.core.response_cache import ResponseCache
 
-# Global variable for lazy loading
-_llm_model = None
+# (query, filters) per message; exact matches only, since "under 200" and "under 300" embed alike
+query_cache = ResponseCache("extracted_queries")
+logger = get_logger("query_extraction")
 
-def get_llm_model():
-    """Lazy load the LLM model to avoid blocking startup."""
-    global _llm_model
-    if _llm_model is None:
-        print("🔄 Loading Gemini LLM model for query extraction...")
-        _llm_model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
-        print("✅ Gemini LLM model for query extraction loaded successfully!")
-    return _llm_model
+def parse_search(content: str, text: str) -> Tuple[str, SearchFilters]:
+    """
+    Read (query, filters) from the model's JSON reply. A reply that is not
+    JSON is taken as the query itself, and a missing query falls back to text.
+    """
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return content.strip() or text, SearchFilters()
+    try:
+        data = json.loads(match.group(0))
+        query = str(data.get("query") or "").strip() or text
+        filters = data.get("filters")
+        return query, SearchFilters(**filters) if isinstance(filters, dict) else SearchFilters()
+    except (ValueError, TypeError, AttributeError, ValidationError):
+        return text, SearchFilters()
 
-def extract_query(text: str, language: str) -> str:
+async def aextract_query(text: str, language: str) -> Tuple[str, SearchFilters]:
     """
-    Extracts a concise search query from a conversational text using the LLM.
+    Extracts a concise search query and structured filters (price range,
+    brand, category, currency) from a conversational text using the LLM.
     """
+    cached = await query_cache.alookup(text, language)
+    if cached is not MISSING:
+        return cached
     prompt = QUERY_EXTRACTION_PROMPT.format(text=text, language=language)
     try:
-        llm_model = get_llm_model()
+        llm_model = get_llm(json_mode=True)
         human_message = HumanMessage(content=prompt)
-        response = llm_model.invoke([human_message])
-        return response.content.strip()
+        response = await llm_model.ainvoke([human_message])
+        result = parse_search(response.content, text)
+        query_cache.store(text, language, result)
+        return result
     except Exception as e:
-        print(f"[extract_query] Gemini error: {e}")
-        return text
\ No newline at end of file
+        logger.warning("query extraction failed", extra={"func": "aextract_query", "error": str(e)})
+        fallback("query_extraction")
+        return text, SearchFilters()
\ No newline at end of file
@@ -0,0 +1,28 @@
+import threading
+from typing import List
+
+from app.core.config import settings
+
+# Global variable to store the reranker (lazy loaded)
+_reranker = None
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """Lazy load the cross-encoder used to rerank fused search candidates."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                print(f"🔄 Loading reranker {settings.RERANKER_MODEL}...")
+                _reranker = CrossEncoder(settings.RERANKER_MODEL)
+                print("✅ Reranker loaded successfully!")
+    return _reranker
+
+def rerank(query: str, ids: List[int], texts: List[str], top_k: int) -> List[int]:
+    """Reorder candidate ids by cross-encoder relevance of (query, product text)."""
+    if not ids:
+        return []
+    scores = get_reranker().predict([(query, text) for text in texts])
+    order = sorted(range(len(ids)), key=lambda i: float(scores[i]), reverse=True)
+    return [ids[i] for i in order[:top_k]]
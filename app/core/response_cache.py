@@ -0,0 +1,140 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+import numpy as np
+
+from app.core.cache import MISSING, TTLCache
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.core.embedding_model import EMBEDDING_DIM, embed_text
+from app.core.local_classifier import normalize_message
+from app.core.logs import get_logger
+
+logger = get_logger("cache")
+
+def exact_text(text: str) -> str:
+    """Case- and whitespace-insensitive form that keeps punctuation such as '$'."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
+class ResponseCache(TTLCache):
+    """
+    Cache of one node's LLM results keyed on (model, language, normalised
+    message). With loose=True the key ignores punctuation and Arabic
+    diacritics. With semantic=True a miss falls back to the most similar
+    earlier message in the same language (MiniLM cosine of at least
+    SEMANTIC_CACHE_THRESHOLD, found with a small FAISS index), so near-duplicate
+    greetings share one answer. Size and TTL eviction come from TTLCache;
+    semantic hits are counted separately in stats().
+    """
+
+    def __init__(self, name: str, loose: bool = False, semantic: bool = False):
+        super().__init__(name, maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+        self.normalize = normalize_message if loose else exact_text
+        self.semantic = semantic and settings.SEMANTIC_CACHE
+        self.semantic_hits = 0
+        self._indexes: Dict[str, Any] = {}  # language -> faiss.IndexIDMap2 over normalised vectors
+        self._entries: "OrderedDict[int, Tuple[str, Hashable]]" = OrderedDict()  # vector id -> (language, key)
+        self._ids: Dict[Hashable, int] = {}
+        self._next_id = 0
+        self._semantic_lock = threading.Lock()
+
+    def _key(self, normalized: str, language: str) -> Tuple[str, str, str]:
+        return (settings.LLM_MODEL, language or "", normalized)
+
+    def _peek(self, key: Hashable) -> Any:
+        """Local value for key without touching the hit counters, or MISSING."""
+        with self._lock:
+            item = self._data.get(key)
+        if item is None:
+            return MISSING
+        value, expires_at = item
+        return MISSING if expires_at is not None and expires_at <= time.monotonic() else value
+
+    def lookup(self, text: str, language: str = "") -> Any:
+        """Cached result for text, or MISSING. Semantic lookups embed the text, so keep them off the event loop."""
+        normalized = self.normalize(text)
+        value = self.get(self._key(normalized, language))
+        if value is not MISSING or not self.semantic or not normalized:
+            return value
+        try:
+            vector = embed_text(normalized)
+        except Exception as e:
+            logger.warning("semantic cache lookup failed", extra={"cache": self.name, "error": str(e)})
+            return MISSING
+        with self._semantic_lock:
+            index = self._indexes.get(language or "")
+            if index is None or index.ntotal == 0:
+                return MISSING
+            scores, ids = index.search(vector.reshape(1, -1), 1)
+            entry = self._entries.get(int(ids[0][0]))
+        if entry is None or scores[0][0] < settings.SEMANTIC_CACHE_THRESHOLD:
+            return MISSING
+        value = self._peek(entry[1])
+        if value is MISSING:
+            self._forget(entry[1])  # expired or evicted from the exact tier
+            return MISSING
+        with self._lock:
+            self.misses -= 1
+            self.hits += 1
+            self.semantic_hits += 1
+        return value
+
+    async def alookup(self, text: str, language: str = "") -> Any:
+        """Async lookup; the embedding for a semantic lookup runs in the CPU pool."""
+        if self.semantic:
+            return await run_blocking(self.lookup, text, language)
+        return self.lookup(text, language)
+
+    def store(self, text: str, language: str, value: Any):
+        """Cache value for text, and index its embedding when semantic lookups are on."""
+        normalized = self.normalize(text)
+        key = self._key(normalized, language)
+        self.set(key, value)
+        if not self.semantic or not normalized:
+            return
+        try:
+            vector = embed_text(normalized)  # usually already cached by lookup()
+        except Exception as e:
+            logger.warning("semantic cache store failed", extra={"cache": self.name, "error": str(e)})
+            return
+        with self._semantic_lock:
+            if key in self._ids:
+                return
+            index = self._indexes.get(language or "")
+            if index is None:
+                import faiss
+                index = self._indexes[language or ""] = faiss.IndexIDMap2(faiss.IndexFlatIP(EMBEDDING_DIM))
+            vector_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(np.asarray(vector, dtype="float32").reshape(1, -1), np.array([vector_id], dtype="int64"))
+            self._entries[vector_id] = (language or "", key)
+            self._ids[key] = vector_id
+            while len(self._entries) > self.maxsize:
+                oldest, (old_language, old_key) = self._entries.popitem(last=False)
+                self._indexes[old_language].remove_ids(np.array([oldest], dtype="int64"))
+                del self._ids[old_key]
+
+    def _forget(self, key: Hashable):
+        with self._semantic_lock:
+            vector_id = self._ids.pop(key, None)
+            if vector_id is not None:
+                language, _ = self._entries.pop(vector_id)
+                self._indexes[language].remove_ids(np.array([vector_id], dtype="int64"))
+
+    def clear(self):
+        super().clear()
+        with self._semantic_lock:
+            self._indexes.clear()
+            self._entries.clear()
+            self._ids.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats["semantic_hits"] = self.semantic_hits
+        with self._semantic_lock:
+            stats["semantic_entries"] = len(self._entries)
+        return stats
@@ -1,79 +1,226 @@
 import boto3
-import pandas as pd
+import hashlib
 import json
 import os
-from typing import List, Dict, Any
-from io import StringIO
+import pandas as pd
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 from botocore.exceptions import NoCredentialsError, ClientError
+from app.core.catalog import ProductCatalog
+from app.core.config import settings
+from app.core.logs import get_logger
+from app.core.metrics import catalog_load_seconds
+
+logger = get_logger("catalog")
 
 class S3ProductLoader:
-    def __init__(self):
+    """
+    Loads the product catalog from S3 CSVs and keeps a local snapshot: one
+    pickled DataFrame per CSV plus a manifest of S3 keys with their ETags, so
+    startup reads the snapshot without touching S3 and refresh() only
+    downloads objects whose ETag changed. The assembled catalog is also saved
+    as memory-mapped columns, which is what processes actually load.
+
+    A refresh is staged until commit(): the manifest, deleted CSVs and older
+    column files stay as they were, so a failed index build leaves the
+    previous snapshot intact.
+    """
+
+    def __init__(self, snapshot_dir: Optional[Path] = None):
         self.s3_client = boto3.client('s3')
         self.bucket_name = 'az-scrapped-data'
         self.prefix = '20k/multi/'
-        self.products = []
+        self.snapshot_dir = Path(snapshot_dir or settings.CATALOG_SNAPSHOT_DIR)
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        self.pending: Optional[Dict[str, Dict[str, Any]]] = None  # staged by refresh(), saved by commit()
+        self.products = ProductCatalog.empty()
         self.total_products = 0
-    
-    def load_products_from_s3(self) -> List[Dict[str, Any]]:
-        """Load all products from S3 CSV files"""
+
+    @property
+    def manifest_file(self) -> Path:
+        return self.snapshot_dir / "manifest.json"
+
+    def list_objects(self) -> Dict[str, Dict[str, Any]]:
+        """ETag and LastModified of every CSV under the prefix, following pagination."""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        objects = {}
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith('.csv'):
+                    objects[obj['Key']] = {
+                        "etag": obj['ETag'].strip('"'),
+                        "last_modified": obj['LastModified'].isoformat(),
+                    }
+        return objects
+
+    def list_csv_keys(self) -> List[str]:
+        """List every CSV under the prefix, following list_objects_v2 pagination."""
+        return sorted(self.list_objects())
+
+    def load_csv(self, csv_key: str) -> Optional[pd.DataFrame]:
+        """Download and parse one CSV, streaming the response body into pandas."""
+        try:
+            csv_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=csv_key)
+            # The StreamingBody is file-like, so pandas reads it without an intermediate copy
+            df = pd.read_csv(csv_obj['Body'], encoding='utf-8')
+            logger.info("catalog file loaded", extra={"key": csv_key, "products": len(df)})
+            return df
+        except Exception as e:
+            logger.warning("catalog file failed to load", extra={"key": csv_key, "error": str(e)})
+            return None
+
+    def _frame_file(self, csv_key: str) -> Path:
+        return self.snapshot_dir / (hashlib.sha1(csv_key.encode("utf-8")).hexdigest() + ".pkl")
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not self.manifest_file.exists():
+            return {}
+        try:
+            with self.manifest_file.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("ignoring unreadable catalog manifest", extra={"error": str(e)})
+            return {}
+
+    def _write_manifest(self):
+        tmp = self.manifest_file.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_file)
+
+    def _columns_dir(self, manifest: Optional[Dict[str, Dict[str, Any]]] = None) -> Path:
+        """Column files for a manifest (the current one by default); a new manifest gets a new directory."""
+        manifest = self.manifest if manifest is None else manifest
+        digest = hashlib.sha1(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return self.snapshot_dir / "columns" / digest
+
+    def _assemble(self, manifest: Optional[Dict[str, Dict[str, Any]]] = None) -> ProductCatalog:
+        """
+        Build the catalog from the snapshot files of a manifest (the current
+        one by default), in S3 key order, save it as column files and return
+        the memory-mapped copy.
+        """
+        manifest = self.manifest if manifest is None else manifest
+        frames = [pd.read_pickle(self._frame_file(key)) for key in sorted(manifest)]
+        frames = [df for df in frames if len(df)]
+        catalog = ProductCatalog.from_frame(pd.concat(frames, ignore_index=True)) if frames else ProductCatalog.empty()
+        columns_dir = self._columns_dir(manifest)
+        catalog.save(columns_dir)
+        catalog = ProductCatalog.load(columns_dir, mmap=True)
+        self.total_products = len(catalog)
+        return catalog
+
+    def _open_columns(self) -> ProductCatalog:
+        """Map the saved columns for the current manifest, assembling them if missing."""
+        columns_dir = self._columns_dir()
+        if not (columns_dir / "meta.json").exists():
+            return self._assemble()
+        catalog = ProductCatalog.load(columns_dir, mmap=True)
+        self.total_products = len(catalog)
+        return catalog
+
+    def load_snapshot(self) -> Optional[ProductCatalog]:
+        """Load the catalog from the local snapshot, or None if there is none."""
+        manifest = self._read_manifest()
+        if not manifest:
+            return None
         try:
-            print("🔄 Connecting to S3...")
-            
-            # List all CSV files in the bucket
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=self.prefix
-            )
-            
-            csv_files = [obj['Key'] for obj in response.get('Contents', []) if obj['Key'].endswith('.csv')]
-            print(f"📁 Found {len(csv_files)} CSV files in S3")
-            
-            all_products = []
-            
-            for i, csv_key in enumerate(csv_files, 1):
-                print(f"📄 Loading file {i}/{len(csv_files)}: {csv_key}")
-                
-                try:
-                    # Download CSV content
-                    csv_obj = self.s3_client.get_object(
-                        Bucket=self.bucket_name,
-                        Key=csv_key
-                    )
-                    
-                    # Read CSV
-                    csv_content = csv_obj['Body'].read().decode('utf-8')
-                    df = pd.read_csv(StringIO(csv_content))
-                    
-                    # Convert to list of dicts
-                    products = df.to_dict('records')
-                    all_products.extend(products)
-                    
-                    print(f"✅ Loaded {len(products)} products from {csv_key}")
-                    
-                except Exception as e:
-                    print(f"⚠️ Error loading {csv_key}: {e}")
-                    continue
-            
-            self.total_products = len(all_products)
-            print(f"🎉 Successfully loaded {self.total_products} products from S3!")
-            return all_products
-            
+            started = time.perf_counter()
+            self.manifest = manifest
+            catalog = self._open_columns()
+            catalog_load_seconds.observe(time.perf_counter() - started, source="snapshot")
+            logger.info("catalog loaded from snapshot", extra={
+                "products": len(catalog), "ms": round((time.perf_counter() - started) * 1000),
+            })
+            return catalog
+        except Exception as e:
+            logger.warning("could not read catalog snapshot", extra={"error": str(e)})
+            self.manifest = {}
+            return None
+
+    def refresh(self) -> bool:
+        """
+        Compare S3 ETags with the snapshot manifest, download only new or changed
+        CSVs (in parallel) and assemble the new self.products without the
+        deleted ones. Returns True if the catalog changed; the new manifest is
+        only saved by commit(), once the catalog is live.
+        """
+        started = time.perf_counter()
+        remote = self.list_objects()
+        changed = [key for key, meta in remote.items() if self.manifest.get(key, {}).get("etag") != meta["etag"]]
+        removed = [key for key in self.manifest if key not in remote]
+        logger.info("catalog files listed", extra={"files": len(remote), "changed": len(changed), "removed": len(removed)})
+        if not changed and not removed:
+            return False
+
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=settings.S3_MAX_WORKERS) as pool:
+            frames = dict(zip(changed, pool.map(self.load_csv, changed)))
+
+        pending = dict(self.manifest)
+        for key, df in frames.items():
+            if df is None:
+                continue  # keep the previous copy of a file that failed to download
+            df.to_pickle(self._frame_file(key))
+            pending[key] = dict(remote[key], rows=len(df))
+        for key in removed:
+            del pending[key]
+
+        self.products = self._assemble(pending)
+        self.pending = pending
+        catalog_load_seconds.observe(time.perf_counter() - started, source="s3")
+        logger.info("catalog assembled", extra={
+            "products": self.total_products,
+            "seconds": round(time.perf_counter() - started, 1),
+            "column_mb": round(self.products.nbytes / 1e6, 1),
+        })
+        return True
+
+    def commit(self):
+        """
+        Save the manifest staged by refresh(), once its catalog is live, and
+        delete the snapshot files it no longer uses.
+        """
+        if self.pending is None:
+            return
+        removed = [key for key in self.manifest if key not in self.pending]
+        self.manifest, self.pending = self.pending, None
+        self._write_manifest()
+        for key in removed:
+            self._frame_file(key).unlink(missing_ok=True)
+        # Drop older column files; processes still mapping them keep their pages until they exit
+        columns_dir = self._columns_dir()
+        for old in columns_dir.parent.iterdir():
+            if old != columns_dir and ".tmp" not in old.name:
+                shutil.rmtree(old, ignore_errors=True)
+
+    def load_products_from_s3(self) -> ProductCatalog:
+        """Load all products from S3 CSV files into a columnar catalog"""
+        try:
+            self.manifest = {}
+            self.refresh()
+            self.commit()  # nothing older to fall back on
+            return self.products
+
         except NoCredentialsError:
-            print("❌ AWS credentials not found. Please configure AWS CLI or set environment variables.")
-            return []
+            logger.error("AWS credentials not found; configure the AWS CLI or set environment variables")
+            return ProductCatalog.empty()
         except ClientError as e:
-            print(f"❌ S3 error: {e}")
-            return []
+            logger.error("S3 error", extra={"error": str(e)})
+            return ProductCatalog.empty()
         except Exception as e:
-            print(f"❌ Unexpected error loading products from S3: {e}")
-            return []
-    
-    def get_products(self) -> List[Dict[str, Any]]:
-        """Get products (lazy loading)"""
+            logger.exception("unexpected error loading products from S3")
+            return ProductCatalog.empty()
+
+    def get_products(self) -> ProductCatalog:
+        """Get products (lazy loading), preferring the local snapshot over S3"""
         if not self.products:
-            self.products = self.load_products_from_s3()
+            self.products = self.load_snapshot() or self.load_products_from_s3()
         return self.products
-    
+
     def get_total_count(self) -> int:
         """Get total number of products"""
         if self.total_products == 0:
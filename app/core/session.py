@@ -0,0 +1,214 @@
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.cache import MISSING, TTLCache, get_shared_backend
+from app.core.config import settings
+from app.core.embedding_model import cached_embedding, remember_embedding
+from app.core.local_classifier import detect_language_local, normalize_message
+from app.core.logs import get_logger
+from app.core.metrics import refinements_total
+
+logger = get_logger("session")
+
+MAX_SEEN_IDS = 50  # products already shown, which "show more" skips
+
+class Session:
+    """
+    One user's recent conversation, kept compact so that thousands fit in
+    memory and each pickles small for the shared tier: the last turns
+    (clipped), the last search (query, filters and its embedding as float16),
+    and the ids and prices of the products it showed.
+    """
+
+    __slots__ = ("language", "query", "filters", "query_vector", "result_ids", "result_prices",
+                 "seen_ids", "turns", "updated_at")
+
+    def __init__(self):
+        self.language: Optional[str] = None
+        self.query: Optional[str] = None
+        self.filters: Optional[Dict[str, Any]] = None
+        self.query_vector: Optional[np.ndarray] = None
+        self.result_ids: Tuple[int, ...] = ()
+        self.result_prices: Tuple[float, ...] = ()
+        self.seen_ids: Tuple[int, ...] = ()
+        self.turns: Tuple[Tuple[str, str], ...] = ()  # (message, reply)
+        self.updated_at = time.time()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "language": self.language,
+            "query": self.query,
+            "filters": self.filters,
+            "has_query_vector": self.query_vector is not None,
+            "result_ids": list(self.result_ids),
+            "result_prices": [None if np.isnan(price) else price for price in self.result_prices],
+            "seen": len(self.seen_ids),
+            "turns": [{"message": message, "reply": reply} for message, reply in self.turns],
+            "updated_at": self.updated_at,
+        }
+
+class SessionStore:
+    """
+    Sessions by user_id in an in-process LRU with TTL (the "sessions" cache).
+    When a shared backend is configured (CACHE_REDIS_URL, or a local stand-in
+    via set_shared_backend) it is the source of truth, so a user's follow-up
+    sees the last turn whichever worker handled it; the local copy is only
+    used while the backend is unreachable.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self.local = TTLCache("sessions", maxsize=maxsize, ttl=ttl, shared=False)
+
+    def _shared_key(self, user_id: str) -> str:
+        return f"eazy:session:{user_id}"
+
+    def get(self, user_id: str) -> Optional[Session]:
+        backend = get_shared_backend()
+        if backend is not None:
+            try:
+                session = backend.get(self._shared_key(user_id))
+                return None if session is MISSING else session
+            except Exception as e:
+                logger.warning("shared session read failed", extra={"user_id": user_id, "error": str(e)})
+        session = self.local.get(user_id)
+        return None if session is MISSING else session
+
+    def save(self, user_id: str, session: Session):
+        self.local.set(user_id, session)
+        backend = get_shared_backend()
+        if backend is not None:
+            try:
+                backend.set(self._shared_key(user_id), session, self.ttl)
+            except Exception as e:
+                logger.warning("shared session write failed", extra={"user_id": user_id, "error": str(e)})
+
+    def delete(self, user_id: str):
+        self.local.delete(user_id)
+        backend = get_shared_backend()
+        if backend is not None:
+            try:
+                backend.delete(self._shared_key(user_id))
+            except Exception as e:
+                logger.warning("shared session delete failed", extra={"user_id": user_id, "error": str(e)})
+
+# Global variable for lazy loading
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(settings.SESSION_MAX_USERS, settings.SESSION_TTL_SECONDS)
+    return _store
+
+# Follow-ups that only make sense against the previous search. A message counts
+# as one when, without filler words, it is nothing but one of these.
+_FILLER = {
+    "show", "me", "give", "any", "anything", "something", "some", "got", "do", "you", "have", "are", "there",
+    "what", "about", "how", "i", "want", "need", "the", "a", "ones", "one", "options", "option", "please",
+    "pls", "plz", "instead", "these", "those", "them", "that", "it", "with", "price", "ok", "okay", "and",
+    "لي", "اعطني", "عندك", "عندكم", "في", "هل", "اريد", "أريد", "ابغى", "ابي", "شي", "شيء", "هذا", "هذه",
+    "هذي", "منها", "لو", "سمحت", "خيارات", "بسعر", "و",
+}
+_CURRENCY = r"(?: aed| dirhams?| dhs?| درهم| دراهم)?"
+_REFINEMENTS = (
+    ("max_price", re.compile(r"(?:under|below|less than|cheaper than|max|maximum|up to|within|budget|"
+                             r"اقل من|أقل من|تحت|بحدود|حدود|حتى) num" + _CURRENCY)),
+    ("max_price", re.compile(r"num" + _CURRENCY + r" (?:or less|max|and below|or below)")),
+    ("min_price", re.compile(r"(?:over|above|more than|at least|min|minimum|اكثر من|أكثر من|فوق) num" + _CURRENCY)),
+    ("cheaper", re.compile(r"(?:cheaper|cheapest|less expensive|lower price|lower priced)(?: than)?|"
+                           r"ارخص|أرخص|الارخص|الأرخص")),
+    ("pricier", re.compile(r"(?:more expensive|pricier|higher end|premium)(?: than)?|"
+                           r"اغلى|أغلى|الاغلى|الأغلى")),
+    ("more", re.compile(r"more|others|other|else|next|another|more like|similar|"
+                        r"المزيد|غيرها|غير|كمان|اكثر|أكثر|اخرى|أخرى|ثانية")),
+)
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+def parse_refinement(text: str) -> Optional[Tuple[str, Optional[float]]]:
+    """(kind, amount) when text is only a follow-up to the last search, e.g. ("max_price", 200.0)."""
+    raw = (text or "").replace(",", "")
+    numbers = _NUMBER_RE.findall(raw)
+    if len(numbers) > 1:
+        return None
+    normalized = normalize_message(_NUMBER_RE.sub(" NUM ", raw))
+    core = " ".join(word for word in normalized.split() if word not in _FILLER)
+    for kind, pattern in _REFINEMENTS:
+        if pattern.fullmatch(core):
+            return kind, float(numbers[0]) if numbers else None
+    return None
+
+def refine_from_session(session: Optional[Session], text: str) -> Optional[Dict[str, Any]]:
+    """
+    State updates (language, intent, query, filters, refinement) that answer
+    text from the session's last search, or None when text is not a
+    follow-up or there is nothing to refine.
+    """
+    if session is None or not session.query:
+        return None
+    parsed = parse_refinement(text)
+    if parsed is None:
+        return None
+    kind, amount = parsed
+    field = kind
+    prices = [price for price in session.result_prices if not np.isnan(price)]
+    if kind == "cheaper":
+        # Cheaper than anything shown so far
+        if not prices or min(prices) <= 0.01:
+            return None
+        field, amount = "max_price", round(min(prices) - 0.01, 2)
+    elif kind == "pricier":
+        if not prices:
+            return None
+        field, amount = "min_price", round(max(prices) + 0.01, 2)
+
+    filters = dict(session.filters or {})
+    if field == "max_price":
+        filters["max_price"] = amount
+        if filters.get("min_price") is not None and filters["min_price"] > amount:
+            del filters["min_price"]
+    elif field == "min_price":
+        filters["min_price"] = amount
+        if filters.get("max_price") is not None and filters["max_price"] < amount:
+            del filters["max_price"]
+
+    if session.query_vector is not None:
+        remember_embedding(session.query, session.query_vector)
+    refinements_total.inc(kind=kind)
+    return {
+        "language": detect_language_local(text)[0] or session.language,
+        "intent": "product_recommend",
+        "query": session.query,
+        "filters": filters or None,
+        "refinement": kind,
+    }
+
+def _clip(text: str) -> str:
+    return text if len(text) <= settings.SESSION_TURN_CHARS else text[:settings.SESSION_TURN_CHARS] + "…"
+
+def record_turn(session: Optional[Session], state: Dict[str, Any]) -> Session:
+    """The session after a processed message: its turn and, if it searched, the search and what it showed."""
+    session = session or Session()
+    turn = (_clip(state["text"]), _clip(state.get("llm_reply") or ""))
+    session.turns = (session.turns + (turn,))[-settings.SESSION_MAX_TURNS:]
+    session.language = state.get("language") or session.language
+    results = state.get("results")
+    if results is not None:
+        if state.get("query") != session.query or session.query_vector is None:
+            vector = cached_embedding(state["query"]) if state.get("query") else None
+            session.query_vector = None if vector is None else vector.astype("float16")
+        session.query = state.get("query")
+        session.filters = state.get("filters")
+        session.result_ids = tuple(results["product_ids"])
+        session.result_prices = tuple(float(price) for price in results["prices"])
+        seen = session.seen_ids if state.get("refinement") == "more" else ()
+        session.seen_ids = (seen + session.result_ids)[-MAX_SEEN_IDS:]
+    session.updated_at = time.time()
+    return session
@@ -1,5 +1,5 @@
 # app/core/state.py
-from typing import TypedDict, Optional, Any
+from typing import TypedDict, Optional, Any, Dict
 
 class AgentState(TypedDict):
     """Represents the state of the LangGraph agent."""
@@ -8,5 +8,9 @@ class AgentState(TypedDict):
     language: Optional[str]
     intent: Optional[str]
     query: Optional[str]
+    filters: Optional[Dict[str, Any]]  # SearchFilters fields that were stated
     llm_reply: Optional[str]
+    session: Optional[Any]  # the user's Session before this message (app/core/session.py)
+    refinement: Optional[str]  # follow-up kind answered from the session ("cheaper", "more", ...)
+    results: Optional[Dict[str, Any]]  # ids and prices of the products in the reply
     debug: Optional[Any]
\ No newline at end of file
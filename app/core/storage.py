@@ -1,26 +1,156 @@
 # app/core/storage.py
 import json
+import queue
+import sqlite3
+import threading
+import time
 from pathlib import Path
-from app.core import config
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.core.logs import get_logger
 
-_storage_path = Path(config.STORAGE_FILE)
-_storage_path.parent.mkdir(parents=True, exist_ok=True)
+logger = get_logger("storage")
 
-def _read_all():
-    if not _storage_path.exists():
-        return []
-    with _storage_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_user ON transcripts (user_id, id);
+"""
 
-def _write_all(data):
-    with _storage_path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+_STOP = object()
+
+class TranscriptStore:
+    """
+    Append-only transcript log in SQLite (WAL mode). Writes are queued and
+    flushed by one background thread in batched transactions, so callers never
+    wait on disk; reads use the (user_id, id) index to fetch only the last rows.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 200, flush_interval: float = 0.05):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._queue = queue.Queue()
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        self._migrate_legacy_json(conn)
+
+        self._writer = threading.Thread(target=self._write_loop, name="transcript-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside the writer."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _migrate_legacy_json(self, conn: sqlite3.Connection):
+        """Import the old whole-file JSON log once, if one sits next to the database."""
+        legacy = self.path.with_suffix(".json")
+        if not legacy.exists() or conn.execute("SELECT 1 FROM transcripts LIMIT 1").fetchone():
+            return
+        with legacy.open("r", encoding="utf-8") as f:
+            records = json.load(f)
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "INSERT INTO transcripts (user_id, text, created_at) VALUES (?, ?, ?)",
+                [(r.get("user", ""), r.get("text", ""), now) for r in records],
+            )
+        legacy.rename(legacy.with_suffix(".json.migrated"))
+        logger.info("migrated legacy transcripts", extra={"transcripts": len(records), "path": str(legacy)})
+
+    def append(self, user_id: str, text: str):
+        """Queue a transcript for the background writer; returns immediately."""
+        self._queue.put((user_id, text, time.time()))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                with conn:
+                    conn.executemany("INSERT INTO transcripts (user_id, text, created_at) VALUES (?, ?, ?)", batch)
+            except sqlite3.Error as e:
+                logger.error("failed to write transcripts", extra={"transcripts": len(batch), "error": str(e)})
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Block until every queued transcript has been written."""
+        self._queue.join()
+
+    def tail(self, limit: int = 50, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The last `limit` transcripts, oldest first, optionally for one user."""
+        self.flush()
+        conn = self._connect()
+        if user_id is None:
+            rows = conn.execute(
+                "SELECT user_id, text, created_at FROM transcripts ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT user_id, text, created_at FROM transcripts WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        return [{"user": user, "text": text, "ts": ts} for user, text, ts in reversed(rows)]
+
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        self._queue.put(_STOP)
+        self._writer.join()
+
+# Global variable for lazy loading
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> TranscriptStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = Path(settings.STORAGE_FILE)
+                if path.suffix == ".json":
+                    # Old JSON log location: keep the database beside it and import it
+                    path = path.with_suffix(".db")
+                _store = TranscriptStore(path)
+    return _store
 
 def store_transcript(user_id: str, text: str):
-    data = _read_all()
-    data.append({"user": user_id, "text": text})
-    _write_all(data)
+    get_store().append(user_id, text)
+
+def get_transcripts(limit: int = 50, user_id: Optional[str] = None):
+    return get_store().tail(limit, user_id)
 
-def get_transcripts(limit: int = 50):
-    data = _read_all()
-    return data[-limit:]
+def close_store():
+    """Flush queued transcripts on shutdown."""
+    if _store is not None:
+        _store.close()
@@ -0,0 +1,71 @@
+import json
+import re
+from typing import Literal, Optional
+
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel, ValidationError
+from app.core.cache import MISSING
+from app.core.filters import SearchFilters
+from app.core.llm import get_llm
+from app.core.logs import get_logger
+from app.core.metrics import fallback
+from app.core.prompts import UNDERSTAND_PROMPT
+from app.core.response_cache import ResponseCache
+
+class MessageUnderstanding(BaseModel):
+    """Schema the combined language/intent/query call must satisfy."""
+    language: Literal["en", "ar"]
+    intent: Literal["greet", "product_recommend", "smalltalk"]
+    query: str = ""
+    filters: SearchFilters = SearchFilters()
+
+# Validated replies per message (the combined call detects the language itself)
+understanding_cache = ResponseCache("understandings")
+logger = get_logger("understand")
+
+def parse_understanding(content: str) -> Optional[MessageUnderstanding]:
+    """Validate the model's reply against MessageUnderstanding; None if it does not conform."""
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+        if isinstance(data.get("language"), str):
+            data["language"] = data["language"].strip().lower()
+        if isinstance(data.get("intent"), str):
+            data["intent"] = data["intent"].strip().lower()
+        if not isinstance(data.get("filters"), dict):
+            data.pop("filters", None)
+        result = MessageUnderstanding(**data)
+    except (ValueError, TypeError, AttributeError, ValidationError):
+        return None
+    if result.intent == "product_recommend" and not result.query.strip():
+        return None
+    return result
+
+async def aunderstand_message(text: str) -> Optional[MessageUnderstanding]:
+    """
+    Detects language, intent and search query with a single LLM call.
+    Returns None when the call fails or the reply does not match the schema,
+    so callers can fall back to the per-step detectors.
+    """
+    if not text:
+        return None
+    cached = await understanding_cache.alookup(text)
+    if cached is not MISSING:
+        return cached
+    prompt = UNDERSTAND_PROMPT.format(text=text)
+    try:
+        llm_model = get_llm(json_mode=True)
+        response = await llm_model.ainvoke([HumanMessage(content=prompt)])
+        result = parse_understanding(response.content)
+        if result is None:
+            logger.warning("reply did not match schema", extra={"func": "aunderstand_message", "reply": response.content})
+            fallback("understand")
+        else:
+            understanding_cache.store(text, "", result)
+        return result
+    except Exception as e:
+        logger.warning("message understanding failed", extra={"func": "aunderstand_message", "error": str(e)})
+        fallback("understand")
+        return None
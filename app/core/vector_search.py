@@ -1,20 +1,122 @@
+import asyncio
 import faiss
 import numpy as np
+import hashlib
 import json
 import os
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
-from app.core.embedding_model import embed_text, get_embedding_model
+from typing import List, Dict, Any, Optional, Tuple
+from app.core.batching import get_search_batcher
+from app.core.cache import MISSING, TTLCache
+from app.core.catalog import ProductCatalog
+from app.core.config import settings
+from app.core.embedding_model import embed_text, embed_batch, get_embedding_model, query_embedding_cache, EMBEDDING_DIM
+from app.core.filters import FilterIndex, SearchFilters
+from app.core.lexical import BM25Index, reciprocal_rank_fusion
+from app.core.logs import get_logger
+from app.core.metrics import search_seconds
+from app.core.reranker import rerank
 from app.core.s3_loader import S3ProductLoader
 
+logger = get_logger("search")
+
 # Paths
 INDEX_FILE = Path(__file__).parent.parent.parent / "data" / "faiss_index.bin"
+META_FILE = INDEX_FILE.with_suffix(".meta.json")
+
+# Bump when the on-disk layout or embedding space changes so old indexes get rebuilt
+INDEX_FORMAT_VERSION = 3
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+MIN_POINTS_PER_CENTROID = 39  # below this faiss k-means warns and clusters poorly
+PQ_CENTROIDS = 256  # 8-bit PQ codes
+
+# Product fields that carry a stable identity, in order of preference
+ID_FIELDS = ("id", "product_id", "sku", "asin", "affiliate_url", "url")
+# Codes shoppers type verbatim; indexed for keyword search but not embedded
+CODE_FIELDS = ("sku", "model", "model_number", "mpn", "asin")
+
+SEARCH_MODES = ("vector", "bm25", "hybrid")
+LEXICAL_MODES = ("bm25", "hybrid")  # need the BM25 index
+
+# Filtered vector search: above this share of matching products, over-fetch
+# unfiltered results and drop non-matches; below it, search only the matching
+# ids (an IDSelector for flat/IVF, exact scoring of their vectors for HNSW)
+OVERFETCH_MIN_SELECTIVITY = 0.05
 
 # Global variables for lazy loading
-_products = None
-_index = None
+_products = None  # catalog loaded before the first generation exists
+_generation = None  # live CatalogGeneration; swapped whole on refresh
+_generation_counter = 0
+_retired = weakref.WeakSet()  # replaced generations some search may still hold
 _s3_loader = None
-VECTOR_DIM = 384  # for 'all-MiniLM-L6-v2'
+_load_lock = threading.RLock()  # requests now search from worker threads
+_refresh_lock = threading.Lock()  # one background refresh at a time
+_refresh_status: Dict[str, Any] = {"state": "idle"}
+VECTOR_DIM = EMBEDDING_DIM
+
+# Top-k FAISS ids per (index version, query, k)
+search_cache = TTLCache("search_results", maxsize=settings.SEARCH_CACHE_SIZE, ttl=settings.CACHE_TTL_SECONDS)
+
+class CatalogGeneration:
+    """
+    One consistent catalog + FAISS index pair. Searches take a reference to the
+    live generation and use only it, so a refresh can swap in a new one while
+    they run; the old one is freed once the last search holding it returns.
+    """
+
+    def __init__(self, number: int, products, index: faiss.Index, positions: Dict[int, int], version: str,
+                 build_seconds: float, lexical: Optional[BM25Index] = None, filters: Optional[FilterIndex] = None):
+        self.number = number
+        self.products = products
+        self.index = index
+        self.positions = positions  # FAISS id -> position in products
+        self.lexical = lexical  # BM25 over the same products, for hybrid search
+        self.filters = filters  # price/brand/category/currency lookups
+        # The same mapping as arrays, in insertion order (= BM25 document order)
+        self.ids = np.fromiter(positions.keys(), dtype="int64", count=len(positions))
+        self.id_positions = np.fromiter(positions.values(), dtype="int64", count=len(positions))
+        self._id_order = np.argsort(self.ids)
+        self._internal = None  # (external ids in index order, argsort) for IndexIDMap
+        self.version = version  # fingerprint of the catalog and index settings
+        self.build_seconds = build_seconds
+        self.built_at = time.time()
+
+    def allowed_ids(self, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+        """Boolean mask over self.ids of products matching filters; None when unfiltered."""
+        if self.filters is None:
+            return None
+        mask = self.filters.mask(filters)
+        return None if mask is None else mask[self.id_positions]
+
+    def id_rows(self, ids: np.ndarray) -> np.ndarray:
+        """Row in self.ids of each FAISS id (ids must belong to this generation)."""
+        return self._id_order[np.searchsorted(self.ids, ids, sorter=self._id_order)]
+
+    def internal_rows(self, ids: np.ndarray) -> np.ndarray:
+        """Storage order of FAISS ids inside an IndexIDMap, for reconstruct_batch."""
+        if self._internal is None:
+            external = faiss.vector_to_array(self.index.id_map)
+            self._internal = (external, np.argsort(external))
+        external, order = self._internal
+        return order[np.searchsorted(external, ids, sorter=order)]
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "generation": self.number,
+            "version": self.version,
+            "products": len(self.products),
+            "vectors": int(self.index.ntotal),
+            "index": describe_index(self.index),
+            "lexical_terms": len(self.lexical.vocab) if self.lexical is not None else 0,
+            "build_seconds": round(self.build_seconds, 2),
+            "built_at": self.built_at,
+        }
 
 def get_s3_loader():
     """Get S3 loader instance"""
@@ -24,88 +126,647 @@ def get_s3_loader():
     return _s3_loader
 
 def get_products():
-    """Lazy load products from S3"""
+    """Products of the live generation, lazily loading the catalog before the first one"""
     global _products
+    generation = _generation
+    if generation is not None:
+        return generation.products
     if _products is None:
-        print("🔄 Loading products from S3...")
-        s3_loader = get_s3_loader()
-        _products = s3_loader.get_products()
-        print(f"✅ Loaded {len(_products)} products from S3!")
+        with _load_lock:
+            if _products is None:
+                s3_loader = get_s3_loader()
+                _products = s3_loader.get_products()
+                logger.info("product catalog loaded", extra={"products": len(_products)})
     return _products
 
+def _load_generation(products) -> Tuple[faiss.Index, Dict[int, int], str]:
+    """Load or build the index for a catalog; returns (index, id positions, version)."""
+    entries = catalog_entries(products)
+    shared = settings.SHARED_READONLY
+    index, stored_hashes = load_index(mmap=shared)
+    if index is None:
+        index = build_and_save_index(entries, products)
+    elif any(index_changes(stored_hashes, entries)):
+        if shared:
+            # A mapped index is read-only; update a private copy and map the result
+            index, stored_hashes = load_index()
+        index = update_index(index, stored_hashes, entries, products)
+    else:
+        shared = False  # already mapped
+    if shared:
+        index, _ = load_index(mmap=True)
+    apply_search_params(index)
+    positions = {pid: pos for pid, (pos, _) in entries.items()}
+    return index, positions, catalog_version(products)
+
+def _build_generation(products) -> CatalogGeneration:
+    """Load or build the index for a catalog as a new, not yet live, generation."""
+    global _generation_counter
+    started = time.perf_counter()
+    index, positions, version = _load_generation(products)
+    lexical = build_lexical_index(products, positions) if settings.SEARCH_MODE in LEXICAL_MODES else None
+    filters = FilterIndex(products)
+    with _load_lock:
+        _generation_counter += 1
+        number = _generation_counter
+    return CatalogGeneration(number, products, index, positions, version, time.perf_counter() - started, lexical, filters)
+
+def _swap_generation(generation: CatalogGeneration):
+    """Make a generation live; the previous one stays valid for searches already holding it."""
+    global _generation, _products
+    with _load_lock:
+        if _generation is not None:
+            _retired.add(_generation)
+        _generation = generation
+        _products = None
+        search_cache.clear()
+
+def get_generation() -> CatalogGeneration:
+    """The live catalog + index generation, building the first one on demand"""
+    if _generation is None:
+        with _load_lock:
+            if _generation is None:
+                _swap_generation(_build_generation(get_products()))
+                logger.info("search index loaded", extra={"generation": _generation.number, "vectors": _generation.index.ntotal})
+    return _generation
+
 def get_index():
-    """Lazy load or build FAISS index"""
-    global _index
-    if _index is None:
-        print("🔄 Loading FAISS index...")
-        products = get_products()
-        
-        if INDEX_FILE.exists():
-            print("🔄 Loading existing FAISS index from disk...")
-            _index = faiss.read_index(str(INDEX_FILE))
-            
-            # Check if catalog size changed
-            if _index.ntotal != len(products):
-                print("⚠️ Product count changed — rebuilding index...")
-                _index = build_and_save_index()
-        else:
-            _index = build_and_save_index()
-        print("✅ FAISS index loaded successfully!")
-    return _index
-
-def build_and_save_index():
-    """Generate embeddings and save FAISS index"""
-    print("⚙️ Rebuilding FAISS index from S3 products...")
-    products = get_products()
-    
-    # Handle different product structures
-    product_texts = []
-    for p in products:
-        # Try different field combinations
-        title = p.get('title') or p.get('name') or p.get('name_en') or p.get('name_ar') or ''
-        description = p.get('description') or p.get('details') or p.get('description_en') or p.get('description_ar') or ''
-        category = p.get('category') or p.get('type') or ''
-        brand = p.get('brand') or ''
-        
-        # Create searchable text
-        product_text = f"{title} {description} {category} {brand}".strip()
-        product_texts.append(product_text)
-    
-    print(f"🔄 Generating embeddings for {len(product_texts)} products...")
-    
-    # Process in batches to avoid memory issues
-    batch_size = 1000
-    product_embeddings = []
-    
-    for i in range(0, len(product_texts), batch_size):
-        batch = product_texts[i:i + batch_size]
-        print(f"🔄 Processing batch {i//batch_size + 1}/{(len(product_texts) + batch_size - 1)//batch_size}")
-        
-        batch_embeddings = [embed_text(t) for t in batch]
-        product_embeddings.extend(batch_embeddings)
-    
-    product_embeddings = np.array(product_embeddings).astype("float32")
-    
-    index = faiss.IndexFlatL2(VECTOR_DIM)
-    index.add(product_embeddings)
-    
+    """Lazy load the FAISS index, brought in sync with the current catalog"""
+    return get_generation().index
+
+def refresh_catalog() -> bool:
+    """
+    Fetch only the S3 files whose ETag changed since the local snapshot, build
+    a new generation off the request path and swap it in. Returns True if the
+    catalog changed; returns False straight away if a refresh is already running.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        logger.warning("catalog refresh already running")
+        return False
+    started = time.perf_counter()
+    _refresh_status.update(state="running", started_at=time.time(), error=None)
+    try:
+        get_generation()
+        loader = get_s3_loader()
+        if not loader.refresh():
+            logger.info("catalog is up to date")
+            _refresh_status.update(state="idle", changed=False)
+            return False
+        generation = _build_generation(loader.products)
+        _swap_generation(generation)
+        loader.commit()
+        _refresh_status.update(state="idle", changed=True)
+        logger.info("catalog refreshed", extra={
+            "generation": generation.number,
+            "products": len(generation.products),
+            "vectors": generation.index.ntotal,
+            "build_seconds": round(generation.build_seconds, 1),
+        })
+        return True
+    except Exception as e:
+        logger.warning("catalog refresh failed", extra={"error": str(e)})
+        _refresh_status.update(state="failed", error=str(e))
+        return False
+    finally:
+        _refresh_status.update(finished_at=time.time(), duration_seconds=round(time.perf_counter() - started, 2))
+        _refresh_lock.release()
+
+def is_refreshing() -> bool:
+    return _refresh_lock.locked()
+
+def is_catalog_loaded() -> bool:
+    """Whether the catalog is in memory; never triggers a load."""
+    return _generation is not None or _products is not None
+
+def is_index_loaded() -> bool:
+    """Whether a live generation (catalog + index) exists; never triggers a load."""
+    return _generation is not None
+
+def generation_report() -> Dict[str, Any]:
+    """Live generation, retired generations still held by searches, and the last refresh."""
+    generation = _generation
+    return {
+        "active": generation.info() if generation is not None else None,
+        "retired_in_use": sorted(g.number for g in list(_retired)),
+        "refresh": dict(_refresh_status),
+    }
+
+def get_id_positions() -> Dict[int, int]:
+    """Mapping from FAISS ids to positions in the product list."""
+    return get_generation().positions
+
+def get_index_version() -> str:
+    """Fingerprint of the live index; cache keys built on it go stale on rebuild."""
+    return get_generation().version
+
+def _clean(value: Any) -> str:
+    """Stringify a product field, treating None/NaN (from pandas) as empty."""
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value).strip()
+
+def product_title(p: Dict[str, Any]) -> str:
+    """The product's display name, whichever field it lives in."""
+    return p.get('title') or p.get('name') or p.get('name_en') or p.get('name_ar') or ''
+
+def product_to_text(p: Dict[str, Any]) -> str:
+    """Build the searchable text for a product, handling different product structures."""
+    # Try different field combinations
+    title = product_title(p)
+    description = p.get('description') or p.get('details') or p.get('description_en') or p.get('description_ar') or ''
+    category = p.get('category') or p.get('type') or ''
+    brand = p.get('brand') or ''
+
+    return f"{title} {description} {category} {brand}".strip()
+
+def product_lexical_text(p: Dict[str, Any]) -> str:
+    """Searchable text plus model numbers and SKUs, for the keyword index."""
+    codes = " ".join(_clean(p.get(field)) for field in CODE_FIELDS)
+    return f"{product_to_text(p)} {codes}".strip()
+
+def build_lexical_index(products, positions: Dict[int, int]) -> BM25Index:
+    """BM25 index over the same products (and FAISS ids) as the vector index."""
+    ids = np.fromiter(positions.keys(), dtype="int64", count=len(positions))
+    return BM25Index((product_lexical_text(products[pos]) for pos in positions.values()), ids)
+
+def product_key(p: Dict[str, Any]) -> str:
+    """Stable identity of a product: its first id-like field, else its title and brand."""
+    for field in ID_FIELDS:
+        value = _clean(p.get(field))
+        if value:
+            return f"{field}:{value}"
+    return f"title:{_clean(product_title(p))}|{_clean(p.get('brand'))}"
+
+def product_id(p: Dict[str, Any]) -> int:
+    """Stable, non-negative 63-bit FAISS id derived from the product key."""
+    digest = hashlib.blake2b(product_key(p).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+def content_hash(p: Dict[str, Any]) -> str:
+    """Hash of the text that gets embedded; changes whenever the vector would."""
+    return hashlib.blake2b(product_to_text(p).encode("utf-8"), digest_size=16).hexdigest()
+
+def catalog_entries(products: List[Dict[str, Any]]) -> Dict[int, Tuple[int, str]]:
+    """Map each product's FAISS id to (position in products, content hash)."""
+    entries = {}
+    duplicates = 0
+    for pos, p in enumerate(products):
+        pid = product_id(p)
+        if pid in entries:
+            duplicates += 1
+            continue
+        entries[pid] = (pos, content_hash(p))
+    if duplicates:
+        logger.warning("skipped products with duplicate ids", extra={"duplicates": duplicates})
+    return entries
+
+def catalog_version(products) -> str:
+    """Hash of every product row plus the index and search settings."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([index_spec(), settings.FAISS_NPROBE, settings.FAISS_EF_SEARCH]).encode("utf-8"))
+    if isinstance(products, ProductCatalog):
+        digest.update(products.fingerprint().encode("utf-8"))
+    else:
+        for p in products:
+            digest.update(repr(sorted(p.items(), key=lambda item: str(item[0]))).encode("utf-8"))
+    return digest.hexdigest()
+
+def load_index(mmap: bool = False) -> Tuple[Optional[faiss.Index], Dict[int, str]]:
+    """
+    Load the index and its per-product content hashes, or (None, {}) if unusable.
+    With mmap the vectors (and HNSW graph) are mapped read-only from the file
+    (IO_FLAG_MMAP_IFC | IO_FLAG_READ_ONLY; plain IO_FLAG_MMAP copies id-mapped
+    indexes into memory), so processes loading the same file share its pages.
+    """
+    if not INDEX_FILE.exists() or not META_FILE.exists():
+        return None, {}
+    try:
+        with META_FILE.open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_FORMAT_VERSION or meta.get("dim") != VECTOR_DIM:
+            logger.warning("index format changed, rebuilding", extra={"path": str(INDEX_FILE)})
+            return None, {}
+        if meta.get("spec") != index_spec():
+            logger.warning("index type changed, rebuilding", extra={"index_type": settings.FAISS_INDEX_TYPE})
+            return None, {}
+        index = faiss.read_index(str(INDEX_FILE), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0)
+        hashes = {int(pid): h for pid, h in meta["hashes"].items()}
+        if index.ntotal != len(hashes):
+            logger.warning("index and metadata disagree, rebuilding", extra={"vectors": index.ntotal, "hashes": len(hashes)})
+            return None, {}
+        logger.info("search index read from disk", extra={"vectors": index.ntotal, "mmap": mmap})
+        return index, hashes
+    except Exception as e:
+        logger.warning("could not load search index", extra={"path": str(INDEX_FILE), "error": str(e)})
+        return None, {}
+
+def save_index(index: faiss.Index, hashes: Dict[int, str]):
+    """Atomically write the index and its metadata next to each other."""
     INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
-    faiss.write_index(index, str(INDEX_FILE))
-    print(f"✅ Index rebuilt and saved with {len(products)} products.")
+    tmp_index = INDEX_FILE.with_suffix(".bin.tmp")
+    tmp_meta = META_FILE.with_suffix(".json.tmp")
+    faiss.write_index(index, str(tmp_index))
+    with tmp_meta.open("w", encoding="utf-8") as f:
+        json.dump({
+            "version": INDEX_FORMAT_VERSION,
+            "dim": VECTOR_DIM,
+            "spec": index_spec(),
+            "index": describe_index(index),
+            "hashes": {str(pid): h for pid, h in hashes.items()},
+        }, f)
+    os.replace(tmp_index, INDEX_FILE)
+    os.replace(tmp_meta, META_FILE)
+
+def index_spec() -> Dict[str, Any]:
+    """Configured index type and build-time parameters; a change forces a rebuild."""
+    kind = settings.FAISS_INDEX_TYPE
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"FAISS_INDEX_TYPE must be one of {INDEX_TYPES}, got {kind!r}")
+    spec = {"type": kind}
+    if kind in ("ivf_flat", "ivf_pq"):
+        spec["nlist"] = settings.FAISS_NLIST
+    if kind == "ivf_pq":
+        spec["pq_m"] = settings.FAISS_PQ_M
+    if kind == "hnsw":
+        spec["hnsw_m"] = settings.FAISS_HNSW_M
+    return spec
+
+def describe_index(index: faiss.Index) -> str:
+    """Human readable index class, e.g. 'IndexIDMap(IndexHNSWFlat)'."""
+    name = type(index).__name__
+    if isinstance(index, faiss.IndexIDMap):
+        name += f"({type(faiss.downcast_index(index.index)).__name__})"
+    return name
+
+def index_factory_string(kind: str, n: int) -> str:
+    """
+    faiss.index_factory description for an index type sized for n vectors.
+    Falls back to a simpler type when there are too few vectors to train on.
+    """
+    if kind == "ivf_pq" and n < PQ_CENTROIDS * MIN_POINTS_PER_CENTROID:
+        logger.warning("too few products to train PQ codes, using ivf_flat", extra={"products": n})
+        kind = "ivf_flat"
+    if kind in ("ivf_flat", "ivf_pq"):
+        nlist = min(settings.FAISS_NLIST, n // MIN_POINTS_PER_CENTROID)
+        if nlist < 2:
+            logger.warning("too few products for IVF clustering, using flat", extra={"products": n})
+            kind = "flat"
+    if kind == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if kind == "ivf_pq":
+        return f"IVF{nlist},PQ{settings.FAISS_PQ_M}"
+    if kind == "hnsw":
+        return f"IDMap,HNSW{settings.FAISS_HNSW_M}"
+    return "IDMap,Flat"
+
+def create_index(embeddings: np.ndarray, kind: Optional[str] = None) -> faiss.Index:
+    """Create an empty id-mapped index, trained on a sample of the embeddings if needed."""
+    kind = kind or settings.FAISS_INDEX_TYPE
+    description = index_factory_string(kind, len(embeddings))
+    index = faiss.index_factory(VECTOR_DIM, description, faiss.METRIC_L2)
+    if not index.is_trained:
+        sample_size = min(len(embeddings), settings.FAISS_TRAIN_SAMPLE)
+        rng = np.random.default_rng(0)
+        sample = embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+        started = time.perf_counter()
+        index.train(sample)
+        logger.info("index trained", extra={
+            "index": description, "vectors": sample_size, "seconds": round(time.perf_counter() - started, 1),
+        })
+    return index
+
+def apply_search_params(index: faiss.Index):
+    """Apply query-time knobs (nprobe for IVF, efSearch for HNSW); they are not persisted."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(settings.FAISS_NPROBE, ivf.nlist)
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = settings.FAISS_EF_SEARCH
+
+def _embed_entries(products: List[Dict[str, Any]], ids: List[int], entries: Dict[int, Tuple[int, str]]) -> np.ndarray:
+    texts = [product_to_text(products[entries[pid][0]]) for pid in ids]
+    return embed_batch(texts)
+
+def build_and_save_index(entries: Optional[Dict[int, Tuple[int, str]]] = None, products=None):
+    """Generate embeddings for the whole catalog and save the FAISS index"""
+    started = time.perf_counter()
+    if products is None:
+        products = get_products()
+    if entries is None:
+        entries = catalog_entries(products)
+    ids = list(entries)
+
+    product_embeddings = _embed_entries(products, ids, entries)
+
+    index = create_index(product_embeddings)
+    index.add_with_ids(product_embeddings, np.array(ids, dtype="int64"))
+
+    save_index(index, {pid: h for pid, (_, h) in entries.items()})
+    logger.info("index rebuilt", extra={"products": len(ids), "seconds": round(time.perf_counter() - started, 1)})
     return index
 
-def search_similar_products(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+def index_changes(stored_hashes: Dict[int, str], entries: Dict[int, Tuple[int, str]]) -> Tuple[List[int], List[int]]:
+    """(ids to remove, ids to embed) to bring an index with stored_hashes in line with entries."""
+    stale = [pid for pid, h in stored_hashes.items() if pid not in entries or entries[pid][1] != h]
+    fresh = [pid for pid, (_, h) in entries.items() if stored_hashes.get(pid) != h]
+    return stale, fresh
+
+def update_index(index: faiss.Index, stored_hashes: Dict[int, str], entries: Dict[int, Tuple[int, str]], products=None):
     """
-    Search for the most semantically similar products to the query.
+    Bring a loaded index in line with the catalog: drop vectors for deleted or
+    edited products and embed only new or edited ones.
     """
-    index = get_index()
-    products = get_products()
+    stale, fresh = index_changes(stored_hashes, entries)
+    if not stale and not fresh:
+        return index
+
+    if stale:
+        try:
+            index.remove_ids(np.array(stale, dtype="int64"))
+        except RuntimeError:
+            # HNSW graphs cannot drop vectors; rebuild from scratch instead
+            logger.warning("index does not support removal, rebuilding", extra={"index": describe_index(index)})
+            return build_and_save_index(entries, products)
+    if fresh:
+        if products is None:
+            products = get_products()
+        index.add_with_ids(_embed_entries(products, fresh, entries), np.array(fresh, dtype="int64"))
+
+    save_index(index, {pid: h for pid, (_, h) in entries.items()})
+    logger.info("index updated", extra={"removed": len(stale), "embedded": len(fresh), "vectors": index.ntotal})
+    return index
+
+def _selected_ids(generation: CatalogGeneration, query_vec: np.ndarray, ids: np.ndarray, n: int) -> List[int]:
+    """Nearest of a small set of ids, searching only them."""
+    index = generation.index
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        # A graph walk restricted to rare nodes dead-ends early; score their stored vectors exactly
+        vectors = inner.reconstruct_batch(generation.internal_rows(ids))
+        distances = ((vectors - query_vec) ** 2).sum(axis=1)
+        top = np.argsort(distances, kind="stable")[:n]
+        return [int(pid) for pid in ids[top]]
+    ivf = faiss.try_extract_index_ivf(index)
+    selector = faiss.IDSelectorBatch(ids)
+    if ivf is not None:
+        # The matching ids can sit in any list; probing only nprobe of them would miss some
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nlist)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    _, found = index.search(query_vec, min(n, len(ids)), params=params)
+    return [int(pid) for pid in found[0] if pid >= 0]
+
+def _search_index(index: faiss.Index, query: str, n: int, batching: Optional[bool] = None) -> np.ndarray:
+    """Row of the n nearest FAISS ids, through the search batcher when enabled."""
+    if settings.SEARCH_BATCHING if batching is None else batching:
+        return get_search_batcher().search(index, query, n)
     query_vec = embed_text(query).astype("float32").reshape(1, -1)
-    distances, indices = index.search(query_vec, top_k)
-    return [products[i] for i in indices[0]]
+    return index.search(query_vec, n)[1][0]
+
+def _vector_ids(generation: CatalogGeneration, query: str, n: int, allowed: Optional[np.ndarray] = None,
+                batching: Optional[bool] = None) -> List[int]:
+    """
+    Nearest FAISS ids to the query. With an allowed mask, common constraints
+    over-fetch and drop non-matches (growing the fetch until n survive), while
+    selective ones search only the matching ids.
+    """
+    index = generation.index
+    if allowed is None:
+        return [int(pid) for pid in _search_index(index, query, n, batching) if pid >= 0]
+
+    matching = int(allowed.sum())
+    if matching == 0:
+        return []
+    selectivity = matching / len(allowed)
+    if selectivity < OVERFETCH_MIN_SELECTIVITY:
+        query_vec = embed_text(query).astype("float32").reshape(1, -1)
+        return _selected_ids(generation, query_vec, generation.ids[allowed], n)
+
+    fetch = min(index.ntotal, int(np.ceil(n / selectivity * 1.5)))
+    while True:
+        found = _search_index(index, query, fetch, batching)
+        found = found[found >= 0]
+        kept = found[allowed[generation.id_rows(found)]]
+        if len(kept) >= n or fetch >= index.ntotal:
+            return [int(pid) for pid in kept[:n]]
+        fetch = min(index.ntotal, fetch * 2)
+
+def retrieve(generation: CatalogGeneration, query: str, top_k: int, mode: Optional[str] = None,
+             reranker: Optional[str] = None, lexical: Optional[BM25Index] = None,
+             filters: Optional[SearchFilters] = None, batching: Optional[bool] = None) -> Tuple[int, ...]:
+    """
+    Top-k FAISS ids for a query. "vector" ranks by embedding distance, "bm25" by
+    keyword score, and "hybrid" fuses HYBRID_CANDIDATES of each by reciprocal
+    rank, so exact brand/model matches surface next to semantic ones. With the
+    cross-encoder reranker the best RERANK_DEPTH fused ids are reordered.
+    Filters are applied inside both retrievers, so every returned id matches.
+    batching overrides SEARCH_BATCHING for the vector search.
+    """
+    mode = mode or settings.SEARCH_MODE
+    reranker = reranker or settings.RERANKER
+    lexical = lexical if lexical is not None else generation.lexical
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"SEARCH_MODE must be one of {SEARCH_MODES}, got {mode!r}")
+    if lexical is None and mode in LEXICAL_MODES:
+        # Only when SEARCH_MODE changed after the generation was built; the next one has the index
+        logger.warning("no BM25 index in this generation, searching by vector", extra={"mode": mode})
+        mode = "vector"
+    allowed = generation.allowed_ids(filters)
+
+    depth = max(top_k, settings.HYBRID_CANDIDATES, settings.RERANK_DEPTH if reranker == "cross_encoder" else 0)
+    if mode == "vector":
+        ids = _vector_ids(generation, query, depth if reranker == "cross_encoder" else top_k, allowed, batching)
+    elif mode == "bm25":
+        ids = lexical.search(query, depth, allowed)[0].tolist()
+    else:
+        ids = reciprocal_rank_fusion([
+            _vector_ids(generation, query, depth, allowed, batching),
+            lexical.search(query, depth, allowed)[0].tolist(),
+        ], settings.RRF_K)
+
+    if reranker == "cross_encoder":
+        candidates = [pid for pid in ids[:max(top_k, settings.RERANK_DEPTH)] if pid in generation.positions]
+        texts = [product_to_text(generation.products[generation.positions[pid]]) for pid in candidates]
+        ids = rerank(query, candidates, texts, top_k)
+    return tuple(ids[:top_k])
+
+def search_similar_products(query: str, top_k: int = 5, filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+    """
+    Search for the products most relevant to the query (see retrieve()),
+    restricted to products matching filters when given.
+    """
+    # One generation for the whole search, even if a refresh swaps in another meanwhile
+    generation = get_generation()
+    positions = generation.positions
+
+    filter_key = filters.key() if filters is not None else None
+    key = (generation.version, settings.SEARCH_MODE, settings.RERANKER, " ".join(query.split()), top_k, filter_key)
+    ids = search_cache.get(key)
+    if ids is MISSING:
+        with search_seconds.time(mode=settings.SEARCH_MODE):
+            ids = retrieve(generation, query, top_k, filters=filters)
+        search_cache.set(key, ids)
+    return [generation.products[positions[pid]] for pid in ids if pid in positions]
+
+def index_report(kinds: Tuple[str, ...] = INDEX_TYPES, k: int = 10, num_queries: int = 200) -> List[Dict[str, Any]]:
+    """
+    Compare recall@k and per-query latency of each index type against the exact
+    Flat baseline on the current catalog. Product titles are used as queries.
+    """
+    products = get_products()
+    embeddings = embed_batch([product_to_text(p) for p in products])
+    ids = np.arange(len(products), dtype="int64")
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(products), min(num_queries, len(products)), replace=False)
+    queries = embed_batch([_clean(product_title(products[i])) for i in sample], progress=False)
+
+    rows = []
+    baseline = None
+    for kind in ("flat",) + tuple(kd for kd in kinds if kd != "flat"):
+        started = time.perf_counter()
+        index = create_index(embeddings, kind)
+        index.add_with_ids(embeddings, ids)
+        apply_search_params(index)
+        build_seconds = time.perf_counter() - started
+
+        latencies = []
+        found = np.empty((len(queries), k), dtype="int64")
+        for row, query in enumerate(queries):
+            started = time.perf_counter()
+            _, found[row:row + 1] = index.search(query.reshape(1, -1), k)
+            latencies.append(time.perf_counter() - started)
+        if baseline is None:
+            baseline = found
+
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, baseline)])
+        rows.append({
+            "type": kind,
+            "index": describe_index(index),
+            f"recall@{k}": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            "build_s": round(build_seconds, 2),
+            "size_mb": round(faiss.serialize_index(index).nbytes / 1e6, 2),
+        })
+
+    for row in rows:
+        print("📊 " + "  ".join(f"{key}={value}" for key, value in row.items()))
+    return rows
+
+def _report_queries(generation: CatalogGeneration, num_queries: int, rng) -> Dict[str, List[Tuple[int, str]]]:
+    """(target id, query) pairs per query style, derived from random products."""
+    ids = list(generation.positions)
+    styles = {"title": [], "keywords": [], "code": []}
+    for i in rng.choice(len(ids), min(num_queries, len(ids)), replace=False):
+        pid = ids[i]
+        p = generation.products[generation.positions[pid]]
+        title = _clean(product_title(p))
+        if title:
+            styles["title"].append((pid, title))
+            words = title.split()
+            picked = [words[j] for j in sorted(rng.choice(len(words), min(3, len(words)), replace=False))]
+            styles["keywords"].append((pid, " ".join([_clean(p.get("brand"))] + picked).strip()))
+        code = next((_clean(p.get(field)) for field in CODE_FIELDS if _clean(p.get(field))), "")
+        if code:
+            styles["code"].append((pid, code))
+    return {style: pairs for style, pairs in styles.items() if pairs}
+
+def search_report(k: int = 5, num_queries: int = 200) -> List[Dict[str, Any]]:
+    """
+    Compare hit@k (is the source product in the top k) and per-query latency,
+    query encoding included, of vector, BM25 and hybrid retrieval on the current
+    catalog. Queries are product titles, brand + a few title words, and product
+    codes (SKU/model) where the catalog has them.
+    """
+    generation = get_generation()
+    lexical = generation.lexical or build_lexical_index(generation.products, generation.positions)
+    queries = _report_queries(generation, num_queries, np.random.default_rng(0))
+    runs = [("vector", "none"), ("bm25", "none"), ("hybrid", "none")]
+    if settings.RERANKER != "none":
+        runs.append(("hybrid", settings.RERANKER))
+
+    rows = []
+    for mode, reranker in runs:
+        for style, pairs in queries.items():
+            query_embedding_cache.clear()
+            hits, latencies = 0, []
+            for pid, query in pairs:
+                started = time.perf_counter()
+                found = retrieve(generation, query, k, mode, reranker, lexical)
+                latencies.append(time.perf_counter() - started)
+                hits += pid in found
+            rows.append({
+                "mode": mode if reranker == "none" else f"{mode}+{reranker}",
+                "queries": style,
+                f"hit@{k}": round(hits / len(pairs), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            })
+
+    for row in rows:
+        print("📊 " + "  ".join(f"{key}={value}" for key, value in row.items()))
+    return rows
+
+def batch_report(concurrency: int = 32, num_queries: int = 1024, k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Throughput of unfiltered vector search from `concurrency` threads, with and
+    without the search batcher. Queries are distinct product titles, so every
+    one is encoded.
+    """
+    generation = get_generation()
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(generation.products), num_queries)
+    queries = [f"{_clean(product_title(generation.products[int(i)]))} {n}" for n, i in enumerate(picks)]
+
+    rows = []
+    for batching in (False, True):
+        query_embedding_cache.clear()
+        before = get_search_batcher().stats()
+
+        def timed(query: str) -> float:
+            started = time.perf_counter()
+            retrieve(generation, query, k, mode="vector", reranker="none", batching=batching)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, queries))
+        elapsed = time.perf_counter() - started
+        after = get_search_batcher().stats()
+        batches = after["batches"] - before["batches"]
+        rows.append({
+            "batching": batching,
+            "concurrency": concurrency,
+            "qps": round(len(queries) / elapsed, 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+            "mean_batch": round((after["queries"] - before["queries"]) / batches, 1) if batches else 1,
+        })
+
+    for row in rows:
+        print("📊 " + "  ".join(f"{key}={value}" for key, value in row.items()))
+    return rows
 
 # For compatibility with the other developer's code
 async def initialize_vector_store():
     """Initializes or loads the FAISS index."""
     get_index()
-    get_products()
\ No newline at end of file
+    get_products()
+
+async def periodic_refresh(interval: float):
+    """Refresh the catalog every `interval` seconds in a worker thread, forever."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        await loop.run_in_executor(None, refresh_catalog)
+
+if __name__ == "__main__":
+    # python -m app.core.vector_search [index|search|batch]
+    if sys.argv[1:] == ["search"]:
+        search_report()
+    elif sys.argv[1:] == ["batch"]:
+        batch_report()
+    else:
+        index_report()
\ No newline at end of file
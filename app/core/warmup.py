@@ -0,0 +1,180 @@
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core import embedding_model, llm
+from app.core.config import settings
+from app.core.logs import get_logger
+
+logger = get_logger("warmup")
+
+class Component:
+    """
+    One thing the app loads lazily: how to load it, and a probe that tells
+    whether it is loaded without ever loading it. Components that are not
+    required (the LLM clients) do not hold back readiness, since every LLM
+    step has a fallback.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Any], probe: Callable[[], bool], required: bool = True):
+        self.name = name
+        self.load = load
+        self.probe = probe
+        self.required = required
+        self.state = "pending"  # pending -> loading -> ready | failed
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+
+    def run(self):
+        if self.state in ("loading", "ready"):
+            return
+        self.state = "loading"
+        started = time.perf_counter()
+        try:
+            self.load()
+            self.state = "ready"
+            self.error = None
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"⚠️ Warmup of {self.name} failed: {e}")
+        finally:
+            self.seconds = round(time.perf_counter() - started, 2)
+
+    def report(self) -> Dict[str, Any]:
+        # Loaded but still warming (e.g. the model's first encodes) is not ready yet
+        ready = self.state != "loading" and bool(self.probe())
+        return {"ready": ready, "required": self.required, "state": self.state,
+                "seconds": self.seconds, "error": self.error}
+
+class Warmup:
+    """
+    Loads the catalog, index, message graph, embedding model and LLM clients
+    in background threads, so startup and health probes never wait on them.
+    Each chain runs in order on its own thread (the index needs the catalog),
+    while the chains run side by side: S3 downloads overlap with loading the
+    model.
+    """
+
+    def __init__(self, chains: List[List[Component]]):
+        self.chains = chains
+        self.components = {c.name: c for chain in chains for c in chain}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._unfinished = 0
+        self.started_at: Optional[float] = None
+
+    def _run_chain(self, chain: List[Component], names: Optional[Tuple[str, ...]]):
+        try:
+            for component in chain:
+                if names is None or component.name in names:
+                    component.run()
+        finally:
+            with self._lock:
+                self._unfinished -= 1
+                last = self._unfinished == 0
+            if last:
+                self._announce()
+
+    def start(self, names: Optional[Tuple[str, ...]] = None):
+        """Start loading (only `names`, if given) in background threads; returns at once."""
+        with self._lock:
+            if self.running:
+                return
+            self.started_at = time.time()
+            self._unfinished = len(self.chains)
+            print("🔄 Warming up " + ", ".join(name for name in self.components if names is None or name in names) + "...")
+            self._threads = [
+                threading.Thread(target=self._run_chain, args=(chain, names), name=f"warmup-{chain[0].name}", daemon=True)
+                for chain in self.chains
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _announce(self):
+        report = self.report()
+        seconds = {name: c["seconds"] for name, c in report["components"].items()}
+        logger.info("warmup finished", extra={"ready": report["ready"], "seconds": seconds})
+        print(f"{'✅' if report['ready'] else '⚠️'} Warmup finished: " +
+              ", ".join(f"{name} {c['state']}" for name, c in report["components"].items()))
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until the running warmup is done (or timeout seconds passed)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in list(self._threads):
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def run(self, names: Optional[Tuple[str, ...]] = None):
+        """Load in the foreground, e.g. before gunicorn forks its workers."""
+        self.start(names)
+        self.wait()
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def report(self) -> Dict[str, Any]:
+        """Per-component readiness from the probes, plus warmup progress; loads nothing."""
+        components = {name: c.report() for name, c in self.components.items()}
+        return {
+            "ready": all(c["ready"] for c in components.values() if c["required"]),
+            "warming_up": self.running,
+            "started_at": self.started_at,
+            "components": components,
+        }
+
+def _loaded(module: str, probe: str) -> Callable[[], bool]:
+    """Probe that asks an app module only once something else has imported it."""
+    def check() -> bool:
+        loaded = sys.modules.get(module)
+        return loaded is not None and getattr(loaded, probe)()
+    return check
+
+def _load_catalog():
+    from app.core import vector_search
+    vector_search.get_products()
+
+def _load_index():
+    from app.core import vector_search
+    vector_search.get_index()
+
+def _build_graph():
+    from app.core.langgraph_app import get_graph
+    from app.core.prompts import warm_prompts
+    get_graph()
+    warm_prompts()
+
+def _warm_embeddings():
+    embedding_model.warm_model()
+    if settings.LOCAL_CLASSIFIER:
+        # Embeds the intent examples the local classifier compares against
+        from app.core.local_classifier import classify_intent_local
+        classify_intent_local("warmup")
+
+def _warm_llm():
+    llm.get_llm()
+    llm.get_llm(json_mode=True)
+
+# Global variable for lazy loading
+_warmup = None
+_warmup_lock = threading.Lock()
+
+def get_warmup() -> Warmup:
+    """Shared warmup: catalog -> index on one thread, graph -> embedding model -> LLM clients on another."""
+    global _warmup
+    if _warmup is None:
+        with _warmup_lock:
+            if _warmup is None:
+                _warmup = Warmup([
+                    [
+                        Component("catalog", _load_catalog, _loaded("app.core.vector_search", "is_catalog_loaded")),
+                        Component("index", _load_index, _loaded("app.core.vector_search", "is_index_loaded")),
+                    ],
+                    [
+                        Component("graph", _build_graph, _loaded("app.core.langgraph_app", "is_graph_built")),
+                        Component("embedding_model", _warm_embeddings, embedding_model.is_model_loaded),
+                        Component("llm", _warm_llm, lambda: bool(llm.llm_stats()), required=False),
+                    ],
+                ])
+    return _warmup
@@ -0,0 +1 @@
+"""Offline load tests and micro-benchmarks; see benchmarks/run.py."""
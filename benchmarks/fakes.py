@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import io
+import json
+import random
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+from langchain_core.messages import AIMessage
+
+from app.agents.stt_tool import ASSEMBLYAI_BASE_URL
+from app.core.embedding_model import EMBEDDING_DIM
+
+ARABIC = re.compile(r"[؀-ۿ]")
+GREETINGS = ("hi", "hello", "hey", "good morning", "good evening", "thanks", "thank you",
+             "مرحبا", "أهلا", "اهلا", "السلام عليكم", "صباح الخير", "شكرا")
+
+# Vocabulary of the synthetic catalog; the corpus fills its {brand}/{category}/{price} slots from it
+BRANDS = ["Samsung", "Apple", "Sony", "Nike", "Adidas", "Puma", "Xiaomi", "Huawei", "Lenovo", "Dell",
+          "HP", "Philips", "Braun", "Dior", "Chanel", "Gucci", "Casio", "Anker", "JBL", "Bose"]
+CATEGORIES = ["phone", "laptop", "headphones", "running shoes", "perfume", "smart watch", "backpack",
+              "wallet", "sunglasses", "t-shirt", "coffee maker", "blender", "power bank", "tablet", "camera"]
+ADJECTIVES = ["wireless", "lightweight", "premium", "classic", "waterproof", "compact", "slim", "pro",
+              "ultra", "sport", "leather", "cotton", "portable", "smart", "original"]
+FEATURES = ["Free delivery in the UAE.", "One year warranty.", "Best seller this month.", "Limited edition.",
+            "Comes with a gift box.", "Fast charging support.", "Available in three colours."]
+
+def jittered(mean_ms: float, jitter: float, rng: random.Random) -> float:
+    """A latency in seconds spread uniformly within ±jitter of mean_ms."""
+    return max(0.0, mean_ms * rng.uniform(1 - jitter, 1 + jitter)) / 1000
+
+def _message_of(prompt: str) -> str:
+    """The user's message inside one of the app's prompts."""
+    for pattern in (r"Message: '(.*)'\n", r"following text: '(.*)'\. Reply", r"in \w+:\n(.*)\nPossible intents",
+                    r"helpful way: (.*)$", r"ودودة ومفيدة: (.*)$"):
+        match = re.search(pattern, prompt, re.DOTALL)
+        if match:
+            return match.group(1)
+    return prompt
+
+def _is_greeting(text: str) -> bool:
+    text = re.sub(r"[^\w\s]", "", text.lower()).strip()
+    return len(text.split()) <= 4 and any(text.startswith(g) for g in GREETINGS)
+
+class ServiceUnavailable(Exception):
+    """Named like the Google API error, so the LLM client retries it."""
+    code = 503
+
+class FakeChatModel:
+    """
+    Stands in for ChatGoogleGenerativeAI: answers each of the app's prompts
+    with a plausible reply after a configurable delay, and fails a share of
+    calls with a retryable provider error.
+    """
+
+    def __init__(self, latency_ms: float = 300, jitter: float = 0.3, error_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def _reply(self, messages) -> AIMessage:
+        self.calls += 1
+        if self.rng.random() < self.error_rate:
+            raise ServiceUnavailable("fake Gemini is overloaded")
+        prompt = messages[-1].content
+        text = _message_of(prompt)
+        language = "ar" if ARABIC.search(text) else "en"
+        intent = "greet" if _is_greeting(text) else "product_recommend"
+        if "message understanding step" in prompt:
+            query = "" if intent == "greet" else text
+            return AIMessage(content=json.dumps({"language": language, "intent": intent, "query": query, "filters": {}}))
+        if "Extract a product search" in prompt:
+            return AIMessage(content=json.dumps({"query": text, "filters": {}}))
+        if "Classify the intent" in prompt:
+            return AIMessage(content=intent)
+        if "Detect the language" in prompt:
+            return AIMessage(content=language)
+        if language == "ar":
+            return AIMessage(content="مرحباً! أنا مساعد التسوق الخاص بك. عن ماذا تبحث اليوم؟")
+        return AIMessage(content="Hi! I'm your shopping assistant. What are you looking for today?")
+
+    def invoke(self, messages) -> AIMessage:
+        time.sleep(jittered(self.latency_ms, self.jitter, self.rng))
+        return self._reply(messages)
+
+    async def ainvoke(self, messages) -> AIMessage:
+        await asyncio.sleep(jittered(self.latency_ms, self.jitter, self.rng))
+        return self._reply(messages)
+
+class FakeEmbedder:
+    """
+    Stands in for the SentenceTransformer: a text's vector is the sum of fixed
+    random vectors of its words, so texts sharing words land close together.
+    Orders of magnitude faster than MiniLM, for catalogs of up to millions.
+    """
+
+    def __init__(self, buckets: int = 4096, seed: int = 0):
+        self.buckets = buckets
+        self.table = np.random.default_rng(seed).standard_normal((buckets, EMBEDDING_DIM)).astype("float32")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        words = [text.lower().split() or [""] for text in texts]
+        rows = [zlib.crc32(word.encode("utf-8")) % self.buckets for ws in words for word in ws]
+        starts = np.cumsum([0] + [len(ws) for ws in words[:-1]])
+        return np.add.reduceat(self.table[rows], starts, axis=0)
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        out = np.empty((len(texts), EMBEDDING_DIM), dtype="float32")
+        for start in range(0, len(texts), batch_size):
+            out[start:start + batch_size] = self._encode(texts[start:start + batch_size])
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if isinstance(sentences, str) else out
+
+class FakeTwilioSender:
+    """Replaces TwilioSender (see delivery.set_sender): waits like the REST API and reports each reply."""
+
+    def __init__(self, latency_ms: float = 80, jitter: float = 0.3, on_send: Optional[Callable[[str, str], None]] = None,
+                 seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.on_send = on_send
+        self.rng = random.Random(seed)
+        self.sent = 0
+
+    async def send(self, to: str, body: str):
+        await asyncio.sleep(jittered(self.latency_ms, self.jitter, self.rng))
+        self.sent += 1
+        if self.on_send is not None:
+            self.on_send(to, body)
+
+    async def aclose(self):
+        pass
+
+class FakeVoiceBackend:
+    """
+    Twilio media downloads and the AssemblyAI upload/transcript API on an
+    httpx.MockTransport. A voice note's "audio" is its transcript in UTF-8,
+    and a transcript completes stt_latency_ms after it was requested.
+    """
+
+    MEDIA_BASE = "https://api.twilio.com/2010-04-01/Accounts/ACbench/Messages"
+
+    def __init__(self, stt_latency_ms: float = 1500, jitter: float = 0.3, seed: int = 0):
+        self.stt_latency_ms = stt_latency_ms
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.media: Dict[str, bytes] = {}
+        self.uploads: Dict[str, bytes] = {}
+        self.transcripts: Dict[str, Dict[str, Any]] = {}
+
+    def media_url(self, transcript: str) -> str:
+        """Publish a voice note saying `transcript` and return its Twilio media URL."""
+        media_id = f"ME{len(self.media):08d}"
+        self.media[media_id] = transcript.encode("utf-8")
+        return f"{self.MEDIA_BASE}/MM{media_id[2:]}/Media/{media_id}"
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url.startswith(self.MEDIA_BASE):
+            audio = self.media.get(url.rsplit("/", 1)[-1])
+            return httpx.Response(200, content=audio) if audio is not None else httpx.Response(404)
+        if url == f"{ASSEMBLYAI_BASE_URL}/upload":
+            audio = await request.aread()
+            upload_url = f"https://cdn.assemblyai.test/upload/{hashlib.sha1(audio).hexdigest()}"
+            self.uploads[upload_url] = audio
+            return httpx.Response(200, json={"upload_url": upload_url})
+        if url == f"{ASSEMBLYAI_BASE_URL}/transcript" and request.method == "POST":
+            audio = self.uploads[json.loads(await request.aread())["audio_url"]]
+            transcript_id = f"tr{len(self.transcripts):08d}"
+            self.transcripts[transcript_id] = {
+                "text": audio.decode("utf-8"),
+                "ready_at": time.monotonic() + jittered(self.stt_latency_ms, self.jitter, self.rng),
+            }
+            return httpx.Response(200, json={"id": transcript_id, "status": "queued"})
+        if url.startswith(f"{ASSEMBLYAI_BASE_URL}/transcript/"):
+            transcript = self.transcripts[url.rsplit("/", 1)[-1]]
+            if time.monotonic() < transcript["ready_at"]:
+                return httpx.Response(200, json={"status": "processing"})
+            return httpx.Response(200, json={"status": "completed", "text": transcript["text"]})
+        return httpx.Response(404)
+
+    def client(self) -> httpx.AsyncClient:
+        """An HTTP client for stt_tool.set_http_client."""
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle), follow_redirects=True)
+
+class FakeS3Client:
+    """The slice of the boto3 S3 client S3ProductLoader uses, over objects held in memory."""
+
+    PAGE_SIZE = 1000  # list_objects_v2 page size
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.objects: Dict[str, Dict[str, Any]] = {}
+
+    def _wait(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes):
+        self.objects[Key] = {
+            "Body": Body,
+            "ETag": '"' + hashlib.md5(Body).hexdigest() + '"',
+            "LastModified": datetime.now(timezone.utc),
+        }
+
+    def get_paginator(self, operation: str) -> "FakeS3Client":
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str = "") -> Iterator[Dict[str, Any]]:
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        for start in range(0, max(len(keys), 1), self.PAGE_SIZE):
+            self._wait()
+            yield {"Contents": [
+                {"Key": key, "ETag": self.objects[key]["ETag"], "LastModified": self.objects[key]["LastModified"]}
+                for key in keys[start:start + self.PAGE_SIZE]
+            ]}
+
+    def get_object(self, Bucket: str, Key: str) -> Dict[str, Any]:
+        self._wait()
+        obj = self.objects[Key]
+        return {"Body": io.BytesIO(obj["Body"]), "ETag": obj["ETag"]}
+
+def synthetic_products(n: int, seed: int = 0) -> pd.DataFrame:
+    """A catalog of n products in the S3 CSV layout, built from the vocabulary above."""
+    rng = np.random.default_rng(seed)
+
+    def pick(words: List[str]) -> pd.Series:
+        return pd.Series(np.asarray(words, dtype=object)[rng.integers(len(words), size=n)])
+
+    ids = pd.Series(np.arange(1, n + 1)).astype(str)
+    brand, category, adjective = pick(BRANDS), pick(CATEGORIES), pick(ADJECTIVES)
+    model = pd.Series(rng.integers(100, 10000, size=n)).astype(str)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "title": brand + " " + adjective + " " + category + " " + model,
+        "description": adjective.str.capitalize() + " " + category + " by " + brand + ". " + pick(FEATURES),
+        "brand": brand,
+        "category": category,
+        "price": rng.gamma(2.0, 150.0, size=n).round(2),
+        "currency": "AED",
+        "sku": "SKU-" + ids,
+        "affiliate_url": "https://shop.example.com/p/" + ids,
+    })
+
+def fake_s3_catalog(n: int, prefix: str, rows_per_file: int = 20000, seed: int = 0, latency_ms: float = 0.0) -> FakeS3Client:
+    """A fake bucket holding a synthetic catalog of n products as CSVs of rows_per_file rows."""
+    s3 = FakeS3Client(latency_ms)
+    df = synthetic_products(n, seed)
+    for part, start in enumerate(range(0, n, rows_per_file)):
+        body = df.iloc[start:start + rows_per_file].to_csv(index=False).encode("utf-8")
+        s3.put_object(Bucket="bench", Key=f"{prefix}products_{part:04d}.csv", Body=body)
+    return s3
@@ -0,0 +1,411 @@
+"""
+Offline benchmarks: Gemini, Twilio, AssemblyAI and S3 are replaced by local
+fakes (benchmarks/fakes.py), so no API quota is spent.
+
+    python -m benchmarks.run webhook   # replay the corpus through POST /webhook
+    python -m benchmarks.run graph     # the same messages straight into run_message
+    python -m benchmarks.run index     # build_and_save_index at each --sizes catalog size
+    python -m benchmarks.run search    # search_similar_products at each size
+    python -m benchmarks.run storage   # store_transcript, that many transcripts
+    python -m benchmarks.run all
+
+Settings come from the environment as usual (REPLY_MODE, SEARCH_MODE,
+LLM_MAX_CONCURRENCY, ...). --out appends the results to a JSONL file, one
+line per run tagged with the git version, to compare releases.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+# Keep benchmark data out of ./data and the per-message log quiet; the app reads these on import
+WORK_DIR = Path(os.environ.get("BENCH_DIR") or tempfile.mkdtemp(prefix="eazy-bench-"))
+os.environ["STORAGE_FILE"] = str(WORK_DIR / "transcripts.db")
+os.environ["CATALOG_SNAPSHOT_DIR"] = str(WORK_DIR / "catalog")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACbench")
+
+import numpy as np
+
+from app.agents.stt_tool import aclose_http_client, set_http_client
+from app.api.delivery import get_delivery_queue, set_sender, shutdown_delivery
+from app.core import embedding_model, llm, vector_search
+from app.core.cache import clear_caches
+from app.core.config import settings
+from app.core.filters import SearchFilters
+from app.core.metrics import stage_seconds
+from app.core.s3_loader import S3ProductLoader
+from app.core.storage import TranscriptStore, close_store
+from benchmarks.fakes import (
+    BRANDS, CATEGORIES, FakeChatModel, FakeEmbedder, FakeTwilioSender, FakeVoiceBackend, fake_s3_catalog,
+)
+
+CORPUS_FILE = Path(__file__).parent / "corpus.jsonl"
+SUITES = ("webhook", "graph", "index", "search", "storage")
+STAGES = ("understand", "normalize", "intent", "query_extraction", "recommend", "chat_greet", "graph", "stt")
+ERROR_REPLIES = ("An error occurred", "Sorry, I can't generate", "Sorry, I could not transcribe")
+BUSY_REPLY = "We're receiving a lot of messages"
+
+def percentiles(latencies: List[float], digits: int = 2) -> Dict[str, float]:
+    """p50/p95/p99 of latencies in seconds, as milliseconds."""
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {"p50_ms": round(float(p50), digits), "p95_ms": round(float(p95), digits), "p99_ms": round(float(p99), digits)}
+
+def print_rows(rows: List[Dict[str, Any]]):
+    for row in rows:
+        print("📊 " + "  ".join(f"{key}={value}" for key, value in row.items()))
+
+def git_version() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def replay(count: int, users: int, seed: int) -> List[Dict[str, str]]:
+    """
+    `count` messages from the corpus, templates filled from the synthetic
+    catalog's vocabulary, each from one of `users` senders. The same seed
+    always gives the same messages in the same order.
+    """
+    with CORPUS_FILE.open("r", encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        entry = rng.choice(corpus)
+        price = rng.choice([50, 100, 150, 200, 300, 500, 1000])
+        brand, brand2 = rng.sample(BRANDS, 2)
+        text = entry["text"].format(brand=brand, brand2=brand2, category=rng.choice(CATEGORIES), price=price,
+                                    price_high=price * 2, sku=rng.randint(1, 10000))
+        messages.append(dict(entry, text=text, user=f"+9715{rng.randrange(users):08d}"))
+    return messages
+
+def install_fakes(args) -> Dict[str, Any]:
+    """Swap Gemini, the embedding model (with --embedder fake), Twilio and AssemblyAI for local fakes."""
+    def build_model(model: str, temperature: float, json_mode: bool) -> FakeChatModel:
+        return FakeChatModel(args.llm_latency_ms, args.jitter, args.llm_error_rate, seed=args.seed)
+
+    llm._build_model = build_model
+    llm._clients.clear()
+    if args.embedder == "fake":
+        embedding_model._model = FakeEmbedder(seed=args.seed)
+    voice = FakeVoiceBackend(args.stt_latency_ms, args.jitter, seed=args.seed)
+    set_http_client(voice.client())
+    sender = FakeTwilioSender(args.twilio_latency_ms, args.jitter, seed=args.seed)
+    set_sender(sender)
+    return {"voice": voice, "sender": sender}
+
+def load_catalog(products: int, directory: Path, seed: int):
+    """Load a synthetic catalog through S3ProductLoader from a fake bucket; returns (catalog, seconds)."""
+    loader = S3ProductLoader(snapshot_dir=directory / "catalog")
+    loader.s3_client = fake_s3_catalog(products, loader.prefix, seed=seed)
+    started = time.perf_counter()
+    catalog = loader.get_products()
+    return catalog, time.perf_counter() - started
+
+def use_index_dir(directory: Path):
+    """Keep the FAISS index of this run in its own directory instead of ./data."""
+    vector_search.INDEX_FILE = directory / "faiss_index.bin"
+    vector_search.META_FILE = vector_search.INDEX_FILE.with_suffix(".meta.json")
+
+def go_live(catalog):
+    """Make a catalog (and the index saved for it) the live generation."""
+    vector_search._swap_generation(vector_search._build_generation(catalog))
+
+def stage_counts() -> Dict[str, Dict[str, float]]:
+    return {stage: stage_seconds.summary(stage=stage) for stage in STAGES}
+
+def stage_means(before: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """Mean milliseconds per stage since `before`, for the stages that ran."""
+    means = {}
+    for stage, after in stage_counts().items():
+        count = after["count"] - before[stage]["count"]
+        if count:
+            total = after["mean"] * after["count"] - before[stage]["mean"] * before[stage]["count"]
+            means[f"{stage}_ms"] = round(total / count * 1000, 1)
+    return means
+
+def llm_calls() -> int:
+    return sum(stats["calls"] for stats in llm.llm_stats().values())
+
+async def _drive(messages: List[Dict[str, str]], concurrency: int, send) -> float:
+    """Run send(message) for every message from `concurrency` concurrent senders; returns the elapsed seconds."""
+    queue = iter(messages)
+
+    async def worker():
+        for message in queue:
+            await send(message)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+async def bench_webhook(args, messages: List[Dict[str, str]], fakes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    POST the messages to /webhook in-process. With REPLY_MODE=sync a message's
+    latency is the webhook response time; with async it runs until the fake
+    Twilio sender gets the reply.
+    """
+    import httpx
+    from fastapi import FastAPI
+    from app.api.whatsapp import router
+
+    app = FastAPI()
+    app.include_router(router)
+    voice, sender = fakes["voice"], fakes["sender"]
+    asynchronous = settings.REPLY_MODE == "async"
+    latencies: List[float] = []
+    waiting: Dict[str, Deque[float]] = {}
+    counts = {"errors": 0, "shed": 0}
+
+    def on_send(to: str, body: str):
+        latencies.append(time.perf_counter() - waiting[to].popleft())
+        counts["errors"] += body.startswith(ERROR_REPLIES)
+
+    sender.on_send = on_send
+    sent_before = sender.sent
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def send(message: Dict[str, str]):
+            reply_to = f"whatsapp:{message['user']}"
+            form = {"From": reply_to}
+            if message["kind"] == "voice":
+                form["MediaUrl0"] = voice.media_url(message["text"])
+            else:
+                form["Body"] = message["text"]
+            started = time.perf_counter()
+            if asynchronous:
+                waiting.setdefault(reply_to, deque()).append(started)
+            response = await client.post("/webhook", data=form)
+            if BUSY_REPLY in response.text:
+                counts["shed"] += 1
+                waiting[reply_to].pop()
+            elif not asynchronous:
+                latencies.append(time.perf_counter() - started)
+                counts["errors"] += response.status_code != 200 or any(reply in response.text for reply in ERROR_REPLIES)
+
+        before, calls = stage_counts(), llm_calls()
+        started = time.perf_counter()
+        elapsed = await _drive(messages, args.concurrency, send)
+        if asynchronous:
+            expected = len(messages) - counts["shed"]
+            while sender.sent - sent_before < expected:
+                await asyncio.sleep(0.005)
+            elapsed = time.perf_counter() - started
+
+    done = len(messages) - counts["shed"]
+    row = {
+        "suite": "webhook",
+        "reply_mode": settings.REPLY_MODE,
+        "messages": len(messages),
+        "concurrency": args.concurrency,
+        "msgs_per_s": round(done / elapsed, 1),
+        **percentiles(latencies),
+        "errors": counts["errors"],
+        "shed": counts["shed"],
+        "llm_calls": llm_calls() - calls,
+    }
+    row.update(stage_means(before))
+    if asynchronous:
+        row["queue_pending"] = get_delivery_queue().pending
+    return row
+
+async def bench_graph(args, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """run_message for each message (voice notes as their transcript) from --concurrency callers."""
+    from app.core.langgraph_app import run_message
+
+    latencies: List[float] = []
+
+    async def send(message: Dict[str, str]):
+        started = time.perf_counter()
+        await run_message(user_id=message["user"], text=message["text"])
+        latencies.append(time.perf_counter() - started)
+
+    before, calls = stage_counts(), llm_calls()
+    elapsed = await _drive(messages, args.concurrency, send)
+    row = {
+        "suite": "graph",
+        "messages": len(messages),
+        "concurrency": args.concurrency,
+        "msgs_per_s": round(len(messages) / elapsed, 1),
+        **percentiles(latencies),
+        "llm_calls": llm_calls() - calls,
+    }
+    row.update(stage_means(before))
+    return row
+
+async def bench_messages(args, suites: List[str], fakes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from app.core.langgraph_app import run_message
+
+    directory = WORK_DIR / f"messages_{args.products}"
+    catalog, _ = load_catalog(args.products, directory, args.seed)
+    use_index_dir(directory)
+    go_live(catalog)
+    # Load the embedding model and the local classifier outside the timed runs
+    await run_message(user_id="+warmup", text="hello")
+    await run_message(user_id="+warmup", text=f"{BRANDS[0]} {CATEGORIES[0]}")
+
+    messages = replay(args.messages, args.users, args.seed)
+    rows = []
+    try:
+        for suite in suites:
+            clear_caches()
+            if suite == "webhook":
+                rows.append(await bench_webhook(args, messages, fakes))
+            else:
+                rows.append(await bench_graph(args, messages))
+            print_rows(rows[-1:])
+    finally:
+        await shutdown_delivery()
+        await aclose_http_client()
+        close_store()
+    return rows
+
+def bench_index(products: int, catalog, load_seconds: float) -> Dict[str, Any]:
+    """Time build_and_save_index over a whole catalog."""
+    started = time.perf_counter()
+    index = vector_search.build_and_save_index(products=catalog)
+    elapsed = time.perf_counter() - started
+    return {
+        "suite": "build_and_save_index",
+        "products": products,
+        "index": vector_search.describe_index(index),
+        "s3_load_s": round(load_seconds, 2),
+        "build_s": round(elapsed, 2),
+        "products_per_s": round(products / elapsed, 1),
+        "size_mb": round(vector_search.INDEX_FILE.stat().st_size / 1e6, 1),
+    }
+
+def bench_search(products: int, num_queries: int, seed: int) -> List[Dict[str, Any]]:
+    """search_similar_products one query at a time, unfiltered and with a price cap, caches cleared."""
+    generation = vector_search.get_generation()
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(generation.products), num_queries)
+    queries = [f"{vector_search.product_title(generation.products[int(i)])} {n}" for n, i in enumerate(picks)]
+
+    rows = []
+    for label, filters in (("none", None), ("max_price", SearchFilters(max_price=200))):
+        clear_caches()
+        latencies = []
+        started = time.perf_counter()
+        for query in queries:
+            t = time.perf_counter()
+            vector_search.search_similar_products(query, top_k=5, filters=filters)
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - started
+        rows.append({
+            "suite": "search_similar_products",
+            "products": products,
+            "mode": settings.SEARCH_MODE,
+            "filters": label,
+            "queries": len(queries),
+            "qps": round(len(queries) / elapsed, 1),
+            **percentiles(latencies),
+        })
+    return rows
+
+def bench_storage(count: int, directory: Path, seed: int) -> Dict[str, Any]:
+    """Append `count` transcripts (what store_transcript does per message), then wait for the writer."""
+    store = TranscriptStore(directory / "transcripts.db")
+    texts = [message["text"] for message in replay(min(count, 1000), 100, seed)]
+    latencies = []
+    started = time.perf_counter()
+    for n in range(count):
+        t = time.perf_counter()
+        store.append(f"+9715{n % 1000:08d}", texts[n % len(texts)])
+        latencies.append(time.perf_counter() - t)
+    appended = time.perf_counter() - started
+    store.flush()
+    written = time.perf_counter() - started
+    store.close()
+    return {
+        "suite": "store_transcript",
+        "transcripts": count,
+        "appends_per_s": round(count / appended, 1),
+        "written_per_s": round(count / written, 1),
+        **percentiles(latencies, digits=4),
+    }
+
+def bench_sizes(args, suites: List[str]) -> List[Dict[str, Any]]:
+    """Index, search and storage micro-benchmarks at every --sizes size."""
+    rows = []
+    for size in args.sizes:
+        directory = WORK_DIR / f"size_{size}"
+        first = len(rows)
+        if "index" in suites or "search" in suites:
+            catalog, load_seconds = load_catalog(size, directory, args.seed)
+            use_index_dir(directory)
+            index_row = bench_index(size, catalog, load_seconds)
+            if "index" in suites:
+                rows.append(index_row)
+            if "search" in suites:
+                go_live(catalog)
+                rows.extend(bench_search(size, args.queries, args.seed))
+            del catalog
+        if "storage" in suites:
+            rows.append(bench_storage(size, directory, args.seed))
+        print_rows(rows[first:])
+    return rows
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("suites", nargs="*", default=["all"], choices=SUITES + ("all",))
+    parser.add_argument("--messages", type=int, default=500, help="messages replayed by webhook/graph")
+    parser.add_argument("--concurrency", type=int, default=16, help="messages in flight at once")
+    parser.add_argument("--users", type=int, default=200, help="distinct senders")
+    parser.add_argument("--products", type=int, default=10000, help="catalog size for webhook/graph")
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")], default=[10000, 100000, 1000000],
+                        help="catalog sizes for index/search/storage")
+    parser.add_argument("--queries", type=int, default=500, help="queries per search run")
+    parser.add_argument("--embedder", choices=("fake", "real"), default="fake",
+                        help="hashed bag-of-words vectors, or the configured EMBEDDING_BACKEND")
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--twilio-latency-ms", type=float, default=80)
+    parser.add_argument("--stt-latency-ms", type=float, default=1500)
+    parser.add_argument("--jitter", type=float, default=0.3, help="latencies vary by ± this share")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="append the results to this JSONL file")
+    args = parser.parse_args(argv)
+    suites = list(SUITES) if "all" in args.suites else args.suites
+
+    print(f"🔄 Benchmarking {', '.join(suites)} in {WORK_DIR}...")
+    fakes = install_fakes(args)
+    rows = []
+    online = [suite for suite in suites if suite in ("webhook", "graph")]
+    if online:
+        rows.extend(asyncio.run(bench_messages(args, online, fakes)))
+    if any(suite in suites for suite in ("index", "search", "storage")):
+        rows.extend(bench_sizes(args, suites))
+
+    print("✅ Benchmark complete")
+    print_rows(rows)
+    if args.out:
+        record = {
+            "version": git_version(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "args": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+            "settings": {name: getattr(settings, name) for name in (
+                "REPLY_MODE", "SEARCH_MODE", "FAISS_INDEX_TYPE", "EMBEDDING_BACKEND", "SEARCH_BATCHING",
+                "COMBINED_UNDERSTAND", "LOCAL_CLASSIFIER", "SEMANTIC_CACHE", "LLM_MAX_CONCURRENCY", "DELIVERY_WORKERS",
+            )},
+            "results": rows,
+        }
+        with args.out.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"✅ Results appended to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Startup benchmarks: how long `import main` takes and how soon a fresh
+process answers its first request.
+
+    python -m benchmarks.startup imports         # -X importtime digest of `import main`
+    python -m benchmarks.startup first-request   # start uvicorn, time the first /livez and /readyz
+
+Both exit non-zero when over budget, so they can gate a CI job. `imports`
+also fails when a heavy library (faiss, pandas, boto3, langgraph, torch, ...)
+is imported eagerly again instead of behind its lazy accessor.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Loaded on first use or by the background warmup (app/core/warmup.py), never by `import main`
+HEAVY_MODULES = (
+    "faiss", "pandas", "pyarrow", "boto3", "botocore", "torch", "transformers", "sentence_transformers",
+    "onnxruntime", "langgraph", "langchain", "langchain_google_genai", "langsmith", "assemblyai", "requests",
+    "twilio",
+)
+
+def profile_imports(module: str) -> List[Dict[str, Any]]:
+    """Import `module` in a fresh interpreter under -X importtime; one row per imported module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "LOG_LEVEL": "WARNING"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "name": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+def digest_imports(rows: List[Dict[str, Any]], module: str, top: int) -> Dict[str, Any]:
+    """Total import time of `module`, the packages that cost the most, and any heavy ones."""
+    total = next(row["cumulative_ms"] for row in rows if row["name"] == module and row["depth"] == 0)
+    by_package: Dict[str, float] = defaultdict(float)
+    for row in rows:
+        by_package[row["name"].split(".")[0]] += row["self_ms"]
+    loaded = {row["name"].split(".")[0] for row in rows}
+    return {
+        "total_ms": round(total, 1),
+        "modules": len(rows),
+        "top_packages": sorted(((name, round(ms, 1)) for name, ms in by_package.items()),
+                               key=lambda item: item[1], reverse=True)[:top],
+        "heavy": sorted(name for name in HEAVY_MODULES if name in loaded),
+    }
+
+def bench_imports(args) -> bool:
+    runs = [digest_imports(profile_imports(args.module), args.module, args.top) for _ in range(args.runs)]
+    totals = [run["total_ms"] for run in runs]
+    last = runs[-1]
+    median = round(statistics.median(totals), 1)
+    print(f"📊 suite=imports  module={args.module}  runs={args.runs}  median_ms={median}  "
+          f"min_ms={min(totals)}  max_ms={max(totals)}  modules={last['modules']}  budget_ms={args.budget_ms}")
+    print("   Slowest packages (self time, ms): " + ", ".join(f"{name} {ms}" for name, ms in last["top_packages"]))
+    ok = True
+    if last["heavy"]:
+        print(f"❌ Imported eagerly by `import {args.module}`: {', '.join(last['heavy'])}")
+        ok = False
+    if median > args.budget_ms:
+        print(f"❌ import {args.module} took {median} ms, over the {args.budget_ms} ms budget")
+        ok = False
+    return ok
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for(client: httpx.Client, url: str, deadline: float) -> Optional[float]:
+    """Poll url until it answers 200; when it did (time.monotonic), or None on timeout."""
+    while time.monotonic() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return time.monotonic()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    return None
+
+def bench_first_request(args) -> bool:
+    port = free_port()
+    # A fresh process with no local catalog snapshot, and nothing written to ./data
+    work_dir = Path(tempfile.mkdtemp(prefix="eazy-startup-"))
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "PRELOAD_BEFORE_FORK": "false",
+           "STORAGE_FILE": str(work_dir / "transcripts.db"), "CATALOG_SNAPSHOT_DIR": str(work_dir / "catalog")}
+    started = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            live = wait_for(client, "/livez", started + args.timeout)
+            ready = wait_for(client, "/readyz", started + args.timeout) if live and args.ready else None
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    first_request = round(live - started, 2) if live else None
+    print(f"📊 suite=first_request  first_request_s={first_request}  "
+          f"ready_s={round(ready - started, 2) if ready else None}  target_s={args.target_s}")
+    if first_request is None:
+        print(f"❌ No answer from /livez within {args.timeout} s")
+        return False
+    if first_request > args.target_s:
+        print(f"❌ First request after {first_request} s, over the {args.target_s} s target")
+        return False
+    return True
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    imports = commands.add_parser("imports", help="-X importtime digest of `import main`")
+    imports.add_argument("--module", default="main")
+    imports.add_argument("--runs", type=int, default=3, help="fresh interpreters; the median is checked")
+    imports.add_argument("--top", type=int, default=10, help="slowest packages to list")
+    imports.add_argument("--budget-ms", type=float, default=1000)
+
+    first = commands.add_parser("first-request", help="start uvicorn and time the first /livez")
+    first.add_argument("--target-s", type=float, default=2.0, help="time-to-first-request target")
+    first.add_argument("--ready", action="store_true", help="also wait for /readyz (catalog, index, model loaded)")
+    first.add_argument("--timeout", type=float, default=300)
+
+    args = parser.parse_args(argv)
+    ok = bench_imports(args) if args.command == "imports" else bench_first_request(args)
+    print("✅ Within budget" if ok else "❌ Over budget")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
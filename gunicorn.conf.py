@@ -0,0 +1,12 @@
+# gunicorn.conf.py
+# Multi-worker serving with shared memory:
+#   SHARED_READONLY=true PRELOAD_BEFORE_FORK=true gunicorn main:app -c gunicorn.conf.py
+# The app module (and with it the catalog, index and model) is imported once in
+# the master; workers are forked from it and share those pages.
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
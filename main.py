@@ -1,10 +1,14 @@
 # main.py
+import asyncio
 import os
 import sys
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.whatsapp import router as whatsapp_router
-from app.core.vector_search import initialize_vector_store
+from app.api.admin import router as admin_router
+from app.core.config import settings
+from app.core.warmup import get_warmup
 
 print("🚀 Starting WhatsApp AI Agent...")
 print(f"Python version: {sys.version}")
@@ -18,30 +22,106 @@ if os.getenv('GEMINI_API_KEY'):
 
 app = FastAPI(title="Eazy AI WhatsApp Agent")
 
+def preload():
+    """
+    Load the catalog, FAISS index, graph and embedding model in the parent process.
+    Run under gunicorn --preload (see gunicorn.conf.py), the forked workers
+    inherit them copy-on-write instead of each loading its own copy.
+    """
+    from app.core import vector_search
+    print("🔄 Preloading catalog, index and model before forking workers...")
+    # LLM clients open gRPC channels, which must not cross a fork; workers create their own
+    get_warmup().run(("catalog", "index", "graph", "embedding_model"))
+    if settings.CATALOG_REFRESH_ON_STARTUP:
+        # Refresh once here, so the workers inherit it instead of each fetching S3 again
+        vector_search.refresh_catalog()
+    print("✅ Preload complete")
+
+if settings.PRELOAD_BEFORE_FORK:
+    preload()
+
 @app.on_event("startup")
 async def startup_event():
-    """Initializes the FAISS vector store on application startup."""
-    print("Initializing FAISS vector store...")
-    await initialize_vector_store()
-    print("FAISS vector store initialized.")
+    """Starts the background warmup and catalog refresh; serving begins at once, /readyz says when loads are done."""
+    if settings.WARMUP_ON_STARTUP:
+        get_warmup().start()
+
+    if settings.STORE_TRANSCRIPTS:
+        # Opening the database (schema, legacy JSON import) blocks; keep it off the first message
+        from app.core.storage import get_store
+        await asyncio.get_running_loop().run_in_executor(None, get_store)
+
+    if settings.CATALOG_REFRESH_ON_STARTUP and not settings.PRELOAD_BEFORE_FORK:
+        # The store may have come from the local snapshot; pick up S3 changes off the request path
+        from app.core.vector_search import refresh_catalog
+        loop = asyncio.get_running_loop()
+        app.state.catalog_refresh = loop.run_in_executor(None, refresh_catalog)
+
+    if settings.CATALOG_REFRESH_INTERVAL_SECONDS > 0:
+        from app.core.vector_search import periodic_refresh
+        app.state.periodic_refresh = asyncio.create_task(periodic_refresh(settings.CATALOG_REFRESH_INTERVAL_SECONDS))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Lets queued replies finish and closes the pooled HTTP clients."""
+    from app.api.delivery import shutdown_delivery
+    from app.agents.stt_tool import aclose_http_client
+    from app.core.storage import close_store
+    periodic = getattr(app.state, "periodic_refresh", None)
+    if periodic is not None:
+        periodic.cancel()
+    await shutdown_delivery()
+    await aclose_http_client()
+    close_store()
 
 # Add health check endpoint
 @app.get("/health")
 async def health_check():
-    print("🏥 Health check called")
-    try:
-        # Test if core modules can be imported (lazy loading will handle model loading)
-        from app.core import vector_search
-        from app.core import embedding_model
-        
-        # Try to access the lazy-loaded components
-        # This will trigger model loading if not already loaded
-        _ = vector_search.get_products()
-        
-        return {"status": "healthy", "service": "whatsapp-ai-agent", "models": "ready"}
-    except Exception as e:
-        print(f"⚠️ Health check warning: {e}")
-        return {"status": "starting", "service": "whatsapp-ai-agent", "models": "loading"}
+    """Always 200 while the process runs; reports whether the models are loaded yet (never loads them)."""
+    ready = get_warmup().report()["ready"]
+    return {"status": "healthy" if ready else "starting", "service": "whatsapp-ai-agent",
+            "models": "ready" if ready else "loading"}
+
+@app.get("/livez")
+async def livez():
+    """Liveness: the event loop answers. Touches no model or catalog."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness per component (catalog, index, embedding model, LLM clients); 503 until the required ones are loaded."""
+    report = get_warmup().report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the query embedding, search and recommendation caches."""
+    from app.core.cache import cache_stats
+    return cache_stats()
+
+@app.get("/classifier/stats")
+async def classifier_stats():
+    """How often language and intent were answered locally vs by the LLM."""
+    from app.core.local_classifier import classifier_stats
+    return classifier_stats()
+
+@app.get("/search/stats")
+async def search_stats():
+    """How many searches were micro-batched and the average batch size."""
+    from app.core.batching import batcher_stats
+    return batcher_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus-style metrics: per-stage latency histograms, fallbacks, cache and LLM counters."""
+    from app.core.metrics import render_metrics
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Calls, retries, in-flight requests and circuit breaker state per LLM model."""
+    from app.core.llm import llm_stats
+    return llm_stats()
 
 @app.get("/")
 async def root():
@@ -49,6 +129,7 @@ async def root():
 
 print("📱 Loading WhatsApp router...")
 app.include_router(whatsapp_router, prefix="")
+app.include_router(admin_router)
 print("✅ Application setup complete!")
 
 if __name__ == "__main__":
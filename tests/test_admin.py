@@ -0,0 +1,23 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import admin
+from app.core.config import settings
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(admin.router)
+    return TestClient(app)
+
+def test_admin_endpoints_are_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    assert client.get("/admin/sessions/someone").status_code == 503
+    assert client.get("/admin/sessions/someone", headers={"X-Admin-Token": ""}).status_code == 503
+
+def test_admin_endpoints_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/sessions/someone").status_code == 401
+    assert client.get("/admin/sessions/someone", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/admin/sessions/someone", headers={"X-Admin-Token": "s3cret"}).status_code == 404
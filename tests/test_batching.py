@@ -0,0 +1,58 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.core import batching
+
+class FakeIndex:
+    def __init__(self):
+        self.calls = []
+
+    def search(self, vectors, k):
+        self.calls.append((len(vectors), k))
+        ids = np.arange(len(vectors) * k).reshape(len(vectors), k)
+        return np.zeros(ids.shape, dtype="float32"), ids
+
+@pytest.fixture
+def held(monkeypatch):
+    """Embedding that blocks on the "hold" query until released, so later requests queue up behind it."""
+    started, release = threading.Event(), threading.Event()
+    def embed_queries(queries):
+        if "hold" in queries:
+            started.set()
+            release.wait(5)
+        return np.zeros((len(queries), 4), dtype="float32")
+    monkeypatch.setattr(batching, "embed_queries", embed_queries)
+    return started, release
+
+def test_a_lone_search_does_not_wait_for_the_window(held):
+    batcher = batching.SearchBatcher(window_ms=2000, max_size=8)
+    started = time.monotonic()
+    assert list(batcher.search(FakeIndex(), "alone", 2)) == [0, 1]
+    assert time.monotonic() - started < 1
+
+def test_a_cancelled_search_does_not_fail_the_rest_of_its_batch(held):
+    started, release = held
+    batcher = batching.SearchBatcher(window_ms=200, max_size=8)
+    index = FakeIndex()
+    batcher.submit(index, "hold", 2)
+    assert started.wait(5)
+    cancelled = batcher.submit(index, "first", 2)
+    assert cancelled.cancel()
+    kept = batcher.submit(index, "second", 2)
+    release.set()
+    assert list(kept.result(timeout=5)) == [0, 1]
+    assert batcher.stats()["queries"] == 2
+
+def test_each_search_fetches_only_its_own_k(held):
+    started, release = held
+    batcher = batching.SearchBatcher(window_ms=200, max_size=8)
+    index = FakeIndex()
+    batcher.submit(index, "hold", 3)
+    assert started.wait(5)
+    futures = [batcher.submit(index, query, k) for query, k in (("a", 3), ("b", 50), ("c", 3))]
+    release.set()
+    assert [len(future.result(timeout=5)) for future in futures] == [3, 50, 3]
+    assert sorted(index.calls) == [(1, 3), (1, 50), (2, 3)]
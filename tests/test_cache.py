@@ -0,0 +1,83 @@
+import pickle
+
+import pytest
+
+from app.core import cache
+from app.core.cache import MISSING, RedisBackend, TTLCache
+
+class FakeRedis:
+    """Dict-backed stand-in for the redis client calls RedisBackend makes."""
+
+    def __init__(self):
+        self.data = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("redis unreachable")
+
+    def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self._check()
+        self.data[key] = value
+
+    def delete(self, key):
+        self._check()
+        self.data.pop(key, None)
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(cache, "_shared_backend", RedisBackend(client, "test-secret"))
+    return client
+
+def test_shared_tier_is_written_through_and_read_on_local_misses(redis):
+    writer = TTLCache("test_writer", maxsize=10, ttl=60)
+    reader = TTLCache("test_writer", maxsize=10, ttl=60)  # another worker's copy of the same cache
+    writer.set("q", (1, 2, 3))
+    assert "eazy:test_writer:q" in redis.data
+    assert reader.get("q") == (1, 2, 3)
+    assert reader.stats()["hits"] == 1
+
+def test_cache_falls_back_to_local_when_the_shared_tier_fails(redis):
+    local = TTLCache("test_fallback", maxsize=10, ttl=60)
+    redis.down = True
+    local.set("q", "answer")  # write-through fails, local copy kept
+    assert local.get("q") == "answer"
+    assert local.get("other") is MISSING
+    assert local.stats()["misses"] == 1
+
+    redis.down = False
+    assert local.get("other") is MISSING  # the failed write never reached the shared tier
+    assert "eazy:test_fallback:q" not in redis.data
+
+def test_unshared_caches_never_touch_the_backend(redis):
+    private = TTLCache("test_private", maxsize=10, ttl=60, shared=False)
+    private.set("q", 1)
+    assert redis.data == {}
+
+def test_entries_without_a_valid_signature_are_misses(redis):
+    writer = TTLCache("test_signed", maxsize=10, ttl=60)
+    writer.set("q", (1, 2, 3))
+    assert redis.data["eazy:test_signed:q"][32:] == pickle.dumps((1, 2, 3))
+
+    redis.data["eazy:test_signed:forged"] = pickle.dumps("payload")  # unsigned, as an attacker would write it
+    other_key = RedisBackend(redis, "another-secret")
+    other_key.set("eazy:test_signed:foreign", "value", None)
+    reader = TTLCache("test_signed", maxsize=10, ttl=60)
+    assert reader.get("forged") is MISSING
+    assert reader.get("foreign") is MISSING
+    assert reader.get("q") == (1, 2, 3)
+
+def test_shared_tier_stays_off_without_a_signing_key(monkeypatch):
+    monkeypatch.setattr(cache, "_shared_backend", None)
+    monkeypatch.setattr(cache, "_shared_unavailable", False)
+    monkeypatch.setattr(cache, "redis_available", True)
+    monkeypatch.setattr(cache.settings, "CACHE_REDIS_URL", "redis://localhost:6379/0")
+    monkeypatch.setattr(cache.settings, "CACHE_SIGNING_KEY", "")
+    assert cache.get_shared_backend() is None
+    with pytest.raises(ValueError):
+        RedisBackend(FakeRedis(), "")
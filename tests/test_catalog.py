@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from app.core.catalog import CategoricalColumn, ProductCatalog, StringColumn
+
+def frame():
+    return pd.DataFrame({
+        "title": ["Oud perfume", "عطر عود", None, "Running shoes"],
+        "brand": ["Acme", "Acme", "Acme", None],
+        "price": [120.0, float("nan"), 45.5, 199.0],
+        "stock": [3, 0, 12, 7],
+    })
+
+def test_columns_are_typed_by_content():
+    catalog = ProductCatalog.from_frame(frame())
+    assert isinstance(catalog.column("title"), StringColumn)
+    assert isinstance(catalog.column("brand"), CategoricalColumn)
+    assert catalog.column("price").dtype == np.float64
+
+def test_rows_read_like_dicts_without_missing_fields():
+    catalog = ProductCatalog.from_frame(frame())
+    assert catalog[0].to_dict() == {"title": "Oud perfume", "brand": "Acme", "price": 120.0, "stock": 3}
+    assert catalog[1].get("price") is None and catalog[1]["title"] == "عطر عود"
+    assert "title" not in catalog[2] and "brand" not in catalog[-1]
+    assert isinstance(catalog[0]["stock"], int)
+
+def test_save_and_mmap_load_round_trip(tmp_path):
+    catalog = ProductCatalog.from_frame(frame())
+    catalog.save(tmp_path / "columns")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["columns"]  # no temporary directory left behind
+
+    mapped = ProductCatalog.load(tmp_path / "columns", mmap=True)
+    assert len(mapped) == len(catalog)
+    assert [row.to_dict() for row in mapped] == [row.to_dict() for row in catalog]
+    assert mapped.fingerprint() == catalog.fingerprint()
+    assert isinstance(mapped.column("price"), np.memmap)
+    assert isinstance(mapped.column("title").data, np.memmap)
+    assert isinstance(mapped.column("brand").codes, np.memmap)
+
+    in_memory = ProductCatalog.load(tmp_path / "columns", mmap=False)
+    assert not isinstance(in_memory.column("price"), np.memmap)
+    assert in_memory.fingerprint() == catalog.fingerprint()
+
+def test_empty_catalog_round_trips(tmp_path):
+    ProductCatalog.empty().save(tmp_path / "empty")
+    assert len(ProductCatalog.load(tmp_path / "empty")) == 0
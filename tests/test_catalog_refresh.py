@@ -0,0 +1,60 @@
+import json
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app.core import vector_search
+from app.core.s3_loader import S3ProductLoader
+
+CSV = "product_id,title,price\n{id},Product {id},{price}\n"
+
+class FakeGeneration:
+    def __init__(self, products):
+        self.number = len(products)
+        self.products = products
+        self.index = type("Index", (), {"ntotal": len(products)})()
+        self.build_seconds = 0.0
+
+@pytest.fixture
+def bucket(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="az-scrapped-data")
+        yield s3
+
+def put(s3, name, product_id, price):
+    s3.put_object(Bucket="az-scrapped-data", Key=f"20k/multi/{name}.csv",
+                  Body=CSV.format(id=product_id, price=price).encode("utf-8"))
+
+def test_manifest_is_saved_only_after_the_new_generation_is_live(bucket, tmp_path, monkeypatch):
+    put(bucket, "a", 1, 10)
+    put(bucket, "b", 2, 20)
+    loader = S3ProductLoader(snapshot_dir=tmp_path)
+    monkeypatch.setattr(vector_search, "_s3_loader", loader)
+    monkeypatch.setattr(vector_search, "_products", None)
+    monkeypatch.setattr(vector_search, "_generation", None)
+    monkeypatch.setattr(vector_search, "_build_generation", FakeGeneration)
+    assert len(vector_search.get_generation().products) == 2
+    committed = json.loads(loader.manifest_file.read_text())
+
+    # The index build for the changed catalog fails: the snapshot on disk stays as it was
+    put(bucket, "a", 1, 11)
+    bucket.delete_object(Bucket="az-scrapped-data", Key="20k/multi/b.csv")
+    def fail(products):
+        raise RuntimeError("index build failed")
+    monkeypatch.setattr(vector_search, "_build_generation", fail)
+    assert vector_search.refresh_catalog() is False
+    assert json.loads(loader.manifest_file.read_text()) == committed
+    assert len(S3ProductLoader(snapshot_dir=tmp_path).load_snapshot()) == 2  # as after a restart
+
+    # The next refresh retries the same changes, and saves them once the generation is swapped in
+    monkeypatch.setattr(vector_search, "_build_generation", FakeGeneration)
+    assert vector_search.refresh_catalog() is True
+    manifest = json.loads(loader.manifest_file.read_text())
+    assert sorted(manifest) == ["20k/multi/a.csv"]
+    assert manifest["20k/multi/a.csv"]["etag"] != committed["20k/multi/a.csv"]["etag"]
+    assert len(S3ProductLoader(snapshot_dir=tmp_path).load_snapshot()) == 1
@@ -0,0 +1,59 @@
+import asyncio
+import random
+
+from app.api.delivery import DeliveryQueue, InboundMessage, split_message
+
+def message(user_id, body):
+    return InboundMessage(user_id=user_id, reply_to=f"whatsapp:{user_id}", body=body)
+
+def test_messages_from_one_user_are_handled_in_order_and_users_in_parallel():
+    handled = {}
+    running = {"now": 0, "peak": 0}
+    rng = random.Random(0)
+
+    async def handler(msg):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(rng.random() / 200)
+        running["now"] -= 1
+        handled.setdefault(msg.user_id, []).append(int(msg.body))
+        if msg.body == "3":
+            raise RuntimeError("send failed")  # must not stall this user's later messages
+
+    async def run():
+        queue = DeliveryQueue(handler, workers=4, max_pending=100)
+        for n in range(10):
+            for user in ("+1", "+2", "+3"):
+                assert queue.submit(message(user, str(n)))
+        await queue.stop(timeout=5)
+        return queue
+
+    queue = asyncio.run(run())
+    assert handled == {user: list(range(10)) for user in ("+1", "+2", "+3")}
+    assert running["peak"] == 3  # one worker per user at a time
+    assert queue.pending == 0
+
+def test_submit_sheds_load_beyond_max_pending():
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(msg):
+            await release.wait()
+
+        queue = DeliveryQueue(handler, workers=2, max_pending=3)
+        accepted = [queue.submit(message(f"+{n}", "hi")) for n in range(5)]
+        await asyncio.sleep(0)
+        full = queue.pending
+        release.set()
+        await queue.stop(timeout=5)
+        return accepted, full, queue.submit(message("+9", "again"))
+
+    accepted, full, after_drain = asyncio.run(run())
+    assert accepted == [True, True, True, False, False]
+    assert full == 3
+    assert after_drain is True
+
+def test_split_message_prefers_paragraph_breaks():
+    body = "a" * 10 + "\n\n" + "b" * 10 + "\n" + "c" * 25
+    assert split_message(body, limit=24) == ["a" * 10, "b" * 10, "c" * 24, "c"]
+    assert split_message("short") == ["short"]
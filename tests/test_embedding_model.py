@@ -0,0 +1,34 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.core import embedding_model
+from app.core.config import settings
+
+needs_both_backends = pytest.mark.skipif(
+    any(importlib.util.find_spec(name) is None for name in ("onnxruntime", "tokenizers", "sentence_transformers")),
+    reason="needs onnxruntime, tokenizers and sentence-transformers",
+)
+
+def test_onnx_backend_fails_clearly_without_an_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ONNX_MODEL_DIR", str(tmp_path))
+    with pytest.raises(FileNotFoundError, match="embedding_model export"):
+        embedding_model.load_onnx_model()
+
+@needs_both_backends
+def test_onnx_embeddings_match_pytorch(tmp_path_factory, monkeypatch):
+    from sentence_transformers import SentenceTransformer
+
+    model_dir = Path(settings.ONNX_MODEL_DIR)
+    if not embedding_model.has_onnx_export(model_dir, settings.ONNX_QUANTIZE):
+        model_dir = embedding_model.export_onnx(tmp_path_factory.mktemp("onnx"), quantize=settings.ONNX_QUANTIZE)
+    monkeypatch.setattr(settings, "ONNX_MODEL_DIR", str(model_dir))
+    texts = embedding_model.SAMPLE_TEXTS
+
+    reference = SentenceTransformer(embedding_model.MODEL_NAME, device="cpu").encode(
+        texts, convert_to_numpy=True, normalize_embeddings=True)
+    candidate = embedding_model.load_onnx_model().encode(texts, normalize_embeddings=True)
+    assert candidate.shape == (len(texts), embedding_model.EMBEDDING_DIM)
+    assert float(np.min((reference * candidate).sum(axis=1))) >= embedding_model.PARITY_MIN_COSINE
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+import pytest
+
+from app.core import vector_search
+
+# ivf_flat and ivf_pq as create_index builds them; 4-bit PQ codes keep training quick
+@pytest.mark.parametrize("description", ["IVF64,Flat", "IVF64,PQ8x4"])
+def test_selective_filter_returns_top_k_on_ivf(description):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((3000, vector_search.VECTOR_DIM), dtype="float32")
+    ids = np.arange(1000, 4000, dtype="int64")
+    index = faiss.index_factory(vector_search.VECTOR_DIM, description, faiss.METRIC_L2)
+    index.train(vectors)
+    index.add_with_ids(vectors, ids)
+    faiss.extract_index_ivf(index).nprobe = 1
+
+    generation = SimpleNamespace(index=index)
+    matching = rng.choice(ids, 10, replace=False)
+    for query in vectors[rng.choice(3000, 5, replace=False)]:
+        found = vector_search._selected_ids(generation, query.reshape(1, -1), matching, 5)
+        assert len(found) == 5
+        assert set(found) <= set(matching.tolist())
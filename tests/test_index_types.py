@@ -0,0 +1,29 @@
+import pytest
+
+from app.core import vector_search
+from app.core.config import settings
+
+@pytest.fixture(autouse=True)
+def index_settings(monkeypatch):
+    monkeypatch.setattr(settings, "FAISS_NLIST", 1024)
+    monkeypatch.setattr(settings, "FAISS_PQ_M", 48)
+    monkeypatch.setattr(settings, "FAISS_HNSW_M", 32)
+
+@pytest.mark.parametrize("kind, n, expected", [
+    ("flat", 10, "IDMap,Flat"),
+    ("hnsw", 10, "IDMap,HNSW32"),
+    ("ivf_flat", 1_000_000, "IVF1024,Flat"),
+    ("ivf_flat", 3900, "IVF100,Flat"),  # nlist shrinks to n // 39 so every list can train
+    ("ivf_flat", 77, "IDMap,Flat"),  # too few for two lists
+    ("ivf_pq", 1_000_000, "IVF1024,PQ48"),
+    ("ivf_pq", 9983, "IVF255,Flat"),  # too few to train 256 PQ centroids
+    ("ivf_pq", 9984, "IVF256,PQ48"),
+    ("ivf_pq", 50, "IDMap,Flat"),
+])
+def test_index_factory_string_falls_back_for_small_catalogs(kind, n, expected):
+    assert vector_search.index_factory_string(kind, n) == expected
+
+def test_unknown_index_type_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "FAISS_INDEX_TYPE", "annoy")
+    with pytest.raises(ValueError, match="FAISS_INDEX_TYPE"):
+        vector_search.index_spec()
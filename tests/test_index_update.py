@@ -0,0 +1,64 @@
+import hashlib
+
+import faiss
+import numpy as np
+import pytest
+
+from app.core import vector_search
+from app.core.config import settings
+
+def fake_embed(texts, **kwargs):
+    """Deterministic unit vectors per text, so an edited product gets a new vector."""
+    out = np.empty((len(texts), vector_search.VECTOR_DIM), dtype="float32")
+    for row, text in enumerate(texts):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+        out[row] = np.random.default_rng(seed).standard_normal(vector_search.VECTOR_DIM)
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+def index_ids(index: faiss.Index) -> set:
+    if isinstance(index, faiss.IndexIDMap):
+        return set(faiss.vector_to_array(index.id_map).tolist())
+    invlists = faiss.extract_index_ivf(index).invlists
+    ids = set()
+    for lst in range(invlists.nlist):
+        size = invlists.list_size(lst)
+        ids.update(faiss.rev_swig_ptr(invlists.get_ids(lst), size).tolist() if size else [])
+    return ids
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_search, "INDEX_FILE", tmp_path / "faiss_index.bin")
+    monkeypatch.setattr(vector_search, "META_FILE", tmp_path / "faiss_index.meta.json")
+    monkeypatch.setattr(vector_search, "embed_batch", fake_embed)
+    monkeypatch.setattr(settings, "FAISS_NLIST", 2)
+
+def catalog(n, edited=()):
+    return [{"id": f"p{i}", "title": f"Product {i}" + (" (new edition)" if i in edited else "")} for i in range(n)]
+
+@pytest.mark.parametrize("kind", ["flat", "ivf_flat", "hnsw"])
+def test_update_index_applies_the_catalog_diff(kind, monkeypatch):
+    monkeypatch.setattr(settings, "FAISS_INDEX_TYPE", kind)
+    old = catalog(100)
+    old_entries = vector_search.catalog_entries(old)
+    index = vector_search.build_and_save_index(old_entries, old)
+    assert vector_search.describe_index(index).startswith("IndexIVF" if kind == "ivf_flat" else "IndexIDMap")
+
+    # Drop p0 and p1, edit p2, add p100 and p101
+    new = catalog(102, edited={2})[2:]
+    new_entries = vector_search.catalog_entries(new)
+    stale, fresh = vector_search.index_changes({pid: h for pid, (_, h) in old_entries.items()}, new_entries)
+    assert len(stale) == 3 and len(fresh) == 3
+    updated = vector_search.update_index(index, {pid: h for pid, (_, h) in old_entries.items()}, new_entries, new)
+
+    assert updated.ntotal == len(new_entries) == 100
+    assert index_ids(updated) == set(new_entries)
+    if kind == "hnsw":
+        assert updated is not index  # HNSW cannot remove vectors, so it is rebuilt
+    else:
+        assert updated is index
+    edited_id = vector_search.product_id(new[0])
+    query = fake_embed([vector_search.product_to_text(new[0])])
+    assert updated.search(query, 1)[1][0][0] == edited_id
+
+    loaded, hashes = vector_search.load_index()
+    assert loaded.ntotal == 100 and hashes == {pid: h for pid, (_, h) in new_entries.items()}
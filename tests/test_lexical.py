@@ -0,0 +1,59 @@
+import logging
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.core import vector_search
+from app.core.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+TITLES = [
+    "Samsung Galaxy S24 Ultra SM-S928B 256GB",
+    "Samsung Galaxy A15 phone case",
+    "Apple iPhone 15 Pro Max 256GB",
+    "Oud perfume for men عطر عود رجالي",
+    "Running shoes for men",
+]
+IDS = np.array([10, 11, 12, 13, 14], dtype="int64")
+
+@pytest.fixture
+def bm25():
+    return BM25Index(TITLES, IDS)
+
+def test_tokenize_joins_model_numbers():
+    assert tokenize("SM-S928B") == ["sm", "s928b", "sms928b"]
+
+def test_bm25_ranks_rare_exact_terms_first(bm25):
+    ids, scores = bm25.search("samsung s24 ultra", 5)
+    assert ids.tolist() == [10, 11]
+    assert scores[0] > scores[1] > 0
+    assert bm25.search("sms928b", 5)[0].tolist() == [10]
+    assert bm25.search("عطر", 5)[0].tolist() == [13]
+    assert bm25.search("television", 5)[0].tolist() == []
+
+def test_bm25_respects_the_allowed_mask(bm25):
+    allowed = np.array([False, True, True, True, True])
+    assert bm25.search("samsung 256gb", 5, allowed)[0].tolist() == [11, 12]
+
+def test_rrf_rewards_ids_ranked_high_by_both_lists():
+    assert reciprocal_rank_fusion([[1, 2, 3], [2, 4, 1]], k=60) == [2, 1, 4, 3]
+    assert reciprocal_rank_fusion([[5, 6], []]) == [5, 6]
+
+def generation(lexical):
+    return SimpleNamespace(lexical=lexical, allowed_ids=lambda filters: None)
+
+def test_hybrid_retrieve_fuses_vector_and_keyword_rankings(bm25, monkeypatch):
+    monkeypatch.setattr(vector_search, "_vector_ids", lambda *args: [14, 12, 10])
+    found = vector_search.retrieve(generation(bm25), "samsung s24 ultra", 3, mode="hybrid", reranker="none")
+    assert found == (10, 14, 12)  # 10 is in both rankings; 12 and 11 tie, first seen wins
+    assert vector_search.retrieve(generation(bm25), "samsung s24 ultra", 3, mode="bm25", reranker="none") == (10, 11)
+
+def test_lexical_mode_without_an_index_logs_and_searches_by_vector(monkeypatch, caplog):
+    monkeypatch.setattr(vector_search, "_vector_ids", lambda *args: [14, 12])
+    logger = logging.getLogger("eazy.search")
+    logger.addHandler(caplog.handler)
+    try:
+        assert vector_search.retrieve(generation(None), "shoes", 2, mode="bm25", reranker="none") == (14, 12)
+    finally:
+        logger.removeHandler(caplog.handler)
+    assert "no BM25 index" in caplog.text
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.llm import CircuitBreaker, CircuitOpenError, LLMClient, ModelGuard
+
+class FlakyModel:
+    """Fails with the queued errors, then answers."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "reply"
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+@pytest.fixture(autouse=True)
+def llm_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "LLM_BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "LLM_BREAKER_COOLDOWN_SECONDS", 60)
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_SECONDS", 0.05)
+
+def client(model):
+    return LLMClient(model, ModelGuard("test-model"))
+
+def test_transient_errors_are_retried():
+    model = FlakyModel(ConnectionError("reset"), TimeoutError())
+    llm = client(model)
+    assert llm.invoke([]) == "reply"
+    assert model.calls == 3
+    assert llm.guard.stats()["retries"] == 2 and llm.guard.breaker.state == "closed"
+
+def test_other_errors_are_raised_at_once_and_do_not_trip_the_breaker():
+    model = FlakyModel(ValueError("bad request"), ValueError("bad request"), ValueError("bad request"))
+    llm = client(model)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            llm.invoke([])
+    assert model.calls == 3 and llm.guard.breaker.state == "closed"
+
+def test_slow_async_calls_time_out_and_retry():
+    class SlowOnce(FlakyModel):
+        async def ainvoke(self, messages):
+            self.calls += 1
+            if self.calls == 1:
+                await asyncio.sleep(1)
+            return "reply"
+
+    model = SlowOnce()
+    assert asyncio.run(client(model).ainvoke([])) == "reply"
+    assert model.calls == 2
+
+def test_breaker_opens_rejects_then_lets_one_trial_through():
+    model = FlakyModel(*[ConnectionError("down")] * 3)
+    llm = client(model)
+    with pytest.raises(ConnectionError):
+        llm.invoke([])  # three failed attempts reach the threshold
+    assert llm.guard.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        llm.invoke([])
+    assert model.calls == 3 and llm.guard.stats()["rejected"] == 1
+
+    llm.guard.breaker.opened_at -= 60  # the cooldown has passed
+    assert llm.guard.breaker.state == "half_open"
+    assert llm.invoke([]) == "reply"  # the trial call succeeds and closes the breaker
+    assert llm.guard.breaker.state == "closed"
+
+def test_failed_trial_reopens_the_breaker_and_allows_one_trial_per_cooldown():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow() and not breaker.allow()  # only one trial in flight
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.times_opened == 2
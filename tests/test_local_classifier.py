@@ -0,0 +1,15 @@
+import numpy as np
+
+from app.core import local_classifier
+
+def test_greeting_keywords_match_whole_messages_only(monkeypatch):
+    # Prototype tier stand-in: every message looks like a product request
+    labels = ["greet", "smalltalk", "product_recommend"]
+    monkeypatch.setattr(local_classifier, "_get_prototypes", lambda: (np.eye(3, dtype="float32"), labels))
+    monkeypatch.setattr(local_classifier, "embed_text", lambda text: np.array([0.0, 0.0, 1.0], dtype="float32"))
+
+    assert local_classifier.classify_intent_local("Hello!!") == ("greet", 1.0)
+    assert local_classifier.classify_intent_local("  مرحبا  ") == ("greet", 1.0)
+    # A greeting followed by a request is not short-circuited to "greet"
+    assert local_classifier.classify_intent_local("hi, show me running shoes")[0] == "product_recommend"
+    assert local_classifier.classify_intent_local("مرحبا، أريد عطر رجالي")[0] == "product_recommend"
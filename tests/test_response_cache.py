@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from app.core import response_cache
+from app.core.cache import MISSING
+from app.core.config import settings
+from app.core.embedding_model import EMBEDDING_DIM
+
+def near(cosine: float) -> np.ndarray:
+    """Unit vector at the given cosine from the first axis."""
+    vector = np.zeros(EMBEDDING_DIM, dtype="float32")
+    vector[0], vector[1] = cosine, np.sqrt(1 - cosine ** 2)
+    return vector
+
+VECTORS = {"hello": near(1.0), "hello there": near(0.96), "hello friend": near(0.94)}
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE", True)
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_THRESHOLD", 0.95)
+    monkeypatch.setattr(response_cache, "embed_text", lambda text: VECTORS[text])
+    cache = response_cache.ResponseCache("test", semantic=True)
+    cache.store("Hello", "en", {"reply": "hi!"})
+    return cache
+
+def test_message_just_above_the_threshold_reuses_the_answer(cache):
+    assert cache.lookup("hello there", "en") == {"reply": "hi!"}
+    assert cache.stats()["semantic_hits"] == 1
+
+def test_message_just_below_the_threshold_misses(cache):
+    assert cache.lookup("hello friend", "en") is MISSING
+    assert cache.stats()["semantic_hits"] == 0
+
+def test_semantic_matches_stay_within_a_language(cache):
+    assert cache.lookup("hello there", "ar") is MISSING
@@ -0,0 +1,31 @@
+import pytest
+
+from app.core import vector_search
+
+class FakeGeneration:
+    def __init__(self, number, titles):
+        self.number = number
+        self.version = "same-catalog"
+        self.products = [{"title": title} for title in titles]
+        self.positions = {pid: pid for pid in range(len(titles))}
+
+@pytest.fixture
+def searches(monkeypatch):
+    calls = []
+    monkeypatch.setattr(vector_search, "_generation", None)
+    monkeypatch.setattr(vector_search, "_retired", vector_search.weakref.WeakSet())
+    monkeypatch.setattr(vector_search, "retrieve", lambda gen, query, top_k, **kwargs: calls.append(gen.number) or (0, 1))
+    vector_search.search_cache.clear()
+    yield calls
+    vector_search.search_cache.clear()
+
+def test_swapping_the_generation_invalidates_cached_searches(searches):
+    vector_search._swap_generation(FakeGeneration(1, ["old shoe", "old bag"]))
+    assert [p["title"] for p in vector_search.search_similar_products("shoes", 2)] == ["old shoe", "old bag"]
+    vector_search.search_similar_products("shoes", 2)
+    assert searches == [1]  # the repeat came from the cache
+
+    # Same version string, so only the clear on swap keeps the old results from being served
+    vector_search._swap_generation(FakeGeneration(2, ["new shoe", "new bag"]))
+    assert [p["title"] for p in vector_search.search_similar_products("shoes", 2)] == ["new shoe", "new bag"]
+    assert searches == [1, 2]
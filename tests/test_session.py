@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from app.core import session as session_module
+from app.core.session import Session, parse_refinement, refine_from_session
+
+@pytest.mark.parametrize("text, expected", [
+    ("under 200", ("max_price", 200.0)),
+    ("show me something under 1,500 AED", ("max_price", 1500.0)),
+    ("500 dhs or less", ("max_price", 500.0)),
+    ("over 100", ("min_price", 100.0)),
+    ("any cheaper ones?", ("cheaper", None)),
+    ("more expensive", ("pricier", None)),
+    ("show me more", ("more", None)),
+    ("أرخص", ("cheaper", None)),
+    ("اقل من 300 درهم", ("max_price", 300.0)),
+])
+def test_follow_ups_are_recognised(text, expected):
+    assert parse_refinement(text) == expected
+
+@pytest.mark.parametrize("text", ["between 100 and 200", "red shoes under 200", "hello", ""])
+def test_new_requests_are_not_follow_ups(text):
+    assert parse_refinement(text) is None
+
+@pytest.fixture
+def last_search(monkeypatch):
+    remembered = []
+    monkeypatch.setattr(session_module, "remember_embedding", lambda text, vector: remembered.append(text))
+    session = Session()
+    session.language = "en"
+    session.query = "running shoes"
+    session.filters = {"min_price": 300.0, "brand": "Nike"}
+    session.query_vector = np.ones(4, dtype="float16")
+    session.result_prices = (250.0, float("nan"), 400.0)
+    return session, remembered
+
+def test_no_refinement_without_a_previous_search():
+    assert refine_from_session(None, "cheaper") is None
+    assert refine_from_session(Session(), "cheaper") is None
+
+def test_price_cap_replaces_a_conflicting_floor(last_search):
+    session, remembered = last_search
+    update = refine_from_session(session, "under 200")
+    assert update["query"] == "running shoes" and update["intent"] == "product_recommend"
+    assert update["filters"] == {"brand": "Nike", "max_price": 200.0}
+    assert update["refinement"] == "max_price"
+    assert remembered == ["running shoes"]  # the search reuses the stored embedding
+    assert session.filters == {"min_price": 300.0, "brand": "Nike"}  # the session itself is untouched
+
+def test_cheaper_and_pricier_are_relative_to_the_shown_prices(last_search):
+    session, _ = last_search
+    assert refine_from_session(session, "cheaper")["filters"] == {"brand": "Nike", "max_price": 249.99}
+    assert refine_from_session(session, "more expensive")["filters"] == {"brand": "Nike", "min_price": 400.01}
+
+def test_cheaper_needs_prices_to_compare_with(last_search):
+    session, _ = last_search
+    session.result_prices = (float("nan"),)
+    assert refine_from_session(session, "cheaper") is None
+    assert refine_from_session(session, "show me more")["filters"] == {"min_price": 300.0, "brand": "Nike"}
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.core import vector_search
+from app.core.config import settings
+
+pytestmark = pytest.mark.skipif(not Path("/proc/self/maps").exists(), reason="needs /proc/self/maps")
+
+def mapped(path: Path) -> bool:
+    with open("/proc/self/maps") as f:
+        return any(line.rstrip().endswith(str(path)) for line in f)
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw"])
+def test_shared_index_is_memory_mapped(kind, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "FAISS_INDEX_TYPE", kind)
+    monkeypatch.setattr(vector_search, "INDEX_FILE", tmp_path / "faiss_index.bin")
+    monkeypatch.setattr(vector_search, "META_FILE", tmp_path / "faiss_index.meta.json")
+    vectors = np.random.default_rng(0).random((500, vector_search.VECTOR_DIM), dtype="float32")
+    ids = np.arange(100, 600, dtype="int64")
+    index = vector_search.create_index(vectors)
+    index.add_with_ids(vectors, ids)
+    vector_search.save_index(index, {int(pid): "hash" for pid in ids})
+
+    private, _ = vector_search.load_index()
+    assert not mapped(vector_search.INDEX_FILE)
+    shared, hashes = vector_search.load_index(mmap=True)
+    assert mapped(vector_search.INDEX_FILE)
+    assert len(hashes) == 500
+    assert (shared.search(vectors[:5], 1)[1] == private.search(vectors[:5], 1)[1]).all()
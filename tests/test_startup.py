@@ -0,0 +1,5 @@
+from benchmarks.startup import HEAVY_MODULES, profile_imports
+
+def test_importing_main_leaves_heavy_libraries_to_their_lazy_accessors():
+    loaded = {row["name"].split(".")[0] for row in profile_imports("main")}
+    assert sorted(name for name in HEAVY_MODULES if name in loaded) == []
@@ -0,0 +1,32 @@
+import json
+
+from app.core.storage import TranscriptStore
+
+def test_queued_writes_are_flushed_in_order_and_tail_reads_the_last_rows(tmp_path):
+    store = TranscriptStore(tmp_path / "transcripts.db", batch_size=50, flush_interval=0.01)
+    for n in range(500):
+        store.append("alice" if n % 2 else "bob", f"message {n}")
+    assert [row["text"] for row in store.tail(3)] == ["message 497", "message 498", "message 499"]
+    alice = store.tail(2, user_id="alice")
+    assert [(row["user"], row["text"]) for row in alice] == [("alice", "message 497"), ("alice", "message 499")]
+    assert store.tail(10, user_id="nobody") == []
+    store.close()
+
+    reopened = TranscriptStore(tmp_path / "transcripts.db")
+    assert len(reopened.tail(1000)) == 500
+    reopened.close()
+
+def test_legacy_json_log_is_imported_once(tmp_path):
+    legacy = tmp_path / "transcripts.json"
+    legacy.write_text(json.dumps([{"user": "alice", "text": "hello"}, {"user": "bob", "text": "مرحبا"}]),
+                      encoding="utf-8")
+    store = TranscriptStore(tmp_path / "transcripts.db")
+    assert [(row["user"], row["text"]) for row in store.tail()] == [("alice", "hello"), ("bob", "مرحبا")]
+    assert not legacy.exists() and (tmp_path / "transcripts.json.migrated").exists()
+    store.close()
+
+    # A stray JSON file later is not imported into a database that already has rows
+    legacy.write_text(json.dumps([{"user": "carol", "text": "again"}]), encoding="utf-8")
+    store = TranscriptStore(tmp_path / "transcripts.db")
+    assert len(store.tail()) == 2
+    store.close()
@@ -0,0 +1,77 @@
+import asyncio
+from collections import Counter
+
+import httpx
+
+from app.agents import stt_tool
+from app.core.config import settings
+from benchmarks.fakes import FakeVoiceBackend
+
+def test_duplicate_voice_notes_are_not_downloaded_or_uploaded_again():
+    backend = FakeVoiceBackend(stt_latency_ms=0, jitter=0)
+    calls = Counter()
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url.startswith(backend.MEDIA_BASE):
+            calls["download"] += 1
+        elif url.endswith("/upload"):
+            calls["upload"] += 1
+        elif url.endswith("/transcript"):
+            calls["transcribe"] += 1
+        return await backend.handle(request)
+
+    async def run():
+        stt_tool.transcript_cache.clear()
+        stt_tool.set_http_client(httpx.AsyncClient(transport=httpx.MockTransport(handle)))
+        try:
+            first = backend.media_url("a forwarded voice note")
+            forwarded = backend.media_url("a forwarded voice note")
+            texts = [
+                await stt_tool.atranscribe_audio_from_url(first),
+                await stt_tool.atranscribe_audio_from_url(first),  # Twilio retry: same media URL
+                await stt_tool.atranscribe_audio_from_url(forwarded),  # same audio, new URL
+            ]
+        finally:
+            await stt_tool.aclose_http_client()
+        return texts
+
+    assert asyncio.run(run()) == ["a forwarded voice note"] * 3
+    assert calls == {"download": 2, "upload": 1, "transcribe": 1}
+
+def test_oversized_voice_notes_are_rejected_before_uploading(monkeypatch):
+    monkeypatch.setattr(settings, "STT_MAX_AUDIO_BYTES", 1000)
+    calls = Counter()
+
+    class Chunks(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            for _ in range(100):
+                calls["chunks"] += 1
+                yield b"x" * 100
+
+    class Transport(httpx.AsyncBaseTransport):
+        # Unlike MockTransport, hands the body over unread, so an early stop is visible
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/declared":
+                return httpx.Response(200, headers={"content-length": "10000"}, stream=Chunks())
+            if request.url.path == "/chunked":
+                return httpx.Response(200, stream=Chunks())
+            calls["upload"] += 1
+            return httpx.Response(500)
+
+    async def run():
+        stt_tool.transcript_cache.clear()
+        stt_tool.set_http_client(httpx.AsyncClient(transport=Transport()))
+        try:
+            declared = await stt_tool.atranscribe_audio_from_url("https://media.test/declared")
+            read_declared = calls["chunks"]
+            chunked = await stt_tool.atranscribe_audio_from_url("https://media.test/chunked")
+            return declared, read_declared, chunked
+        finally:
+            await stt_tool.aclose_http_client()
+
+    declared, read_declared, chunked = asyncio.run(run())
+    assert declared is None and chunked is None
+    assert read_declared == 0  # refused by Content-Length alone
+    assert calls["chunks"] == 11  # stopped at the first chunk past the limit
+    assert calls["upload"] == 0
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from app.core import understand
+from app.core.understand import parse_understanding
+
+def test_parse_understanding_accepts_fenced_json_and_normalises_labels():
+    reply = '```json\n{"language": "EN ", "intent": "Product_Recommend", "query": "running shoes", ' \
+            '"filters": {"max_price": "200", "brand": " "}}\n```'
+    result = parse_understanding(reply)
+    assert (result.language, result.intent, result.query) == ("en", "product_recommend", "running shoes")
+    assert result.filters.max_price == 200 and result.filters.brand is None
+
+def test_parse_understanding_drops_malformed_filters():
+    result = parse_understanding('{"language": "ar", "intent": "greet", "filters": "none"}')
+    assert result.intent == "greet" and result.filters.max_price is None
+
+@pytest.mark.parametrize("reply", [
+    "Sorry, I can't help with that.",
+    '{"language": "fr", "intent": "greet"}',
+    '{"language": "en", "intent": "buy"}',
+    '{"language": "en", "intent": "product_recommend", "query": "  "}',
+    '{"language": "en", "intent": ',
+])
+def test_parse_understanding_rejects_replies_outside_the_schema(reply):
+    assert parse_understanding(reply) is None
+
+def test_unusable_reply_falls_back_to_the_per_step_detectors(monkeypatch):
+    class Reply:
+        content = "I think this is a product question"
+
+    class LLM:
+        async def ainvoke(self, messages):
+            return Reply()
+
+    monkeypatch.setattr(understand, "get_llm", lambda **kwargs: LLM())
+    monkeypatch.setattr(understand.understanding_cache, "semantic", False)
+    understand.understanding_cache.clear()
+    assert asyncio.run(understand.aunderstand_message("any running shoes?")) is None
+    assert understand.understanding_cache.stats()["size"] == 0  # a bad reply is not cached